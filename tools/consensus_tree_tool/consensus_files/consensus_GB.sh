@@ -2,7 +2,8 @@
 
 # x = number of iterations chosen
 # This script produces x SNP datasets by bootstrapping with
-# resampling the SNPs of the samples. Next, x kinship matrixes are made.
+# resampling the SNPs of the samples, and makes the x kinship
+# matrixes of these datasets from one read of the genotypes.
 # Of each matrix, a phylogenetic tree is made.
 # From these x trees, a consensus tree is made.
 
@@ -81,8 +82,7 @@ if [ $h_option -eq 1 ]; then
   echo -e "\tbash consensus_GB.sh -f inputfile -t phylip -i 100 -g Coyote_1 -o newfilename"
   echo -e "\tbash consensus_GB.sh -f inputfile -t biopython -i 50 -g 93754 -o newfilename"
   echo -e "\nDEPENDENCIES NEEDED:"
-  echo -e "\tpython3 with package numpy (and biopython if chosen tree construction method is biopython)"
-  echo -e "\tplink 1.9 (included in this tool)"
+  echo -e "\tpython3 with package numpy"
   echo -e "\tPhylip's programs neighbor and consense (included in this tool)"
   exit 1
 fi
@@ -143,12 +143,6 @@ if [ -f outtree ]; then
   # phylip program automatically names output file outtree. So this file should not exist already
 fi
 
-# check if plink file is present
-if ! [ -f "consensus_files/scripts/plink.exe" ]; then
-  echo "ERROR: plink was not found. This executable should be in directory consensus_files."
-  exit 1
-fi
-
 # Check if python3 is installed
 command -v py >/dev/null 2>&1 || { echo "ERROR: Python 3 is not installed" >&2; exit 1;}
 
@@ -163,12 +157,8 @@ fi
 rm -r consensus_files/temp_files # empty temp_files folder
 # create directory for temporary files, if directory not already exists
 mkdir -p consensus_files/temp_files
-# create directory for bootstrap snp lists, if directory not already exists
-mkdir -p consensus_files/temp_files/bootstrap_datasets
 # create directory for matrix files, if directory not already exists
 mkdir -p consensus_files/temp_files/matrix_datasets
-# create directory for newick tree files, if directory not already exists
-mkdir -p consensus_files/temp_files/newick_trees
 
 {
 # Printing the the chosen options in the log of the bash script
@@ -186,57 +176,16 @@ echo -e "\nNumber of samples: $number_samples"
 number_snps=$(wc -l < "$file_bim")
 echo -e "Number of SNPs: $number_snps"
 
-echo -e "\nMaking $iter bootstrapped SNP lists"
-py consensus_files/scripts/BootstrapSamples.py "$file_bim" "$iter" "$file_new"
-
 if [ "$method_tree" = 'biopython' ]; then
-  # Check if biopython python package is installed
-  py -c "import pkgutil; exit(0 if pkgutil.find_loader('Bio') else 1)"
-  if [ $? -eq 1 ]; then
-    echo "ERROR: required python package 'biopython' is not installed" 2>&1 | tee -a "$log_file"
-    echo "Use 'py -m pip install biopython' in terminal" 2>&1 | tee -a "$log_file"
-    exit 1
-  fi
-
-  echo -e "\nMaking $iter kinship matrices of the new SNP datasets"
-  # Make a kinship matrix for each dataset
-  for i in $(eval echo "{1..$iter}");do
-    snp_list="consensus_files/temp_files/bootstrap_datasets/${file_new}_bootstrap_sample_${i}.list"
-    file_out="consensus_files/temp_files/matrix_datasets/${file_new}_sample_${i}"
-    echo "Distance matrix ${i}"
-    consensus_files/scripts/plink.exe  \
-    --fam "$file_fam"  \
-    --bim "$file_bim"  \
-    --bed "$file_bed"  \
-    --extract "$snp_list"  \
-    --chr-set 38  \
-    --distance triangle 1-ibs  \
-    --allow-no-sex  \
-    --out "$file_out"  \
-    --silent
-  done
-
-  rm consensus_files/temp_files/bootstrap_datasets/"${file_new}"_bootstrap_sample*
-
-  echo -e "\nUsing python script MakeTree.py to create $iter phylogenetic trees"
-  for i in $(eval echo "{1..$iter}");do
-    echo "Tree ${i}"
-    py consensus_files/scripts/MakeTree.py  \
-      "consensus_files/temp_files/matrix_datasets/${file_new}_sample_${i}.mdist"  \
-      "consensus_files/temp_files/matrix_datasets/${file_new}_sample_${i}.mdist.id"  \
-      "consensus_files/temp_files/newick_trees/${file_new}_tree_${i}.newick"  \
-      "$outgroup"
-  done
-
-  rm consensus_files/temp_files/matrix_datasets/"${file_new}"_sample*
-
-  echo -e "\nUsing python script MakeConsensusTree.py to create a consensus tree"
+  echo -e "\nUsing python script MakeConsensusTree.py to make $iter bootstrapped SNP datasets, their distance matrices"
+  echo -e "and phylogenetic trees, and to create a consensus tree"
   py consensus_files/scripts/MakeConsensusTree.py  \
+    "$file_bed"  \
+    "$file_bim"  \
+    "$file_fam"  \
     "$iter"  \
-    "consensus_files/temp_files/newick_trees/${file_new}_tree_"  \
+    "$outgroup"  \
     "${file_new}_consensus_tree.newick"
-
-  rm consensus_files/temp_files/newick_trees/"${file_new}"_tree*
 fi
 } 2>&1 | tee -a "$log_file" # put output in log file
 
@@ -248,35 +197,15 @@ if [ "$method_tree" = 'phylip' ]; then
     exit 1
   fi
 
-  echo -e "\nMaking $iter kinship matrices of the new SNP datasets"
-  # Make a kinship matrix for each dataset
-  for i in $(eval echo "{1..$iter}");do
-    snp_list="consensus_files/temp_files/bootstrap_datasets/${file_new}_bootstrap_sample_${i}.list"
-    file_out="consensus_files/temp_files/matrix_datasets/${file_new}_sample_${i}"
-    echo "Distance matrix ${i}"
-    consensus_files/scripts/plink.exe  \
-    --fam "$file_fam"  \
-    --bim "$file_bim"  \
-    --bed "$file_bed"  \
-    --extract "$snp_list"  \
-    --chr-set 38  \
-    --distance square 1-ibs  \
-    --allow-no-sex  \
-    --out "$file_out"  \
-    --silent
-  done
-
-  rm consensus_files/temp_files/bootstrap_datasets/"${file_new}"_bootstrap_sample*
-
-  echo -e "\nUsing python script ReformatDist.py to reformat the distance matrix to phylip format"
+  echo -e "\nUsing python script ReformatDist.py to make $iter bootstrapped SNP datasets and their distance matrices in phylip format"
   py consensus_files/scripts/ReformatDist.py  \
-    "consensus_files/temp_files/matrix_datasets/${file_new}_sample"  \
+    "$file_bed"  \
+    "$file_bim"  \
+    "$file_fam"  \
     "consensus_files/temp_files/matrix_datasets/${file_new}_matrices.txt"  \
     "consensus_files/temp_files/matrix_datasets/${file_new}_ids.txt"  \
     "$iter"
 
-  rm consensus_files/temp_files/matrix_datasets/"${file_new}"_sample*
-
   row_outgroup=$(sed -n "/${outgroup}/=" "$file_fam")
   echo -e "\nUsing the Phylip neighbor executable to make newick trees"
   echo -e "Used settings are:"
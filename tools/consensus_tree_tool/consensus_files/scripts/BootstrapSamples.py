@@ -1,60 +1,105 @@
 """
 This script:
-    makes x (amount of iterations) new SNP lists by bootstrapping with resampling
-    over the SNPs in the original .bim file.
-    this resampled list with SNPs is put in a new file.
+contains functions to make x (amount of iterations) bootstrap distance matrices by bootstrapping with resampling over the
+SNPs of the .bed file, without writing a SNP list per iteration
+    a bootstrap dataset is a multiset of the SNPs: per SNP the number of times it is drawn (multinomial weights, as
+    drawing len(SNPs) SNPs with replacement)
+    the 1-IBS distance matrix of a bootstrap dataset is the sum of the distances per SNP, weighted with these numbers, so
+    the genotypes are read once as bit-planes (get_bit_planes of PlinkBed.py) and each distance matrix is computed from
+    the same bit-planes with get_ibs_distances of IBSDistance.py
+    the distance matrices (or trees) of the iterations are computed in parallel threads
 """
-import numpy as np
 import os
-import csv
-import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PlinkBed import open_bed, read_plink_rows, get_bit_planes
+from IBSDistance import get_ibs_distances
+from NeighborJoining import neighbor_joining, root_with_outgroup
 
 
-# Function to perform bootstrapping and write to file
-def bootstrap_and_write(original_list, iterations, output_dir):
+def read_bed_planes(filename_bed, filename_bim, filename_fam):
     """
-    :param original_list: list with SNPs in original bim file
-    :param iterations: number of times a new snp list has to be made
-    :param output_dir: the directory to put the new files in
+    :param filename_bed: plink .bed file
+    :param filename_bim: plink .bim file
+    :param filename_fam: plink .fam file
+    :return: bit-planes of all SNPs and samples of the .bed, the number of SNPs and the rows of the .fam file
     """
+    with open(filename_bim, mode="r") as DataBIM, \
+            open(filename_fam, mode="r") as DataFAM:
+        bim_rows = read_plink_rows(DataBIM)
+        fam_rows = read_plink_rows(DataFAM)
+    data = open_bed(filename_bed, len(bim_rows), len(fam_rows))
+    planes = get_bit_planes(data, len(fam_rows), range(len(bim_rows)))
+    del data
+    return planes, len(bim_rows), fam_rows
 
-    for i in range(iterations):
-        # Perform bootstrapping (sampling with replacement)
-        resampled_list = np.random.choice(original_list, size=len(original_list), replace=True)
 
-        # Write the resampled list to a new list file
-        new_filename = os.path.join(output_dir, sys.argv[3] + f"_bootstrap_sample_{i + 1}.list")
-        with open(new_filename, "w", newline='') as newfile:
-            writer = csv.writer(newfile, delimiter=' ')
-            for sample in resampled_list:
-                split_line = sample.strip().split(':')
-                writer.writerow(split_line)
+def draw_snp_weights(number_snps, iterations):
+    """
+    :param number_snps: number of SNPs in the .bim file
+    :param iterations: number of bootstrap datasets
+    :return: generator with per iteration a float32 array with per SNP the number of times it is drawn, when drawing
+    number_snps SNPs with replacement
+    """
+    probabilities = np.full(number_snps, 1 / number_snps)
+    for i in range(iterations):
+        yield np.random.multinomial(number_snps, probabilities).astype(np.float32)
 
 
-def split_and_strip(line):
+def map_bootstrap(function, planes, number_snps, iterations, number_threads=None):
     """
-    :param line: row of input file
-    :return: stripped and split row
+    :param function: function that is called with the bit-planes and the SNP weights of a bootstrap dataset
+    :param planes: bit-planes of all SNPs of the .bed (planes x samples x bytes), made by read_bed_planes
+    :param number_snps: number of SNPs in the .bim file
+    :param iterations: number of bootstrap datasets
+    :param number_threads: number of threads, default number of CPUs
+    :return: generator with the result of function for each bootstrap dataset, in the order of the iterations
+    At most number_threads bootstrap datasets are computed at the same time, so the memory use does not grow with the
+    number of iterations.
     """
-    split_line = line.strip().split('\t')
-    return split_line
+    number_threads = number_threads or os.cpu_count() or 1
+    weights = draw_snp_weights(number_snps, iterations)
+    with ThreadPoolExecutor(number_threads) as executor:
+        running = deque()
+        for snp_weights in weights:
+            running.append(executor.submit(function, planes, snp_weights))
+            if len(running) == number_threads:
+                yield running.popleft().result()
+        while running:
+            yield running.popleft().result()
 
 
-def main():
+def get_bootstrap_distances(planes, number_snps, iterations, number_threads=None):
     """
-    makes x (=number of iterations) new files with a list of SNPs by bootstrapping
+    :param planes: bit-planes of all SNPs of the .bed (planes x samples x bytes), made by read_bed_planes
+    :param number_snps: number of SNPs in the .bim file
+    :param iterations: number of bootstrap datasets
+    :param number_threads: number of threads, default number of CPUs
+    :return: generator with the square 1-IBS distance matrix of each bootstrap dataset, in the order of the iterations
     """
-    bimfile = sys.argv[1]  # plink .bim file
-    tool_directory = sys.argv[4]  # tool path Galaxy
-    with open(bimfile, mode="r") as DataBim:
-        original_list = []
-        # get all the SNPs from the original bim file
-        for line in DataBim:
-            line = split_and_strip(line)
-            original_list.append(line[1])
+    def get_distances(planes, weights):
+        return get_ibs_distances(planes, weights, number_threads=1)
+
+    return map_bootstrap(get_distances, planes, number_snps, iterations, number_threads)
 
-        # Perform bootstrapping and write randomly chosen SNPs to list files
-        bootstrap_and_write(original_list, iterations=int(sys.argv[2]), output_dir=f"{tool_directory}/consensus_files/temp_files/bootstrap_datasets")
 
+def get_bootstrap_trees(planes, number_snps, iterations, sample_names, outgroup, number_threads=None):
+    """
+    :param planes: bit-planes of all SNPs of the .bed (planes x samples x bytes), made by read_bed_planes
+    :param number_snps: number of SNPs in the .bim file
+    :param iterations: number of bootstrap datasets
+    :param sample_names: list with the sample IDs, in the order of the .fam file
+    :param outgroup: sample ID of the outgroup sample
+    :param number_threads: number of threads, default number of CPUs
+    :return: generator with the neighbor joining tree (made by NeighborJoining.py) of each bootstrap dataset, rooted
+    with the outgroup, in the order of the iterations
+    The distance matrix and the tree of a bootstrap dataset are made by the same thread, the trees are not written to
+    files.
+    """
+    def get_tree(planes, weights):
+        tree = neighbor_joining(get_ibs_distances(planes, weights, number_threads=1), sample_names)
+        root_with_outgroup(tree, [outgroup])
+        return tree
 
-main()
+    return map_bootstrap(get_tree, planes, number_snps, iterations, number_threads)
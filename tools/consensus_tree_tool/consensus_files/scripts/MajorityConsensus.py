@@ -0,0 +1,170 @@
+"""
+This script:
+contains functions to make a majority rule consensus tree from the trees of the bootstrap datasets, with numpy instead
+of biopython
+    each clade of a tree is encoded as a bitset of its samples (numpy uint64 words, one bit per sample), the clades are
+    counted in a dictionary with the bitset as key while the trees are made, so the trees are not kept in memory
+    the consensus tree is made the same way as majority_consensus of biopython: the clades are added from the most
+    frequent to the least frequent (then the most samples first), a clade is only added when it is compatible with the
+    clades that are already added and when it is in at least 50% of the trees
+    the bits of the samples are in the order of the samples in the first tree (as biopython uses the terminals of the
+    first tree), the samples have the branch lengths of the first tree, the clades the average branch length of the
+    trees they are in and the percentage of trees they are in as support value
+    the trees are dictionaries made by NeighborJoining.py, the consensus tree too (with the support values in
+    confidences), so it is written with get_newick of NeighborJoining.py
+"""
+import sys
+import numpy as np
+from NeighborJoining import add_node
+
+
+def get_terminals(tree):
+    """
+    :param tree: tree made by NeighborJoining.py
+    :return: list with the sample nodes of the tree, in the order of the tree (preorder, as get_terminals of biopython)
+    """
+    terminals = []
+    stack = [tree['root']]
+    while stack:
+        node = stack.pop()
+        if tree['children'][node]:
+            stack.extend(reversed(tree['children'][node]))
+        else:
+            terminals.append(node)
+    return terminals
+
+
+def get_clade_bitsets(tree, bit_positions, number_words):
+    """
+    :param tree: tree made by NeighborJoining.py
+    :param bit_positions: array with per sample node the position of its bit
+    :param number_words: number of uint64 words per bitset
+    :return: list with the inner nodes of the tree (the root included) and array (inner nodes x words) with the bitset
+    of the samples in each clade
+    Position p is bit 63 - p % 64 of word p // 64, so comparing the words compares the bitsets as biopython compares
+    them (as strings of 0 and 1).
+    """
+    children = tree['children']
+    bitsets = np.zeros((len(children), number_words), dtype=np.uint64)
+    number_samples = len(bit_positions)
+    bitsets[np.arange(number_samples), bit_positions // 64] = \
+        np.left_shift(np.uint64(1), (63 - bit_positions % 64).astype(np.uint64))
+    # the children of a node are handled before the node (reversed preorder)
+    inner_nodes = []
+    stack = [tree['root']]
+    while stack:
+        node = stack.pop()
+        if children[node]:
+            inner_nodes.append(node)
+            stack.extend(children[node])
+    for node in reversed(inner_nodes):
+        bitsets[node] = np.bitwise_or.reduce(bitsets[children[node]], axis=0)
+    return inner_nodes, bitsets[inner_nodes]
+
+
+def count_clades(trees):
+    """
+    :param trees: iterable with trees made by NeighborJoining.py, e.g. a generator, every tree is used once
+    :return: dictionary with per clade (bitset as bytes) the number of trees with the clade and the sum of the branch
+    lengths, the number of trees, and the first tree and its sample nodes (in the order of the bits)
+    """
+    clade_counts = {}
+    number_trees = 0
+    first_tree, terminals, bit_positions, number_words = None, None, None, None
+    for tree in trees:
+        if first_tree is None:
+            first_tree, terminals = tree, get_terminals(tree)
+            bit_positions = np.zeros(len(terminals), dtype=np.int64)
+            bit_positions[terminals] = np.arange(len(terminals))
+            number_words = (len(terminals) + 63) // 64
+        number_trees += 1
+        inner_nodes, bitsets = get_clade_bitsets(tree, bit_positions, number_words)
+        for node, bitset in zip(inner_nodes, bitsets):
+            key = bitset.tobytes()
+            count = clade_counts.setdefault(key, [0, 0.0])
+            count[0] += 1
+            count[1] += tree['lengths'][node] or 0
+    return clade_counts, number_trees, first_tree, terminals
+
+
+def get_positions(bitset, number_samples):
+    """
+    :param bitset: bitset made by get_clade_bitsets
+    :param number_samples: number of samples
+    :return: array with the positions of the bits that are set, in increasing order
+    """
+    return np.flatnonzero(np.unpackbits(bitset.astype('>u8').view(np.uint8))[:number_samples])
+
+
+def majority_consensus(trees, cutoff=0.5):
+    """
+    :param trees: iterable with trees made by NeighborJoining.py, e.g. a generator, every tree is used once
+    :param cutoff: minimal part of the trees a clade has to be in, to be in the consensus tree
+    :return: consensus tree (dictionary as made by NeighborJoining.py, with the support values in confidences), made
+    the same way as majority_consensus of biopython
+    """
+    clade_counts, number_trees, first_tree, terminals = count_clades(trees)
+    number_samples = len(terminals)
+    keys = list(clade_counts)
+    bitsets = np.frombuffer(b''.join(keys), dtype=np.uint64).reshape(len(keys), -1)
+    sizes = np.unpackbits(bitsets.view(np.uint8), axis=1).sum(axis=1)
+    # most frequent clades first, then the clades with the most samples, then the highest bitset
+    order = sorted(range(len(keys)), reverse=True,
+                   key=lambda index: (clade_counts[keys[index]][0], int(sizes[index]),
+                                      tuple(int(word) for word in bitsets[index])))
+    if sizes[order[0]] != number_samples:
+        sys.exit("ERROR: the trees do not have the same samples")
+
+    # the samples keep their name and the branch length of the first tree, the root has all samples as children
+    root = number_samples
+    consensus = {'names': first_tree['names'][:number_samples] + [None],
+                 'lengths': first_tree['lengths'][:number_samples] + [None],
+                 'children': [[] for _ in range(number_samples)] + [list(terminals)],
+                 'confidences': [None] * (number_samples + 1), 'root': root}
+    # the nodes of the added clades, in the order biopython keeps them, and their bitsets and sizes
+    added = [root]
+    clade_bitsets = {root: bitsets[order[0]]}
+    clade_sizes = {root: number_samples}
+    for index in order[1:]:
+        count, length_sum = clade_counts[keys[index]]
+        confidence = 100.0 * count / number_trees
+        if confidence < cutoff * 100.0:
+            break
+        bitset = bitsets[index]
+        ranked = sorted(added, key=lambda clade: clade_sizes[clade], reverse=True)
+        ranked_bitsets = np.array([clade_bitsets[clade] for clade in ranked])
+        overlap = ranked_bitsets & bitset
+        contains = (overlap == bitset).all(axis=1)  # added clade contains the clade
+        contained = (overlap == ranked_bitsets).all(axis=1)  # added clade is in the clade
+        independent = ~overlap.any(axis=1)
+        if not (contains | contained | independent).all():
+            continue  # not compatible with the added clades
+
+        clade_terms = [terminals[position] for position in get_positions(bitset, number_samples)]
+        node = add_node(consensus, None, length_sum / count, clade_terms)
+        consensus['confidences'].append(confidence)
+        # the closest added clade that contains the clade is the parent
+        parent = ranked[np.flatnonzero(contains)[-1]]
+        added.remove(parent)
+        added.append(parent)
+        parent_children = consensus['children'][parent]
+        clade_term_set = set(clade_terms)
+        parent_children[:] = [child for child in parent_children if child not in clade_term_set] + [node]
+        # the largest added clades in the clade (independent of each other) become children of the clade
+        child_bitsets = []
+        for clade, is_contained in zip(ranked, contained):
+            if is_contained and not any((clade_bitsets[clade] & child).any() for child in child_bitsets):
+                child_bitsets.append(clade_bitsets[clade])
+                parent_children.remove(clade)
+                consensus['children'][node].append(clade)
+        if child_bitsets:
+            child_bitset = np.bitwise_or.reduce(child_bitsets, axis=0)
+            child_terms = {terminals[position] for position in get_positions(child_bitset, number_samples)}
+            consensus['children'][node] = [child for child in consensus['children'][node] if child not in child_terms]
+        added.append(node)
+        clade_bitsets[node], clade_sizes[node] = bitset, int(sizes[index])
+        if len(added) == number_samples - 1 or \
+                (len(added) == number_samples - 2 and len(consensus['children'][root]) == 3):
+            break
+    return consensus
+
@@ -1,20 +1,50 @@
 """
 This script:
-Makes a consensus phylogenetic tree newick file from multiple trees
+Makes a consensus phylogenetic tree newick file from the trees of x (amount of iterations) bootstrap datasets.
+The .bed is read once, the distance matrices and trees of the bootstrap datasets are made in parallel threads in this
+script (BootstrapSamples.py and NeighborJoining.py), and the clades of each tree are counted for the majority rule
+consensus (MajorityConsensus.py) as soon as it is made, without writing the trees to files.
 """
-from Bio import Phylo
-from Bio.Phylo.Consensus import *
+import os
 import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from BootstrapSamples import read_bed_planes, get_bootstrap_trees
+from MajorityConsensus import majority_consensus
+from NeighborJoining import write_newick
 
-# Load the 100 trees
-trees = []
-for i in range(int(sys.argv[1])):  # for i in number of iterations
-    filename = sys.argv[2] + f'{i + 1}.newick'
-    tree = Phylo.read(filename, 'newick')  # read tree from newick file
-    trees.append(tree)  # append trees
 
-# Create a consensus tree
-consensus_tree = majority_consensus(trees, 0.5)
+def print_progress(trees):
+    """
+    :param trees: iterable with the trees of the bootstrap datasets
+    :return: generator with the same trees, the number of each tree is printed when it is made
+    """
+    for i, tree in enumerate(trees):
+        print(f"Tree {i + 1}")
+        yield tree
 
-# Save the consensus tree to a newick file
-Phylo.write(consensus_tree, sys.argv[3], 'newick')
\ No newline at end of file
+
+def main():
+    """
+    Makes the trees of the bootstrap datasets and writes the consensus tree to a newick file
+    """
+    # input files
+    filename_bed = sys.argv[1]  # plink .bed file
+    filename_bim = sys.argv[2]  # plink .bim file
+    filename_fam = sys.argv[3]  # plink .fam file
+    iterations = int(sys.argv[4])
+    outgroup = sys.argv[5]  # outgroup sample ID
+    # output files
+    consensus_file = sys.argv[6]
+
+    planes, number_snps, fam_rows = read_bed_planes(filename_bed, filename_bim, filename_fam)
+    sample_names = [line[1] for line in fam_rows]  # line[1] is sample ID
+    trees = get_bootstrap_trees(planes, number_snps, iterations, sample_names, outgroup)
+
+    # Create a consensus tree with the majority rule, the trees are not kept in memory
+    consensus_tree = majority_consensus(print_progress(trees), 0.5)
+
+    # Save the consensus tree to a newick file
+    write_newick(consensus_tree, consensus_file)
+
+
+main()
@@ -0,0 +1,234 @@
+"""
+This script:
+contains functions to make a phylogenetic tree from a distance matrix with the neighbor joining method, root it with an
+outgroup and write it as newick, with numpy instead of biopython
+    the tree is made the same way as DistanceTreeConstructor().nj of biopython: the pair with the lowest
+    d(i, j) - r(i) - r(j) (r = sum of the distances of the row divided by number of nodes - 2) is joined, the first pair
+    in the lower triangle when pairs are equal, the new node takes the place of j and i is removed
+    the row sums and the values of all pairs are computed at once on the dense matrix (memory O(n^2)), so joining n
+    samples takes n vectorized steps instead of n^3 python steps
+    the tree is rooted the same way as root_with_outgroup of biopython, and written as newick the same way as
+    Phylo.write of biopython 1.81 (the inner nodes are named Inner1, Inner2 etc., branch lengths with 5 decimals)
+    the tree is a dictionary with per node the name, the branch length and a list with the child nodes, the samples are
+    node 0 to n - 1 (in the order of the distance matrix), a consensus tree also has per node the support value
+    (confidences)
+    the same NeighborJoining.py is used by the quality control tool (common_scripts) and the consensus tree tool
+    (scripts), keep these copies the same
+"""
+import re
+import sys
+import numpy as np
+
+# names that can be written in a newick file without quotes (as biopython writes them)
+UNQUOTED_NAME = re.compile(r"[^\s()\[\]':;,]+")
+
+
+def add_node(tree, name, branch_length, children):
+    """
+    :param tree: tree made by neighbor_joining
+    :param name: name of the node, None for no name
+    :param branch_length: branch length to the parent of the node, None for no branch length
+    :param children: list with the child nodes
+    :return: number of the new node
+    """
+    tree['names'].append(name)
+    tree['lengths'].append(branch_length)
+    tree['children'].append(children)
+    return len(tree['names']) - 1
+
+
+def neighbor_joining(matrix, sample_names):
+    """
+    :param matrix: square matrix (samples x samples) with the distances between the samples, e.g. float32 from
+    IBSDistance.py
+    :param sample_names: list with the sample IDs, in the order of the matrix
+    :return: unrooted tree (dictionary with the lists names, lengths and children, and the root node) made with the
+    neighbor joining method, the same tree as DistanceTreeConstructor().nj of biopython makes
+    """
+    number_samples = len(sample_names)
+    if number_samples < 3:
+        sys.exit("ERROR: at least 3 samples are needed to make a neighbor joining tree")
+    if np.isnan(matrix).any():
+        sys.exit("ERROR: the distance matrix contains samples without SNPs called in both samples")
+    # the distances are updated in float64, as biopython computes them
+    distances = np.array(matrix, dtype=np.float64)
+    tree = {'names': list(sample_names), 'lengths': [None] * number_samples,
+            'children': [[] for _ in range(number_samples)], 'root': None}
+    nodes = list(range(number_samples))  # node of each row of the distance matrix
+    upper_triangle = np.triu(np.ones((number_samples, number_samples), dtype=bool))
+    inner_count = 0
+    while len(nodes) > 2:
+        size = len(nodes)
+        node_distances = distances.sum(axis=1) / (size - 2)
+        values = distances - node_distances[:, None] - node_distances[None, :]
+        values[upper_triangle[:size, :size]] = np.inf  # only pairs i > j, as biopython
+        min_i, min_j = divmod(int(np.argmin(values)), size)
+        if (min_i, min_j) == (1, 0):
+            min_i, min_j = 0, 1  # biopython starts with pair (0, 1), which is kept when it is the lowest
+
+        # the branch lengths of the joined nodes, negative branch lengths are 0
+        distance = distances[min_i, min_j]
+        length_i = (distance + node_distances[min_i] - node_distances[min_j]) / 2.0
+        length_j = distance - length_i
+        tree['lengths'][nodes[min_i]] = max(length_i, 0)
+        tree['lengths'][nodes[min_j]] = max(length_j, 0)
+        inner_count += 1
+        inner_node = add_node(tree, f"Inner{inner_count}", None, [nodes[min_i], nodes[min_j]])
+
+        # the distances of the new node take the place of j, and i is removed
+        new_distances = (distances[min_i] + distances[min_j] - distance) / 2.0
+        new_distances[min_j] = 0
+        distances[min_j], distances[:, min_j] = new_distances, new_distances
+        distances = np.delete(np.delete(distances, min_i, axis=0), min_i, axis=1)
+        nodes[min_j] = inner_node
+        del nodes[min_i]
+
+    # the last node is a child of the last inner node, which is the root
+    last_node = nodes[0] if nodes[1] == inner_node else nodes[1]
+    tree['lengths'][last_node] = distances[1, 0]
+    tree['lengths'][inner_node] = 0
+    tree['children'][inner_node].append(last_node)
+    tree['root'] = inner_node
+    return tree
+
+
+def get_path(tree, target):
+    """
+    :param tree: tree made by neighbor_joining
+    :param target: node to find
+    :return: list with the nodes from the root to target, without the root and with target (as get_path of biopython),
+    None if target is not in the tree
+    """
+    stack = [(tree['root'], [])]
+    while stack:
+        node, path = stack.pop()
+        if node == target:
+            return path
+        for child in reversed(tree['children'][node]):
+            stack.append((child, path + [child]))
+    return None
+
+
+def common_ancestor(tree, names):
+    """
+    :param tree: tree made by neighbor_joining
+    :param names: list with the sample IDs
+    :return: node of the most recent common ancestor of the samples (as common_ancestor of biopython)
+    """
+    paths = []
+    for name in names:
+        if name not in tree['names']:
+            sys.exit(f"ERROR: outgroup sample {name} is not in the tree")
+        paths.append(get_path(tree, tree['names'].index(name)))
+    ancestor = tree['root']
+    for level in zip(*paths):
+        if any(node != level[0] for node in level[1:]):
+            break
+        ancestor = level[0]
+    return ancestor
+
+
+def root_with_outgroup(tree, outgroup_names):
+    """
+    :param tree: tree made by neighbor_joining, is rooted in place
+    :param outgroup_names: list with the sample IDs of the outgroup
+    The tree is rerooted on the common ancestor of the outgroup, as root_with_outgroup of biopython: for one outgroup
+    sample a new root is made with a branch length of 0 to the outgroup, else the common ancestor becomes the root.
+    """
+    children, lengths = tree['children'], tree['lengths']
+    outgroup = common_ancestor(tree, outgroup_names)
+    outgroup_path = get_path(tree, outgroup)
+    if not outgroup_path:
+        return  # outgroup is the current root
+    previous_length = lengths[outgroup] or 0.0
+    if not children[outgroup]:
+        # a new root with a branch length of 0 to the outgroup sample
+        lengths[outgroup] = 0.0
+        new_root = add_node(tree, None, lengths[tree['root']], [outgroup])
+        if len(outgroup_path) == 1:
+            new_parent = new_root
+        else:
+            parent = outgroup_path.pop(-2)
+            children[parent].remove(outgroup)
+            previous_length, lengths[parent] = lengths[parent], previous_length
+            children[new_root].insert(0, parent)
+            new_parent = parent
+    else:
+        # the outgroup node becomes the new root
+        new_root = outgroup
+        lengths[new_root] = lengths[tree['root']]
+        new_parent = new_root
+
+    # reverse the branches between the old root and the outgroup
+    for parent in outgroup_path[-2::-1]:
+        children[parent].remove(new_parent)
+        previous_length, lengths[parent] = lengths[parent], previous_length
+        children[new_parent].insert(0, parent)
+        new_parent = parent
+
+    old_root = tree['root']
+    if outgroup in children[old_root]:
+        children[old_root].remove(outgroup)
+    else:
+        children[old_root].remove(new_parent)
+    if len(children[old_root]) == 1:
+        # the old bifurcating root is removed, its branch lengths are added
+        ingroup = children[old_root][0]
+        lengths[ingroup] = (lengths[ingroup] or 0.0) + previous_length
+        children[new_parent].insert(0, ingroup)
+    else:
+        lengths[old_root] = previous_length
+        children[new_parent].insert(0, old_root)
+    tree['root'] = new_root
+
+
+def format_name(name):
+    """
+    :param name: name of a node, None for no name
+    :return: name as written in the newick file, with quotes when needed
+    """
+    if not name:
+        return ''
+    match = UNQUOTED_NAME.match(name)
+    if not match or match.end() < len(name):
+        return "'" + name.replace("'", "''") + "'"
+    return name
+
+
+def get_newick(tree):
+    """
+    :param tree: tree made by neighbor_joining
+    :return: newick string of the tree (without newline)
+    The tree is written without recursion, so deep trees of many samples can be written. Support values are written
+    before the branch length of the inner nodes (as biopython writes them).
+    """
+    confidences = tree.get('confidences') or [None] * len(tree['names'])
+    parts = []
+    stack = [tree['root']]  # nodes to write, or text to write after the child nodes
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            parts.append(node)
+            continue
+        label = f"{format_name(tree['names'][node])}:{tree['lengths'][node] or 0.0:.5f}"
+        if not tree['children'][node]:
+            parts.append(label)
+            continue
+        if confidences[node] is not None:
+            label = f"{format_name(tree['names'][node])}{confidences[node]:.2f}:{tree['lengths'][node] or 0.0:.5f}"
+        parts.append('(')
+        stack.append(')' + label)
+        for index, child in enumerate(reversed(tree['children'][node])):
+            if index > 0:
+                stack.append(',')
+            stack.append(child)
+    return ''.join(parts) + ';'
+
+
+def write_newick(tree, newick_file):
+    """
+    :param tree: tree made by neighbor_joining
+    :param newick_file: output newick file
+    """
+    with open(newick_file, "w", newline='') as NewFile:
+        NewFile.write(get_newick(tree) + '\n')
@@ -0,0 +1,497 @@
+"""
+This script:
+contains functions to read and write plink binary genotype files (.bed) from python, so no plink step and no
+intermediate .ped/.map is needed
+    the .bed is SNP-major: for each SNP the genotypes of all samples, 4 samples per byte
+    each genotype is a 2 bit code:
+        00 = homozygous allele 1 (column 5 of .bim)
+        01 = missing
+        10 = heterozygous
+        11 = homozygous allele 2 (column 6 of .bim)
+    a .bed is read as a memory map, in chunks of SNPs or of samples the codes are decoded with a lookup table to int8
+    dosages: the number of copies of allele 1 (2, 1 or 0), and -1 for missing genotypes
+    for comparing samples (kinship and distance) the genotypes are packed as bit-planes: per sample one bit per SNP
+    for homozygous allele 1, heterozygous and homozygous allele 2 (8 SNPs per byte, missing genotypes in no plane)
+    the same PlinkBed.py is used by the convert tool (convert_files/common_scripts), the quality control tool
+    (quality_control_files/common_scripts) and the consensus tree tool (consensus_files/scripts), keep these copies the
+    same
+"""
+import os
+import sys
+import numpy as np
+
+BED_MAGIC = bytes([0x6c, 0x1b, 0x01])  # plink magic number + SNP-major mode
+HOM_A1 = 0
+MISSING = 1
+HET = 2
+HOM_A2 = 3
+# chromosome codes as plink --chr-set 38 writes them in the .bim file
+PLINK_CHROMOSOMES = {'X': '39', 'Y': '40', 'XY': '41', 'MT': '42', 'M': '42'}
+NUMBER_CHROMOSOMES = 42  # 38 autosomes + X, Y, XY and MT (--chr-set 38)
+
+# for every possible byte the four 2 bit codes it contains (first sample in the lowest bits)
+UNPACK_TABLE = np.array([[(byte >> shift) & 3 for shift in (0, 2, 4, 6)] for byte in range(256)], dtype=np.uint8)
+# swaps homozygous allele 1 and homozygous allele 2, used when allele 1 and 2 change places in the .bim
+SWAP_TABLE = np.array([HOM_A2, MISSING, HET, HOM_A1], dtype=np.uint8)
+# for every possible byte the byte with allele 1 and allele 2 swapped in all four codes
+SWAP_BYTE_TABLE = (SWAP_TABLE[UNPACK_TABLE] << np.array([0, 2, 4, 6], dtype=np.uint8)).sum(axis=1).astype(np.uint8)
+# number of copies of allele 1 and of allele 2 in each 2 bit code (missing counts for neither)
+ALLELE_COUNTS = np.array([[2, 0], [0, 0], [1, 1], [0, 2]], dtype=np.uint8)
+# dosage (number of copies of allele 1) of each 2 bit code
+MISSING_DOSAGE = -1
+DOSAGES = np.array([2, MISSING_DOSAGE, 1, 0], dtype=np.int8)
+# for every possible byte the four dosages it contains
+DOSAGE_TABLE = DOSAGES[UNPACK_TABLE]
+# 2 bit code of each dosage, indexed with dosage + 1 (missing, 0, 1 and 2 copies of allele 1)
+DOSAGE_CODES = np.array([MISSING, HOM_A2, HET, HOM_A1], dtype=np.uint8)
+# genotype code of each bit-plane
+PLANE_CODES = (HOM_A1, HET, HOM_A2)
+
+
+def bytes_per_snp(number_samples):
+    """
+    :param number_samples: number of samples in the .fam file
+    :return: number of bytes used for one SNP in the .bed file
+    """
+    return (number_samples + 3) // 4
+
+
+def pack_codes(codes):
+    """
+    :param codes: array with 2 bit genotype codes, last axis are the samples
+    :return: array with the codes packed 4 per byte, last axis has length bytes_per_snp(number of samples)
+    """
+    codes = np.asarray(codes, dtype=np.uint8)
+    number_samples = codes.shape[-1]
+    padding = bytes_per_snp(number_samples) * 4 - number_samples
+    if padding:
+        # padding is coded 00, as plink does
+        codes = np.concatenate([codes, np.zeros(codes.shape[:-1] + (padding,), dtype=np.uint8)], axis=-1)
+    codes = codes.reshape(codes.shape[:-1] + (codes.shape[-1] // 4, 4))
+    return codes[..., 0] | (codes[..., 1] << 2) | (codes[..., 2] << 4) | (codes[..., 3] << 6)
+
+
+def unpack_codes(packed, number_samples):
+    """
+    :param packed: array with packed genotype bytes, last axis are the bytes of one SNP (or of one sample)
+    :param number_samples: number of codes to return along the last axis (padding is removed)
+    :return: array with 2 bit genotype codes
+    """
+    packed = np.asarray(packed, dtype=np.uint8)
+    codes = UNPACK_TABLE[packed].reshape(packed.shape[:-1] + (-1,))
+    return codes[..., :number_samples]
+
+
+def decode_dosages(packed, number_samples):
+    """
+    :param packed: array with packed genotype bytes, last axis are the bytes of one SNP (or of one sample)
+    :param number_samples: number of dosages to return along the last axis (padding is removed)
+    :return: int8 array with the dosages (number of copies of allele 1, MISSING_DOSAGE for missing genotypes)
+    """
+    packed = np.asarray(packed, dtype=np.uint8)
+    dosages = DOSAGE_TABLE[packed].reshape(packed.shape[:-1] + (-1,))
+    return dosages[..., :number_samples]
+
+
+def encode_dosages(dosages):
+    """
+    :param dosages: array with dosages (number of copies of allele 1, MISSING_DOSAGE for missing genotypes)
+    :return: array with the 2 bit genotype codes of the dosages
+    """
+    return DOSAGE_CODES[np.asarray(dosages, dtype=np.intp) + 1]
+
+
+def encode_alleles(alleles, first_alleles, second_alleles):
+    """
+    :param alleles: list with alleles of one sample, as in a .ped file (allele 1 and 2 of each SNP after each other)
+    :param first_alleles: array with per SNP the first allele seen, '0' if none seen yet
+    :param second_alleles: array with per SNP the second allele seen, '0' if none seen yet
+    :return: array with 2 bit genotype codes for this sample (coded against first and second alleles), and the
+    number of genotypes with a third allele (these are set to missing, as plink does not allow more than 2 alleles)
+    """
+    alleles = np.array(alleles, dtype='U1').reshape(-1, 2)
+    allele1, allele2 = alleles[:, 0], alleles[:, 1]
+    # register the alleles that are seen for the first time
+    for allele in (allele1, allele2):
+        new = (first_alleles == '0') & (allele != '0')
+        first_alleles[new] = allele[new]
+    for allele in (allele1, allele2):
+        new = (second_alleles == '0') & (allele != '0') & (allele != first_alleles)
+        second_alleles[new] = allele[new]
+    # translate the alleles to genotype codes, half missing genotypes are missing
+    first1, first2 = allele1 == first_alleles, allele2 == first_alleles
+    second1, second2 = allele1 == second_alleles, allele2 == second_alleles
+    missing = (allele1 == '0') | (allele2 == '0')
+    third_allele = ~missing & ~((first1 | second1) & (first2 | second2))
+    codes = np.full(len(alleles), HET, dtype=np.uint8)
+    codes[first1 & first2] = HOM_A1
+    codes[second1 & second2] = HOM_A2
+    codes[missing | third_allele] = MISSING
+    return codes, int(np.count_nonzero(third_allele))
+
+
+def orient_minor_allele(codes, first_alleles, second_alleles, zero_unobserved=True):
+    """
+    :param codes: array with 2 bit genotype codes (SNPs x samples), coded against first_alleles (00) and
+    second_alleles (11)
+    :param first_alleles: array with the allele coded as 00 for each SNP ('0' if not observed)
+    :param second_alleles: array with the allele coded as 11 for each SNP ('0' if not observed)
+    :param zero_unobserved: set alleles that are not observed to 0, as plink does for .ped input (for VCF input plink
+    keeps the alleles of the VCF)
+    :return: codes, allele 1 and allele 2 arrays, oriented the way plink does when making a .bed:
+    allele 1 is the minor allele, and for monomorphic SNPs allele 1 is 0
+    """
+    count_first = 2 * np.count_nonzero(codes == HOM_A1, axis=1) + np.count_nonzero(codes == HET, axis=1)
+    count_second = 2 * np.count_nonzero(codes == HOM_A2, axis=1) + np.count_nonzero(codes == HET, axis=1)
+    if zero_unobserved:
+        # alleles that are not observed in any genotype are 0 in the .bim
+        first_alleles = np.where(count_first > 0, first_alleles, '0')
+        second_alleles = np.where(count_second > 0, second_alleles, '0')
+    swap = (count_first > count_second) | (second_alleles == '0')
+    codes = np.where(swap[:, None], SWAP_TABLE[codes], codes)
+    allele1 = np.where(swap, second_alleles, first_alleles)
+    allele2 = np.where(swap, first_alleles, second_alleles)
+    return codes, allele1, allele2
+
+
+def count_alleles(packed, number_samples):
+    """
+    :param packed: array with the packed genotype bytes of SNPs (SNPs x bytes_per_snp(number_samples))
+    :param number_samples: number of samples in the .fam file, the padding codes of the last byte are not counted
+    :return: arrays with per SNP the number of copies of allele 1 and of allele 2
+    """
+    counts = ALLELE_COUNTS[UNPACK_TABLE[packed]].reshape(len(packed), -1, 2)[:, :number_samples]
+    counts = counts.sum(axis=1, dtype=np.int64)
+    return counts[:, 0], counts[:, 1]
+
+
+def swap_alleles(packed, number_samples):
+    """
+    :param packed: array with the packed genotype bytes of SNPs (SNPs x bytes_per_snp(number_samples))
+    :param number_samples: number of samples in the .fam file
+    :return: packed genotype bytes with allele 1 and allele 2 swapped, padding codes stay 00
+    """
+    packed = SWAP_BYTE_TABLE[packed]
+    padding = bytes_per_snp(number_samples) * 4 - number_samples
+    if padding:
+        packed[:, -1] &= 0xff >> (2 * padding)
+    return packed
+
+
+def open_bed(bed_filename, number_snps, number_samples):
+    """
+    :param bed_filename: .bed file (SNP-major)
+    :param number_snps: number of SNPs in the .bim file
+    :param number_samples: number of samples in the .fam file
+    :return: read-only memory map of the genotype bytes (SNPs x bytes_per_snp(number_samples))
+    """
+    with open(bed_filename, mode="rb") as DataBED:
+        magic = DataBED.read(len(BED_MAGIC))
+    if magic != BED_MAGIC:
+        sys.exit(f"ERROR: {bed_filename} is not a SNP-major plink .bed file")
+    snp_bytes = bytes_per_snp(number_samples)
+    if os.path.getsize(bed_filename) != len(BED_MAGIC) + number_snps * snp_bytes:
+        sys.exit(f"ERROR: size of {bed_filename} does not match {number_snps} SNPs and {number_samples} samples")
+    if not number_snps or not snp_bytes:
+        return np.zeros((number_snps, snp_bytes), dtype=np.uint8)
+    return np.memmap(bed_filename, dtype=np.uint8, mode='r', offset=len(BED_MAGIC), shape=(number_snps, snp_bytes))
+
+
+def read_plink_rows(file):
+    """
+    :param file: input .bim or .fam file
+    :return: list with the split rows (plink allows tabs and spaces between the columns)
+    """
+    rows = []
+    for line in file:
+        line = line.split()
+        if line:
+            rows.append(line)
+    return rows
+
+
+def read_bed(prefix):
+    """
+    :param prefix: prefix of the .bed, .bim and .fam file
+    :return: memory map of the .bed (made by open_bed), the rows of the .bim file and the rows of the .fam file
+    """
+    with open(prefix + '.bim', mode="r") as DataBIM, \
+            open(prefix + '.fam', mode="r") as DataFAM:
+        bim_rows = read_plink_rows(DataBIM)
+        fam_rows = read_plink_rows(DataFAM)
+    return open_bed(prefix + '.bed', len(bim_rows), len(fam_rows)), bim_rows, fam_rows
+
+
+def index_chromosomes(bim_rows):
+    """
+    :param bim_rows: list with the rows of the .bim file
+    :return: dictionary with per chromosome a list with the ranges [first SNP, last SNP + 1] of this chromosome in the
+    .bed (one range when the .bim is sorted on chromosome, as plink --make-bed writes it)
+    """
+    chromosome_index = {}
+    for index, row in enumerate(bim_rows):
+        ranges = chromosome_index.setdefault(row[0], [])  # row[0] is chromosome
+        if ranges and ranges[-1][1] == index:
+            ranges[-1][1] = index + 1
+        else:
+            ranges.append([index, index + 1])
+    return chromosome_index
+
+
+def get_chromosome_snps(chromosome_index, chromosome):
+    """
+    :param chromosome_index: dictionary made by index_chromosomes
+    :param chromosome: chromosome as written in the .bim file (e.g. '40' for Y)
+    :return: array with the index of the SNPs of the chromosome in the .bed, empty if the chromosome has no SNPs
+    """
+    ranges = chromosome_index.get(chromosome, [])
+    return np.concatenate([np.arange(start, end) for start, end in ranges] + [np.zeros(0, dtype=np.intp)])
+
+
+def iter_snp_dosages(data, number_samples, snps=None, chunk_size=4096):
+    """
+    :param data: memory map of a .bed, made by open_bed
+    :param number_samples: number of samples in the .fam file
+    :param snps: array with the index of the SNPs to read (e.g. the SNPs of one chromosome), None for all SNPs
+    :param chunk_size: number of SNPs that are decoded at once, this bounds the memory use
+    :return: generator with (index of the SNPs in the chunk, dosages of the chunk (SNPs x samples))
+    """
+    snps = np.arange(len(data)) if snps is None else np.asarray(snps, dtype=np.intp)
+    for start in range(0, len(snps), chunk_size):
+        chunk = snps[start:start + chunk_size]
+        yield chunk, decode_dosages(data[chunk], number_samples)
+
+
+def iter_sample_dosages(data, number_samples, snps=None, chunk_size=1024):
+    """
+    :param data: memory map of a .bed, made by open_bed
+    :param number_samples: number of samples in the .fam file
+    :param snps: array with the index of the SNPs to read, None for all SNPs
+    :param chunk_size: number of samples that are decoded at once, this bounds the memory use
+    :return: generator with (index of the first sample of the chunk, dosages of the chunk (samples x SNPs))
+    """
+    chunk_size = max(chunk_size - chunk_size % 4, 4)  # chunks start at a byte border
+    snps = slice(None) if snps is None else np.asarray(snps, dtype=np.intp)
+    for start in range(0, number_samples, chunk_size):
+        stop = min(start + chunk_size, number_samples)
+        packed = np.asarray(data[snps, start // 4:(stop + 3) // 4])
+        yield start, np.ascontiguousarray(decode_dosages(packed, stop - start).T)
+
+
+def unpack_genotype_bits(packed, number_samples):
+    """
+    :param packed: array with the packed genotype bytes of SNPs (SNPs x bytes)
+    :param number_samples: number of samples in the .fam file
+    :return: arrays (SNPs x samples) with 1 where the genotype is missing, and with 1 where the genotype is heterozygous
+    A missing code (01) has only the low bit set and a heterozygous code (10) only the high bit, these bits are masked
+    out of each byte and unpacked, without decoding the codes with a lookup table.
+    """
+    packed = np.asarray(packed, dtype=np.uint8)
+    low, high = packed & 0x55, (packed >> 1) & 0x55
+    bits = []
+    for mask in (low & ~high, high & ~low):
+        # the bits of sample 0 to 3 of a byte are at bit position 0, 2, 4 and 6
+        mask = np.unpackbits(mask[..., None], axis=-1, bitorder='little')[..., ::2]
+        bits.append(mask.reshape(packed.shape[:-1] + (-1,))[..., :number_samples])
+    return bits[0], bits[1]
+
+
+def count_sample_genotypes(data, number_samples, snps=None, chunk_size=4096):
+    """
+    :param data: memory map of a .bed, made by open_bed
+    :param number_samples: number of samples in the .fam file
+    :param snps: array with the index of the SNPs to count (e.g. the SNPs of one chromosome), None for all SNPs
+    :param chunk_size: number of SNPs that are counted at once, this bounds the memory use
+    :return: arrays with per sample the number of missing and the number of heterozygous genotypes
+    """
+    snps = np.arange(len(data)) if snps is None else np.asarray(snps, dtype=np.intp)
+    count_missing = np.zeros(number_samples, dtype=np.int64)
+    count_het = np.zeros(number_samples, dtype=np.int64)
+    for start in range(0, len(snps), chunk_size):
+        missing, het = unpack_genotype_bits(data[snps[start:start + chunk_size]], number_samples)
+        count_missing += missing.sum(axis=0, dtype=np.int64)
+        count_het += het.sum(axis=0, dtype=np.int64)
+    return count_missing, count_het
+
+
+def make_bit_planes(codes):
+    """
+    :param codes: array with genotype codes (SNPs x samples), the number of SNPs is a multiple of 8 (or the last chunk)
+    :return: array with the bit-planes (planes x samples x bytes), 8 SNPs per byte
+    """
+    return np.stack([np.packbits((codes == code).T, axis=1) for code in PLANE_CODES])
+
+
+def get_bit_planes(data, number_samples, snps, swap=None, samples=None, chunk_size=4096):
+    """
+    :param data: memory map of a .bed, made by open_bed
+    :param number_samples: number of samples in the .fam file
+    :param snps: array with per SNP of the planes the index of the SNP in the .bed, -1 when the SNP is not in the .bed
+    :param swap: boolean array with per SNP whether allele 1 and 2 are swapped, None for no swaps
+    :param samples: array with the index of the samples to make planes for, None for all samples
+    :param chunk_size: number of SNPs that are decoded at once (multiple of 8)
+    :return: array with the bit-planes (planes x samples x bytes)
+    """
+    snps = np.asarray(snps, dtype=np.intp)
+    samples = np.arange(number_samples) if samples is None else samples
+    planes = np.zeros((len(PLANE_CODES), len(samples), (len(snps) + 7) // 8), dtype=np.uint8)
+    for start in range(0, len(snps), chunk_size):
+        chunk = snps[start:start + chunk_size]
+        codes = np.full((len(chunk), len(samples)), MISSING, dtype=np.uint8)
+        found = chunk >= 0
+        if found.any():
+            codes[found] = unpack_codes(data[chunk[found]], number_samples)[:, samples]
+        if swap is not None:
+            chunk_swap = swap[start:start + chunk_size]
+            codes[chunk_swap] = SWAP_TABLE[codes[chunk_swap]]
+        planes[:, :, start // 8:(start + len(chunk) + 7) // 8] = make_bit_planes(codes)
+    return planes
+
+
+def align_snps(snp_ids, first_alleles, second_alleles, bim_rows):
+    """
+    :param snp_ids: list with the SNP ids to align to (e.g. the SNPs of a database)
+    :param first_alleles: list with allele 1 of these SNPs
+    :param second_alleles: list with allele 2 of these SNPs
+    :param bim_rows: list with the rows of the .bim file to align
+    :return: array with per SNP id the index of the SNP in the .bed of bim_rows (-1 if not present or other alleles),
+    and boolean array with per SNP id whether allele 1 and 2 are swapped in bim_rows
+    The SNPs are matched on SNP id, and allele 1 and 2 are swapped where the .bim has them the other way around, as
+    plink --bmerge does. SNPs with other alleles are not used.
+    """
+    positions = {}
+    for position, row in enumerate(bim_rows):
+        positions.setdefault(row[1], position)  # row[1] is SNP id
+    snps = np.full(len(snp_ids), -1, dtype=np.intp)
+    swap = np.zeros(len(snp_ids), dtype=bool)
+    for number, (snp, first, second) in enumerate(zip(snp_ids, first_alleles, second_alleles)):
+        position = positions.get(snp)
+        if position is None:
+            continue
+        # alleles coded as 0 are unknown (monomorphic SNP), these match any allele
+        input_first, input_second = bim_rows[position][4], bim_rows[position][5]
+        if input_first in (first, '0') and input_second in (second, '0') or first == '0' and input_second == second:
+            snps[number] = position
+        elif input_first in (second, '0') and input_second in (first, '0') or second == '0' and input_first == first:
+            snps[number] = position
+            swap[number] = True
+    return snps, swap
+
+
+def write_bed_dosages(bed_filename, chunks):
+    """
+    :param bed_filename: new .bed file (SNP-major)
+    :param chunks: iterable with arrays of dosages (SNPs x samples), written after each other
+    """
+    with open(bed_filename, "wb") as NewFileBED:
+        NewFileBED.write(BED_MAGIC)
+        for dosages in chunks:
+            NewFileBED.write(pack_codes(encode_dosages(dosages)).tobytes())
+
+
+def iter_snp_chunks(sample_major_file, number_samples, number_snps, chunk_size=4096):
+    """
+    :param sample_major_file: file with per sample the packed codes of all SNPs (sample after sample)
+    :param number_samples: number of samples in the file
+    :param number_snps: number of SNPs per sample
+    :param chunk_size: number of SNPs to transpose at once, this bounds the memory use
+    :return: generator with (index of first SNP, codes of the chunk (SNPs x samples))
+    """
+    chunk_size -= chunk_size % 4  # chunks start at a byte border
+    sample_bytes = bytes_per_snp(number_snps)
+    data = np.memmap(sample_major_file, dtype=np.uint8, mode='r', shape=(number_samples, sample_bytes))
+    for start in range(0, number_snps, chunk_size):
+        stop = min(start + chunk_size, number_snps)
+        packed = np.asarray(data[:, start // 4:(stop + 3) // 4])
+        codes = unpack_codes(packed, stop - start)
+        yield start, np.ascontiguousarray(codes.T)
+    del data
+
+
+def remove_snps(bed_filename, keep, number_samples, chunk_size=4096):
+    """
+    :param bed_filename: .bed file (SNP-major), is replaced by a .bed file with only the SNPs to keep
+    :param keep: boolean array with per SNP in the .bed file whether it is kept
+    :param number_samples: number of samples in the .bed file
+    :param chunk_size: number of SNPs that are copied at once
+    """
+    snp_bytes = bytes_per_snp(number_samples)
+    data = np.memmap(bed_filename, dtype=np.uint8, mode='r', offset=len(BED_MAGIC), shape=(len(keep), snp_bytes))
+    temp_filename = bed_filename + '.temp'
+    with open(temp_filename, "wb") as NewFileBED:
+        NewFileBED.write(BED_MAGIC)
+        for start in range(0, len(keep), chunk_size):
+            NewFileBED.write(np.asarray(data[start:start + chunk_size][keep[start:start + chunk_size]]).tobytes())
+    del data
+    os.replace(temp_filename, bed_filename)
+
+
+def reorder_snps(bed_filename, order, number_samples, chunk_size=4096):
+    """
+    :param bed_filename: .bed file (SNP-major), is replaced by a .bed file with the SNPs in the new order
+    :param order: array with the index of the SNPs in the .bed file, in the new order
+    :param number_samples: number of samples in the .bed file
+    :param chunk_size: number of SNPs that are copied at once
+    """
+    snp_bytes = bytes_per_snp(number_samples)
+    data = np.memmap(bed_filename, dtype=np.uint8, mode='r', offset=len(BED_MAGIC), shape=(len(order), snp_bytes))
+    temp_filename = bed_filename + '.temp'
+    with open(temp_filename, "wb") as NewFileBED:
+        NewFileBED.write(BED_MAGIC)
+        for start in range(0, len(order), chunk_size):
+            NewFileBED.write(data[np.asarray(order[start:start + chunk_size], dtype=np.intp)].tobytes())
+    del data
+    os.replace(temp_filename, bed_filename)
+
+
+def copy_snps(data, new_bed_filename, order, swap, number_samples, chunk_size=4096):
+    """
+    :param data: memory map of the input .bed, made by open_bed
+    :param new_bed_filename: new .bed file (SNP-major)
+    :param order: array with the index of the SNPs in the input .bed that are written, in the new order
+    :param swap: boolean array with per SNP in order whether allele 1 and allele 2 change places
+    :param number_samples: number of samples in the .fam file
+    :param chunk_size: maximum number of SNPs that are written at once
+    SNPs that follow each other in the input .bed are written as one slice of the memory map, so the bytes are not
+    copied in memory, only SNPs with swapped alleles are translated
+    """
+    order = np.asarray(order, dtype=np.intp)
+    swap = np.asarray(swap, dtype=bool)
+    # a new run starts where a SNP does not follow the previous SNP in the input .bed, or the swap status changes
+    starts = np.flatnonzero(np.append(True, (np.diff(order) != 1) | (swap[1:] != swap[:-1]))) if len(order) else []
+    stops = np.append(starts[1:], len(order)) if len(order) else []
+    with open(new_bed_filename, "wb") as NewFileBED:
+        NewFileBED.write(BED_MAGIC)
+        for start, stop in zip(starts, stops):
+            for chunk_start in range(start, stop, chunk_size):
+                first = order[chunk_start]
+                block = data[first:first + min(chunk_size, stop - chunk_start)]
+                if swap[start]:
+                    block = swap_alleles(block, number_samples)
+                NewFileBED.write(block)
+
+
+def get_sort_order(bim_rows):
+    """
+    :param bim_rows: list with the rows of the new .bim file
+    :return: order of the rows sorted on chromosome and location (as plink --make-bed sorts), None if already sorted
+    chromosomes X, Y, XY and MT are sorted as 39, 40, 41 and 42 (as plink --chr-set 38 codes them)
+    """
+    keys = []
+    for row in bim_rows:
+        chromosome = PLINK_CHROMOSOMES.get(row[0].upper(), row[0])  # row[0] is chromosome
+        if not chromosome.isdigit():
+            sys.exit(f"ERROR: invalid chromosome code {row[0]} for SNP {row[1]}, cannot sort the .bim file")
+        keys.append((int(chromosome), int(row[3])))  # row[3] is basepair position
+    if all(keys[index] <= keys[index + 1] for index in range(len(keys) - 1)):
+        return None
+    return sorted(range(len(keys)), key=keys.__getitem__)
+
+
+def write_fam(file, sample_ids):
+    """
+    :param file: new .fam file
+    :param sample_ids: list with sample ids, used as family and individual id
+    """
+    for sample in sample_ids:
+        file.write(f'{sample} {sample} 0 0 0 -9\n')
@@ -1,33 +1,27 @@
 """
 This script:
-Reformats the distance matrix, so it can be used by the PHYLIP package.
-A new file with this new format is written.
+Writes the 1-IBS distance matrices of x (amount of iterations) bootstrap datasets in the format of the PHYLIP package,
+all matrices after each other in one file. The .bed is read once, the distance matrices are computed in python from
+multinomial SNP weights (BootstrapSamples.py), as plink --extract --distance square 1-ibs of a bootstrapped SNP list.
 The phylip format does not allow for sample IDs longer than 10 characters and wants a specific format for the IDs,
 so the sample ids are recoded to a temporary id. This is written to a file, so they can be reversed later.
 """
 import csv
+import os
 import sys
+import numpy as np
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from BootstrapSamples import read_bed_planes, get_bootstrap_distances
 
 
-def split_and_strip(line, delimiter='\t'):
+def make_temp_ids(fam_rows, writer):
     """
-    :param line: row of input file
-    :param delimiter: the delimiter to use
-    :return: stripped and split row
-    """
-    split_line = line.strip().split(delimiter)
-    return split_line
-
-
-def make_temp_ids(file, writer):
-    """
-    :param file: input file (.mdist.id file)
+    :param fam_rows: list with the .fam rows of the samples in the distance matrix
     :param writer: which writer to use
     :return: a list with the new temporary ids and the number of total samples
     """
     new_ids = []
-    for index, line in enumerate(file):
-        line = split_and_strip(line)
+    for index, line in enumerate(fam_rows):
         index += 1
         zeros = 8 - len(str(index))  # calculate how many zero's should be added to sample ID
         temp_id = 'S'  # the new id starts with an S
@@ -40,45 +34,70 @@ def make_temp_ids(file, writer):
     return new_ids, number_samples
 
 
-def reformat_dist(file, writer, number_samples, new_ids):
+def format_distances(matrix):
     """
-    :param file: input .mdist file (distance matrix)
-    :param writer: which writer to use
+    :param matrix: rows of a distance matrix with distances from 0 to 1
+    :return: array (rows x characters) with per row the distances written with 7 decimals, each after a space
+    The distances are rounded as plink writes them (6 significant digits, so 6 decimals from 0.1 and 7 decimals below
+    0.1) and padded with zeros to the same length (otherwise phylip gives error), as numbers of 1e-7 units, so a whole
+    block of rows is written at once with numpy instead of per distance.
+    """
+    if np.isnan(matrix).any():
+        sys.exit("ERROR: the distance matrix contains samples without SNPs called in both samples")
+    decimals = np.where(matrix >= 0.1, 6, 7)
+    scaled = matrix * 10.0 ** decimals
+    units = np.rint(scaled)
+    # near a tie the rounded product can differ from the rounded distance, these few are rounded as python does
+    for row, column in zip(*np.nonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)):
+        decimal = decimals[row, column]
+        units[row, column] = int(f"{matrix[row, column]:.{decimal}f}".replace('.', ''))
+    units = (units * 10.0 ** (7 - decimals)).astype(np.int64)
+    digits = (units[:, :, None] // 10 ** np.arange(7, -1, -1) % 10).astype(np.uint8) + ord('0')
+    characters = np.empty(matrix.shape + (10,), dtype=np.uint8)
+    characters[:, :, 0] = ord(' ')
+    characters[:, :, 1] = digits[:, :, 0]
+    characters[:, :, 2] = ord('.')
+    characters[:, :, 3:] = digits[:, :, 1:]
+    return characters.reshape(len(matrix), -1)
+
+
+def reformat_dist(matrix, new_file, number_samples, new_ids, block_size=256):
+    """
+    :param matrix: square matrix with the distances between the samples
+    :param new_file: output file opened in binary mode
     :param number_samples: number of total samples in distance matrix file
     :param new_ids: list with the new temporary sample ids
+    :param block_size: number of rows that are formatted at once, this bounds the memory use
     """
-    for index_file, line in enumerate(file):
-        if index_file == 0:
-            writer.writerow([number_samples])  # print the number of samples on row 1 in the new reformatted matrix file
-        line = split_and_strip(line)
-        # changing the distance values to make them all the same length (otherwise phylip gives error)
-        for index, number in enumerate(line):
-            if '.' not in number:
-                number += '.0'
-            missing_zeros = 9 - len(number)
-            for zero in range(missing_zeros):
-                number += '0'
-            line[index] = number
-        new_line = [new_ids[index_file]] + line
-        writer.writerow(new_line)
+    new_file.write(f"{number_samples}\r\n".encode())  # the number of samples on row 1 (as written by csv.writer)
+    ids = np.frombuffer(''.join(new_ids).encode(), dtype=np.uint8).reshape(number_samples, -1)
+    line_end = np.frombuffer(b'\r\n', dtype=np.uint8)
+    for start in range(0, number_samples, block_size):
+        rows = slice(start, start + block_size)
+        distances = format_distances(np.asarray(matrix[rows]))
+        lines = np.concatenate([ids[rows], distances, np.broadcast_to(line_end, (len(distances), 2))], axis=1)
+        new_file.write(lines.tobytes())
 
 
 def main():
-    new_file = sys.argv[2]
-    iterations = int(sys.argv[4]) + 1
-    with open(new_file, "w", newline='') as NewFile:
-        writer = csv.writer(NewFile, delimiter=' ')
-        for i in range(1, iterations):  # iterate over the distance matrices to reformat them all
-            distance_matrix = sys.argv[1] + f"_{i}.mdist"
-            distance_matrix_ids = sys.argv[1] + f"_{i}.mdist.id"
-            if i == 1:  # the new file with the original and new temporary sample IDs needs only to be made once.
-                new_file_ids = sys.argv[3]
-                with open(distance_matrix_ids, mode="r") as DistID, \
-                        open(new_file_ids, "w", newline='') as NewFileIDs:
-                    writer_ids = csv.writer(NewFileIDs, delimiter=' ')
-                    new_ids, number_samples = make_temp_ids(DistID, writer_ids)
-            with open(distance_matrix, mode="r") as Dist:  # reformat the distance matrices and write them all to 1 file
-                reformat_dist(Dist, writer, number_samples, new_ids)
+    # input files
+    filename_bed = sys.argv[1]  # plink .bed file
+    filename_bim = sys.argv[2]  # plink .bim file
+    filename_fam = sys.argv[3]  # plink .fam file
+    iterations = int(sys.argv[6])
+    # output files
+    new_file = sys.argv[4]
+    new_file_ids = sys.argv[5]
+
+    planes, number_snps, fam_rows = read_bed_planes(filename_bed, filename_bim, filename_fam)
+
+    with open(new_file, "wb") as NewFile, \
+            open(new_file_ids, "w", newline='') as NewFileIDs:
+        # the new file with the original and new temporary sample IDs needs only to be made once
+        new_ids, number_samples = make_temp_ids(fam_rows, csv.writer(NewFileIDs, delimiter=' '))
+        # make the distance matrices and write them all to 1 file
+        for matrix in get_bootstrap_distances(planes, number_snps, iterations):
+            reformat_dist(matrix, NewFile, number_samples, new_ids)
 
 
 main()
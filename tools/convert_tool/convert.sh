@@ -15,6 +15,9 @@ p_option=0
 h_option=0
 t_option=0
 l_option=0
+d_option=0
+c_option=0
+chunk_size=4096
 
 # Extra arguments for Galaxy
 x_option=0
@@ -22,7 +25,7 @@ z_option=0
 
 
 # define options and capture input
-while getopts ":i:e:a:o:x:z:f:n:w:v:tlhp:z:" option; do
+while getopts ":i:e:a:o:x:z:f:n:w:v:c:tldhp:z:" option; do
   case $option in
     i)  # input flag for .bim file
       file_bim="$OPTARG"
@@ -71,6 +74,12 @@ while getopts ":i:e:a:o:x:z:f:n:w:v:tlhp:z:" option; do
       ;;
     l) # flag for filtered locations file of vcf present
       l_option=1;;
+    d) # flag for writing the .bed .bim .fam files directly with python, without intermediate .map .ped files
+      d_option=1;;
+    c) # flag for the number of rows of the wisdom file that are converted at once
+      chunk_size="$OPTARG"
+      c_option=1
+      ;;
     h)  #flag for help
       h_option=1;;
     x)  # input flag for tool path
@@ -104,7 +113,7 @@ shift "$(( OPTIND -1 ))"
 
 # output for help option -h
 if [ $h_option -eq 1 ]; then
-  echo "USAGE: convert.sh [-i|e|a|o|f|n|w|v|p|h|t]"
+  echo "USAGE: convert.sh [-i|e|a|o|f|n|w|v|p|h|t|l|d|c]"
   echo -e "\nCommand line tool to convert input files to a uniform format"
   echo -e "Author: Marilijn van Rumpt - marilijn@live.nl (2024)"
   echo -e "\nSYNTAX OPTIONS:"
@@ -114,21 +123,28 @@ if [ $h_option -eq 1 ]; then
   echo -e "\t-o <prefix_filename> \tSpecify prefix for output files. Obligatory"
   echo -e "\t-f <prefix_filename> \tSpecify prefix for .bed + .fam +. bim file"
   echo -e "\t-n <filename> \t\tSpecify full name of final report file of Neogen 220K or 170K"
-  echo -e "\t-w <filename> \t\tSpecify full name of Wisdom file (xlsx)"
+  echo -e "\t-w <filename> \t\tSpecify full name of Wisdom file (xlsx, or tab or comma separated text file)"
   echo -e "\t-v <filename> \t\tSpecify full name of VCF.gz canfam 3 or 4 file (WGS)"
   echo -e "\t-t \t\t\tTo indicate a .tbi file of the VCF file is already present, and skip the step of indexing the raw vcf"
   echo -e "\t-l \t\t\tTo indicate a file with filtered locations from raw vcf file is present, and skip step of filtering locations"
+  echo -e "\t-d \t\t\tTo write the .bed .bim .fam files directly, without intermediate .map .ped files (needs python package numpy). Only for neogen220, wisdom, vcf3, vcf4, embark, lupa170 and mdd"
+  echo -e "\t-c <number> \t\tSpecify number of rows of the Wisdom file that are converted at once (default 4096). Only for wisdom"
   echo -e "\t-p <platform> \t\tSpecify platform, options: embark, neogen170, neogen220, lupa170, mdd, wisdom, vcf3, vcf4, affymetrix. Obligatory"
   echo -e "\t-h \t\t\tPrint the help overview \n"
   echo -e "\nEXAMPLES:"
   echo -e "\tbash convert.sh -f inputfile -p embark -o newfilename"
+  echo -e "\tbash convert.sh -f inputfile -d -p embark -o newfilename"
   echo -e "\tbash convert.sh -a inputfile.fam -i inputfile.bim -e inputfile.bed -p mdd -o newfilename"
   echo -e "\tbash convert.sh -n inputfile -p neogen220 -o newfilename"
+  echo -e "\tbash convert.sh -n inputfile -d -p neogen220 -o newfilename"
+  echo -e "\tbash convert.sh -w inputfile.xlsx -d -p wisdom -o newfilename"
+  echo -e "\tbash convert.sh -w inputfile.txt -c 10000 -p wisdom -o newfilename"
   echo -e "\tbash convert.sh -v inputfile.vcf.gz -t -p vcf3 -o newfilename"
-  echo -e "\tbash convert.sh -v inputfile_filtered_locations.vcf -l -p vcf3 -o newfilename\n"
+  echo -e "\tbash convert.sh -v inputfile_filtered_locations.vcf -l -p vcf3 -o newfilename"
+  echo -e "\tbash convert.sh -v inputfile.vcf.gz -d -p vcf4 -o newfilename\n"
   echo -e "\nDEPENDENCIES NEEDED:"
-  echo -e "\tpython3, with packages pandas and openpyxl (only needed for converting wisdom files)"
-  echo -e "\tperl"
+  echo -e "\tpython3 package openpyxl (only needed for converting wisdom xlsx files)"
+  echo -e "\tpython3 package numpy (only needed for option -d and for converting wisdom, vcf3, vcf4 and affymetrix files)"
   echo -e "\tplink 1.9 (included in this tool)"
   echo -e "\nSYNTAX OPTIONS PER PLATFORM:"
   echo "-p embark:"
@@ -137,6 +153,7 @@ if [ $h_option -eq 1 ]; then
   echo -e "\tFor platform use -p embark"
   echo "-p neogen220:"
   echo -e "\tFor specifying input files, use -n"
+  echo -e "\tUse -d to write the .bed .bim .fam files directly from the final report, without plink"
   echo -e "\tOptions -i,-e-,a,-f, -w, -v, -t, -l cannot be used"
   echo -e "\tFor platform use -p neogen220"
   echo "-p neogen170:"
@@ -145,6 +162,8 @@ if [ $h_option -eq 1 ]; then
   echo -e "\tFor platform use -p neogen170"
   echo "-p wisdom:"
   echo -e "\tFor specifying input files, use -w"
+  echo -e "\tUse -d to write the .bed .bim .fam files directly from the wisdom file, without plink"
+  echo -e "\tUse -c to set the number of rows of the wisdom file that are converted at once"
   echo -e "\tOptions -i,-e-,a,-f, -n, -v, -t, -l cannot be used"
   echo -e "\tFor platform use -p wisdom"
   echo "-p mdd:"
@@ -159,12 +178,14 @@ if [ $h_option -eq 1 ]; then
   echo -e "\tFor specifying input files, use -v"
   echo -e "\tUse -t to indicate .tbi (indexed vcf) file is already present. Use in combination with -v."
   echo -e "\tUse -l to indicate .vcf file with filtered locations from the raw vcf file is already present. Specify file with -v."
+  echo -e "\tUse -d to read the vcf file and write the .bed .bim .fam files directly, without tabix and plink. Option -t cannot be used with -d"
   echo -e "\tOptions -i,-e-,a,-f, -n, -w cannot be used"
   echo -e "\tFor platform use -p vcf3"
   echo "-p vcf4:"
   echo -e "\tFor specifying input files, use -v"
   echo -e "\tUse -t to indicate .tbi (indexed vcf) file is already present. Use in combination with -v."
   echo -e "\tUse -l to indicate .vcf file with filtered locations from the raw vcf file is already present. Specify file with -v."
+  echo -e "\tUse -d to read the vcf file and write the .bed .bim .fam files directly, without tabix and plink. Option -t cannot be used with -d"
   echo -e "\tOptions -i,-e-,a,-f, -n, -w cannot be used"
   echo -e "\tFor platform use -p vcf4"
   echo "-p affymetrix:"
@@ -220,6 +241,41 @@ fi
 # Check if python3 is installed
 command -v python3 >/dev/null 2>&1 || { echo "ERROR: Python 3 is not installed" >&2; exit 1;}
 
+# Error if -d is used for a platform that does not support it
+if [ $d_option -eq 1 ] && [ "$platform" != 'neogen220' ] && [ "$platform" != 'wisdom' ] \
+&& [ "$platform" != 'vcf3' ] && [ "$platform" != 'vcf4' ] && [ "$platform" != 'embark' ] \
+&& [ "$platform" != 'lupa170' ] && [ "$platform" != 'mdd' ]; then
+  echo "ERROR: option -d can only be used for platforms neogen220, wisdom, vcf3, vcf4, embark, lupa170 and mdd"
+  exit 1
+fi
+
+# Error if -d is used with extra plink arguments, with -d the .bed file is written without plink
+if [ $d_option -eq 1 ] && [ -n "$extra_plinkargs" ]; then
+  echo "ERROR: option -z cannot be used together with option -d, the .bed file is then made without plink" 2>&1 | tee -a "$log_file"
+  exit 1
+fi
+
+# Error if -c is used for a platform that does not support it, or is not a positive number
+if [ $c_option -eq 1 ] && [ "$platform" != 'wisdom' ]; then
+  echo "ERROR: option -c can only be used for platform wisdom"
+  exit 1
+fi
+if ! [[ "$chunk_size" =~ ^[1-9][0-9]*$ ]]; then
+  echo "ERROR: option -c needs a positive number of rows"
+  exit 1
+fi
+
+# Check if numpy python package is installed, needed for writing .bed files directly and for the position index of
+# the vcf and affymetrix converters
+if [ $d_option -eq 1 ] || [ "$platform" = 'vcf3' ] || [ "$platform" = 'vcf4' ] || [ "$platform" = 'affymetrix' ]; then
+  python3 -c "import pkgutil; exit(0 if pkgutil.find_loader('numpy') else 1)"
+  if [ $? -eq 1 ]; then
+    echo "ERROR: required package 'numpy' is not installed"
+    echo "Use 'sudo pip3 install numpy' in terminal"
+    exit 1
+  fi
+fi
+
 {
 # Printing the the chosen options in the log of the bash script
 echo -e "Log of bash script convert.sh on $(date)"
@@ -234,6 +290,8 @@ if [ $w_option -eq 1 ]; then echo -e "-w $file_wisdom"; fi
 if [ $v_option -eq 1 ]; then echo -e "-v $file_vcf"; fi
 if [ $t_option -eq 1 ]; then echo -e "-t"; fi
 if [ $l_option -eq 1 ]; then echo -e "-l"; fi
+if [ $d_option -eq 1 ]; then echo -e "-d"; fi
+if [ $c_option -eq 1 ]; then echo -e "-c $chunk_size"; fi
 if [ $o_option -eq 1 ]; then echo -e "-o $file_new"; fi
 
 # Printing data summary: number of samples and number of snps
@@ -267,22 +325,44 @@ if [ "$platform" = 'embark' ]; then
   echo -e "\nUsing python script EMBARKConvertBIM.py to create a .bim file in the uniform format: "
   python3 "${tool_directory}"/convert_files/embark/EMBARKConvertBIM.py "$file_bim" ""${tool_directory}"/${file_exclude}" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim" "$tool_directory"
 
-  # execute plink command
-  echo -e "\nUsing plink to exclude SNPs: "
+  if [ $d_option -eq 1 ]; then
+    # copy the SNPs that are not excluded from the .bed file, without plink
+    echo -e "\nUsing python script BedSubset.py to exclude SNPs: "
+    python3 "${tool_directory}"/convert_files/common_scripts/BedSubset.py "$file_bed" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim" "$file_fam" ""${tool_directory}"/${file_exclude}" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2"
+  else
+    # execute plink command
+    echo -e "\nUsing plink to exclude SNPs: "
+  fi
   } 2>&1 | tee -a "$log_file" # put output in log file
-  "${tool_directory}"/convert_files/common_scripts/plink  \
-  --bim ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim"  \
-  --fam "$file_fam"  \
-  --bed "$file_bed"  \
-  --make-bed  \
-  --exclude ""${tool_directory}"/${file_exclude}"  \
-  --chr-set 38  \
-  --out "$file_new"  \
-  $extra_plinkargs
 
-  # add plink log to log file
-  cat "$file_new.log" >> "$log_file"
-  rm "$file_new.log"
+  if [ $d_option -eq 1 ]; then
+    # move the new files, only when all three were made
+    if [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bed" ] \
+    && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bim" ] \
+    && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.fam" ]; then
+      for extension in bed bim fam; do
+        mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.${extension}" "$file_new.${extension}"
+      done
+    else
+      echo "ERROR: not all of the .bed, .bim and .fam files were made, see the errors above" 2>&1 | tee -a "$log_file"
+      rm -f "${tool_directory}"/convert_files/temp_files/"${file_new}"_temp*
+      exit 1
+    fi
+  else
+    "${tool_directory}"/convert_files/common_scripts/plink  \
+    --bim ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim"  \
+    --fam "$file_fam"  \
+    --bed "$file_bed"  \
+    --make-bed  \
+    --exclude ""${tool_directory}"/${file_exclude}"  \
+    --chr-set 38  \
+    --out "$file_new"  \
+    $extra_plinkargs
+
+    # add plink log to log file
+    cat "$file_new.log" >> "$log_file"
+    rm "$file_new.log"
+  fi
 fi
 
 # to convert neogen 220k files
@@ -294,25 +374,46 @@ if [ "$platform" = 'neogen220' ]; then
     exit 1
   fi
 
-  {
-  # execute python script
-  echo -e "\nUsing python script NEOGEN220Kconvert.py: to create .map and .ped files in the uniform format:"
-  python3 "${tool_directory}"/convert_files/neogen220/NEOGEN220KConvert.py "$file_neogen" ""${tool_directory}"/${file_exclude}" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp" "$tool_directory"
+  if [ $d_option -eq 1 ]; then
+    {
+    # execute python script
+    echo -e "\nUsing python script NEOGEN220Kconvert.py: to create .bed, .bim and .fam files in the uniform format:"
+    python3 "${tool_directory}"/convert_files/neogen220/NEOGEN220KConvert.py "$file_neogen" ""${tool_directory}"/${file_exclude}" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp" "$tool_directory" bed
+    } 2>&1 | tee -a "$log_file" # put output in log file
 
-  # execute plink command
-  echo -e "\nUsing plink to exclude SNPs: "
-  } 2>&1 | tee -a "$log_file" # put output in log file
-  "${tool_directory}"/convert_files/common_scripts/plink  \
-  --map ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.map"  \
-  --ped ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.ped"  \
-  --make-bed --exclude ""${tool_directory}"/${file_exclude}"  \
-  --chr-set 38  \
-  --out "$file_new"  \
-  $extra_plinkargs
+    # move the new files, only when all three were made
+    if [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bed" ] \
+    && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim" ] \
+    && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.fam" ]; then
+      for extension in bed bim fam; do
+        mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.${extension}" "$file_new.${extension}"
+      done
+    else
+      echo "ERROR: not all of the .bed, .bim and .fam files were made, see the errors above" 2>&1 | tee -a "$log_file"
+      rm -f "${tool_directory}"/convert_files/temp_files/"${file_new}"_temp*
+      exit 1
+    fi
+  else
+    {
+    # execute python script
+    echo -e "\nUsing python script NEOGEN220Kconvert.py: to create .map and .ped files in the uniform format:"
+    python3 "${tool_directory}"/convert_files/neogen220/NEOGEN220KConvert.py "$file_neogen" ""${tool_directory}"/${file_exclude}" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp" "$tool_directory"
 
-  # add plink log to log file
-  cat "$file_new.log" >> "$log_file"
-  rm "$file_new.log"
+    # execute plink command
+    echo -e "\nUsing plink to exclude SNPs: "
+    } 2>&1 | tee -a "$log_file" # put output in log file
+    "${tool_directory}"/convert_files/common_scripts/plink  \
+    --map ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.map"  \
+    --ped ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.ped"  \
+    --make-bed --exclude ""${tool_directory}"/${file_exclude}"  \
+    --chr-set 38  \
+    --out "$file_new"  \
+    $extra_plinkargs
+
+    # add plink log to log file
+    cat "$file_new.log" >> "$log_file"
+    rm "$file_new.log"
+  fi
 
 fi
 
@@ -357,59 +458,77 @@ if [ "$platform" = 'wisdom' ]; then
     exit 1
   fi
 
-  # Check if pandas python package is installed
-  python3 -c "import pkgutil; exit(0 if pkgutil.find_loader('pandas') else 1)"
+  # Check if numpy python package is installed
+  python3 -c "import pkgutil; exit(0 if pkgutil.find_loader('numpy') else 1)"
   if [ $? -eq 1 ]; then
-    echo "ERROR: required package 'pandas' is not installed" 2>&1 | tee -a "$log_file"
-    echo "Use 'sudo pip3 install pandas' in terminal" 2>&1 | tee -a "$log_file"
+    echo "ERROR: required package 'numpy' is not installed" 2>&1 | tee -a "$log_file"
+    echo "Use 'sudo pip3 install numpy' in terminal" 2>&1 | tee -a "$log_file"
     exit 1
   fi
 
-  # Check if openpyxl python package is installed
-  python3 -c "import pkgutil; exit(0 if pkgutil.find_loader('openpyxl') else 1)"
-  if [ $? -eq 1 ]; then
-    echo "ERROR: required package 'openpyxl' is not installed" 2>&1 | tee -a "$log_file"
-    echo "Use 'sudo pip3 install openpyxl' in terminal" 2>&1 | tee -a "$log_file"
-    exit 1
+  # Check if openpyxl python package is installed, only needed for xlsx files (these are zip files, starting with PK)
+  if [ "$(head -c 2 "$file_wisdom")" = "PK" ]; then
+    python3 -c "import pkgutil; exit(0 if pkgutil.find_loader('openpyxl') else 1)"
+    if [ $? -eq 1 ]; then
+      echo "ERROR: required package 'openpyxl' is not installed" 2>&1 | tee -a "$log_file"
+      echo "Use 'sudo pip3 install openpyxl' in terminal" 2>&1 | tee -a "$log_file"
+      exit 1
+    fi
   fi
 
-  # Check if perl is installed
-  command -v perl >/dev/null 2>&1 || { echo "ERROR: Perl is not installed" >&2; exit 1;}
-  {
-  # execute python script
-  echo -e "\nUsing python script WisdomConvert.py to create .map and .ped file in the uniform format: "
-  python3 "${tool_directory}"/convert_files/wisdom/WisdomConvert.py "$file_wisdom" ""${tool_directory}"/$file_exclude" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp" "${tool_directory}"
-
-  # execute plink command
-  echo -e "\nUsing plink to exclude SNPs: "
-  } 2>&1 | tee -a "$log_file" # put output in log file
-  "${tool_directory}"/convert_files/common_scripts/plink  \
-  --map ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.map"  \
-  --ped ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.ped"  \
-  --make-bed  \
-  --exclude ""${tool_directory}"/$file_exclude"  \
-  --chr-set 38  \
-  --out "$file_new"  \
-  $extra_plinkargs
+  if [ $d_option -eq 1 ]; then
+    {
+    # execute python script
+    echo -e "\nUsing python script WisdomConvert.py to create .bed, .bim and .fam files in the uniform format: "
+    python3 "${tool_directory}"/convert_files/wisdom/WisdomConvert.py "$file_wisdom" ""${tool_directory}"/$file_exclude" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp" "${tool_directory}" bed "$chunk_size"
+    } 2>&1 | tee -a "$log_file" # put output in log file
 
-  # add plink log to log file
-  cat "$file_new.log" >> "$log_file"
+    # move the new files, only when all three were made
+    if [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bed" ] \
+    && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim" ] \
+    && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.fam" ]; then
+      for extension in bed bim fam; do
+        mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.${extension}" "$file_new.${extension}"
+      done
+    else
+      echo "ERROR: not all of the .bed, .bim and .fam files were made, see the errors above" 2>&1 | tee -a "$log_file"
+      rm -f "${tool_directory}"/convert_files/temp_files/"${file_new}"_temp*
+      exit 1
+    fi
+  else
+    {
+    # execute python script
+    echo -e "\nUsing python script WisdomConvert.py to create .map and .ped file in the uniform format: "
+    python3 "${tool_directory}"/convert_files/wisdom/WisdomConvert.py "$file_wisdom" ""${tool_directory}"/$file_exclude" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp" "${tool_directory}" ped "$chunk_size"
 
-  {
-  rm "$file_new.log"
+    # execute plink command
+    echo -e "\nUsing plink to exclude SNPs: "
+    } 2>&1 | tee -a "$log_file" # put output in log file
+    "${tool_directory}"/convert_files/common_scripts/plink  \
+    --map ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.map"  \
+    --ped ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.ped"  \
+    --make-bed  \
+    --exclude ""${tool_directory}"/$file_exclude"  \
+    --chr-set 38  \
+    --out "$file_new"  \
+    $extra_plinkargs
+
+    # add plink log to log file
+    cat "$file_new.log" >> "$log_file"
+    rm "$file_new.log"
 
-  # execute perl script for converting to TOP calling
-  echo -e "\nUsing perl script convert_bim_allele.pl to convert .bim file to TOP allele calling:"
-  perl "${tool_directory}"/convert_files/common_scripts/convert_bim_allele.pl  \
-  --intype dbsnp  \
-  --outtype top  \
-  --outfile ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bim"  \
-  "$file_new.bim"  \
-  "${tool_directory}"/convert_files/common_files/SNP_Table_Big.txt
-
-  rm "$file_new.bim"
-  mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bim" "$file_new.bim"
-  } 2>&1 | tee -a "$log_file" # put output in log file
+    {
+    # execute python script for converting to TOP calling, with option -d this is done in WisdomConvert.py
+    echo -e "\nUsing python script ConvertBimAllele.py to convert .bim file to TOP allele calling:"
+    python3 "${tool_directory}"/convert_files/common_scripts/ConvertBimAllele.py  \
+    "$file_new.bim"  \
+    ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bim"  \
+    "${tool_directory}" dbsnp top
+
+    rm "$file_new.bim"
+    mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bim" "$file_new.bim"
+    } 2>&1 | tee -a "$log_file" # put output in log file
+  fi
 fi
 
 # to convert MyDogDNA (mdd) files
@@ -428,43 +547,49 @@ if [ "$platform" = 'mdd' ]; then
     exit 1
   fi
 
-  # Check if perl is installed
-  command -v perl >/dev/null 2>&1 || { echo "ERROR: Perl is not installed" >&2; exit 1;}
   {
   # execute python script
   echo -e "\nUsing python script MDDConvert.py to create a .bim and .fam file in the uniform format:"
   python3 "${tool_directory}"/convert_files/mdd/MDDConvert.py "$file_bim" "$file_fam" ""${tool_directory}"/${file_exclude}" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp" "${tool_directory}"
 
-  # execute plink command
-  echo -e "\nUsing plink to exclude SNPs: "
+  if [ $d_option -eq 1 ]; then
+    # copy the SNPs that are not excluded from the .bed file, without plink
+    echo -e "\nUsing python script BedSubset.py to exclude SNPs: "
+    python3 "${tool_directory}"/convert_files/common_scripts/BedSubset.py "$file_bed" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.fam" ""${tool_directory}"/${file_exclude}" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2"
+  else
+    # execute plink command
+    echo -e "\nUsing plink to exclude SNPs: "
+  fi
   } 2>&1 | tee -a "$log_file" # put output in log file
-  "${tool_directory}"/convert_files/common_scripts/plink  \
-  --bim ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim"  \
-  --fam ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.fam"  \
-  --bed "$file_bed"  \
-  --make-bed  \
-  --exclude ""${tool_directory}"/${file_exclude}"  \
-  --chr-set 38  \
-  --out "$file_new"  \
-  $extra_plinkargs
 
-  # add plink log to log file
-  cat "$file_new.log" >> "$log_file"
-  {
-  rm "$file_new.log"
-
-  # execute perl script for converting to TOP calling
-  echo -e "\nUsing perl script convert_bim_allele.pl to convert .bim file to TOP allele calling:"
-  perl "${tool_directory}"/convert_files/common_scripts/convert_bim_allele.pl  \
-  --intype ilmn12  \
-  --outtype top  \
-  --outfile ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bim"  \
-  "$file_new.bim"  \
-  "${tool_directory}"/convert_files/common_files/SNP_Table_Big.txt
-
-  rm "$file_new.bim"
-  mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bim" "$file_new.bim"
-  } 2>&1 | tee -a "$log_file" # put output in log file
+  if [ $d_option -eq 1 ]; then
+    # move the new files, only when all three were made
+    if [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bed" ] \
+    && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bim" ] \
+    && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.fam" ]; then
+      for extension in bed bim fam; do
+        mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.${extension}" "$file_new.${extension}"
+      done
+    else
+      echo "ERROR: not all of the .bed, .bim and .fam files were made, see the errors above" 2>&1 | tee -a "$log_file"
+      rm -f "${tool_directory}"/convert_files/temp_files/"${file_new}"_temp*
+      exit 1
+    fi
+  else
+    "${tool_directory}"/convert_files/common_scripts/plink  \
+    --bim ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim"  \
+    --fam ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.fam"  \
+    --bed "$file_bed"  \
+    --make-bed  \
+    --exclude ""${tool_directory}"/${file_exclude}"  \
+    --chr-set 38  \
+    --out "$file_new"  \
+    $extra_plinkargs
+
+    # add plink log to log file
+    cat "$file_new.log" >> "$log_file"
+    rm "$file_new.log"
+  fi
 fi
 
 # to convert Lupa 170K files
@@ -482,43 +607,49 @@ if [ "$platform" = 'lupa170' ]; then
     exit 1
   fi
 
-  # Check if perl is installed
-  command -v perl >/dev/null 2>&1 || { echo "ERROR: Perl is not installed" >&2; exit 1;}
   {
   # execute python script
   echo -e "\nUsing python script LUPA174Kconvert.py to create a .bim file in the uniform format:"
   python3 "${tool_directory}"/convert_files/lupa170/LUPA174KConvert.py "$file_bim" "${tool_directory}"/"$file_exclude" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp" "$tool_directory"
 
-  # execute plink command
-  echo -e "\nUsing plink to exclude SNPs: "
+  if [ $d_option -eq 1 ]; then
+    # copy the SNPs that are not excluded from the .bed file, without plink
+    echo -e "\nUsing python script BedSubset.py to exclude SNPs: "
+    python3 "${tool_directory}"/convert_files/common_scripts/BedSubset.py "$file_bed" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim" "$file_fam" "${tool_directory}"/"$file_exclude" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2"
+  else
+    # execute plink command
+    echo -e "\nUsing plink to exclude SNPs: "
+  fi
   } 2>&1 | tee -a "$log_file" # put output in log file
-  "${tool_directory}"/convert_files/common_scripts/plink  \
-  --bim ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim"  \
-  --fam "$file_fam"  \
-  --bed "$file_bed"  \
-  --make-bed  \
-  --exclude "${tool_directory}"/"$file_exclude"  \
-  --chr-set 38  \
-  --out "$file_new"  \
-  $extra_plinkargs
-
-  # add plink log to log file
-  cat "$file_new.log" >> "$log_file"
-  {
-  rm "$file_new.log"
 
-  # execute perl script for converting to TOP calling
-  echo -e "\nUsing perl script convert_bim_allele.pl to convert .bim file to TOP allele calling:"
-  perl "${tool_directory}"/convert_files/common_scripts/convert_bim_allele.pl  \
-  --intype dbsnp  \
-  --outtype top  \
-  --outfile ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bim"  \
-  "$file_new.bim"  \
-  "${tool_directory}"/convert_files/common_files/SNP_Table_Big.txt
-
-  rm "$file_new.bim"
-  mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bim" "$file_new.bim"
-  } 2>&1 | tee -a "$log_file" # put output in log file
+  if [ $d_option -eq 1 ]; then
+    # move the new files, only when all three were made
+    if [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bed" ] \
+    && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bim" ] \
+    && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.fam" ]; then
+      for extension in bed bim fam; do
+        mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.${extension}" "$file_new.${extension}"
+      done
+    else
+      echo "ERROR: not all of the .bed, .bim and .fam files were made, see the errors above" 2>&1 | tee -a "$log_file"
+      rm -f "${tool_directory}"/convert_files/temp_files/"${file_new}"_temp*
+      exit 1
+    fi
+  else
+    "${tool_directory}"/convert_files/common_scripts/plink  \
+    --bim ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim"  \
+    --fam "$file_fam"  \
+    --bed "$file_bed"  \
+    --make-bed  \
+    --exclude "${tool_directory}"/"$file_exclude"  \
+    --chr-set 38  \
+    --out "$file_new"  \
+    $extra_plinkargs
+
+    # add plink log to log file
+    cat "$file_new.log" >> "$log_file"
+    rm "$file_new.log"
+  fi
 fi
 
 if [ "$platform" = 'vcf3' ] || [ "$platform" = 'vcf4' ]; then
@@ -541,8 +672,14 @@ if [ "$platform" = 'vcf3' ] || [ "$platform" = 'vcf4' ]; then
     exit 1
   fi
 
+  # Error if -d and -t was used, with -d the vcf file is read without tabix
+  if [ $d_option -eq 1 ] && [ $t_option -eq 1 ]; then
+    echo "ERROR: to convert vcf files directly to .bed .bim .fam files, use only -v or -v and -l, not -t" 2>&1 | tee -a "$log_file"
+    exit 1
+  fi
+
   # Error if tbi file already exists and -t option was not used
-  if [ $v_option -eq 1 ] && [ $t_option -ne 1 ] && [ -f "${file_vcf}.tbi" ]; then
+  if [ $v_option -eq 1 ] && [ $t_option -ne 1 ] && [ $d_option -ne 1 ] && [ -f "${file_vcf}.tbi" ]; then
     echo "ERROR: ${file_vcf}.tbi file already exists, change name/remove/change location of these files or change output name, or use the -t option to skip the indexing and use this tbi file." 2>&1 | tee -a "$log_file"
     rm "$log_file"
     exit 1
@@ -553,13 +690,29 @@ if [ "$platform" = 'vcf3' ] || [ "$platform" = 'vcf4' ]; then
     echo "ERROR: -t was used but ${file_vcf}.tbi was not found."
     exit 1
   fi
-
-  # Check if perl is installed
-  command -v perl >/dev/null 2>&1 || { echo "ERROR: Perl is not installed" >&2; exit 1;}
 fi
 
 # to convert vcf canfam 3 files
-if [ "$platform" = 'vcf3' ]; then
+if [ "$platform" = 'vcf3' ] && [ $d_option -eq 1 ]; then
+  {
+  # execute python script
+  echo -e "\nUsing python script VCF3Convert.py: to create .bed, .bim and .fam files in the uniform format from the vcf file:"
+  python3 "${tool_directory}"/convert_files/VCF3/VCF3Convert.py "$file_vcf" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp" "$tool_directory" bed
+  } 2>&1 | tee -a "$log_file" # put output in log file
+
+  # move the new files, only when all three were made
+  if [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bed" ] \
+  && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim" ] \
+  && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.fam" ]; then
+    for extension in bed bim fam; do
+      mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.${extension}" "$file_new.${extension}"
+    done
+  else
+    echo "ERROR: not all of the .bed, .bim and .fam files were made, see the errors above" 2>&1 | tee -a "$log_file"
+    rm -f "${tool_directory}"/convert_files/temp_files/"${file_new}"_temp*
+    exit 1
+  fi
+elif [ "$platform" = 'vcf3' ]; then
   if [ $l_option -ne 1 ]; then
     {
     # use tabix to filter vcf file for the correct snps
@@ -616,25 +769,30 @@ if [ "$platform" = 'vcf3' ]; then
 
   # add plink log to log file
   cat "$file_new.log" >> "$log_file"
-  {
   rm "$file_new.log"
-
-  # execute perl script for converting to TOP calling
-  echo -e "\nUsing perl script convert_bim_allele.pl to convert .bim file to TOP allele calling:"
-  perl "${tool_directory}"/convert_files/common_scripts/convert_bim_allele.pl  \
-  --intype dbsnp  \
-  --outtype top  \
-  --outfile ""${tool_directory}"/convert_files/temp_files/${file_new}_temp3.bim"  \
-  "$file_new.bim"  \
-  "${tool_directory}"/convert_files/common_files/SNP_Table_Big.txt
-
-  rm "$file_new.bim"
-  mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp3.bim" "$file_new.bim"
-  } 2>&1 | tee -a "$log_file" # put output in log file
 fi
 
 # to convert vcf canfam 4 files
-if [ "$platform" = 'vcf4' ]; then
+if [ "$platform" = 'vcf4' ] && [ $d_option -eq 1 ]; then
+  {
+  # execute python script
+  echo -e "\nUsing python script VCF4convert.py: to create .bed, .bim and .fam files in the uniform format from the vcf file:"
+  python3 "${tool_directory}"/convert_files/VCF4/VCF4convert.py "$file_vcf" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp" "$tool_directory" bed
+  } 2>&1 | tee -a "$log_file" # put output in log file
+
+  # move the new files, only when all three were made
+  if [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bed" ] \
+  && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim" ] \
+  && [ -f ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.fam" ]; then
+    for extension in bed bim fam; do
+      mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.${extension}" "$file_new.${extension}"
+    done
+  else
+    echo "ERROR: not all of the .bed, .bim and .fam files were made, see the errors above" 2>&1 | tee -a "$log_file"
+    rm -f "${tool_directory}"/convert_files/temp_files/"${file_new}"_temp*
+    exit 1
+  fi
+elif [ "$platform" = 'vcf4' ]; then
   if [ $l_option -ne 1 ]; then
     {
     # use tabix to filter vcf file for the correct snps
@@ -671,8 +829,8 @@ if [ "$platform" = 'vcf4' ]; then
   cat ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.log" >> "$log_file"
   {
   # execute python script
-  echo -e "\nUsing python script VCF4Convert.py to create a .bim file in the uniform format:"
-  python3 "${tool_directory}"/convert_files/VCF4/VCF4Convert.py ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2" "${tool_directory}"
+  echo -e "\nUsing python script VCF4convert.py to create a .bim file in the uniform format:"
+  python3 "${tool_directory}"/convert_files/VCF4/VCF4convert.py ""${tool_directory}"/convert_files/temp_files/${file_new}_temp.bim" ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2" "${tool_directory}"
 
   # execute plink command
   echo -e "\nUsing plink to extract SNPs:"
@@ -689,21 +847,7 @@ if [ "$platform" = 'vcf4' ]; then
 
   # add plink log to log file
   cat "$file_new.log" >> "$log_file"
-  {
   rm "$file_new.log"
-
-  # execute perl script for converting to TOP calling
-  echo -e "\nUsing perl script convert_bim_allele.pl to convert .bim file to TOP allele calling:"
-  perl "${tool_directory}"/convert_files/common_scripts/convert_bim_allele.pl  \
-  --intype dbsnp  \
-  --outtype top  \
-  --outfile ""${tool_directory}"/convert_files/temp_files/${file_new}_temp3.bim"  \
-  "$file_new.bim"  \
-  "${tool_directory}"/convert_files/common_files/SNP_Table_Big.txt
-
-  rm "$file_new.bim"
-  mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp3.bim" "$file_new.bim"
-  } 2>&1 | tee -a "$log_file" # put output in log file
 fi
 
 # to convert affymetrix files
@@ -742,25 +886,11 @@ if [ "$platform" = 'affymetrix' ]; then
 
   # add plink log to log file
   cat "$file_new.log" >> "$log_file"
-  {
   rm "$file_new.log"
-
-  # execute perl script for converting to TOP calling
-  echo -e "\nUsing perl script convert_bim_allele.pl to convert .bim file to TOP allele calling:"
-  perl "${tool_directory}"/convert_files/common_scripts/convert_bim_allele.pl  \
-  --intype dbsnp  \
-  --outtype top  \
-  --outfile ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bim"  \
-  "$file_new.bim"  \
-  "${tool_directory}"/convert_files/common_files/SNP_Table_Big.txt
-
-  rm "$file_new.bim"
-  mv ""${tool_directory}"/convert_files/temp_files/${file_new}_temp2.bim" "$file_new.bim"
-  } 2>&1 | tee -a "$log_file" # put output in log file
 fi
 
 # Remove temporary files and, if present, the .nosex file produced by plink
-rm "${tool_directory}"/convert_files/temp_files/"${file_new}"_temp*
+rm -f "${tool_directory}"/convert_files/temp_files/"${file_new}"_temp*
 if [ -f "${file_new}.nosex" ]; then
   rm "${file_new}".nosex
 fi
@@ -5,6 +5,7 @@ Creates a new bim file with these changes:
     SNPs on chromosome 39 are divided over 39 and 41 (pseudo-autosomal)
     flipped strands when needed
     changes alleles of indel IDs to fictional alleles A (insertion) and G (deletion)
+    converts the alleles from forward to TOP calling (for SNPs to extract)
     changes locations from canfam 4 to 3
 Creates a file with SNPs to extract
     only snps:
@@ -13,8 +14,13 @@ Creates a file with SNPs to extract
         that are SNPs and not indels, except for the known indels
 """
 import csv
+import os
 import time
 import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common_scripts'))
+from ReferenceTables import load_table
+from ConvertBimAllele import load_snp_table, convert_alleles
+from PositionIndex import make_position_index, find_locations
 # get the start time
 st = time.time()
 
@@ -29,17 +35,10 @@ def split_and_strip(line, delimiter='\t'):
     return split_line
 
 
-def get_snp_name_and_update_chromosome(line, snp_info, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp):
+def update_chromosome(line):
     """
     :param line: input row of bim file
-    :param snp_info: dictionary with snp information in format ('location:chromosome': 'SNP id')
-    :param count_false_indel: counter for how many false indels were found
-    :param count_snp_id_not_found: counter for how many snps miss a snp id
-    :param count_indel_shown_as_snp: counter for how many snps falsly call for indel
-    :return: row with updated chromosome (chr 39 divided over 39 and 41 = pseudo-autosomal), added SNP id when location
-    and chromosome combination match with a SNP in snp_info dictionary, and updated alleles for indel snps (insertion
-    becomes A, deletion becomes G). Changed SNP_id to '.' when non-indel SNPs code for indels, and when a * is present
-    in the alleles (‘*’ indicates that the allele is missing due to a upstream deletion).
+    :return: row with updated chromosome (chr 39 divided over 39 and 41 = pseudo-autosomal)
     """
     # divide chr 39 over 39 and 41 (pseudo-autosomal)
     if line[0] == '39' or line[0] == '41':  # line[0] is the chromosome
@@ -47,13 +46,24 @@ def get_snp_name_and_update_chromosome(line, snp_info, count_false_indel, count_
             line[0] = '41'
         else:
             line[0] = '39'
-    loc = line[0] + ':' + line[3]
-    # if chromosome-location combination is in the snp_info dictionary, get corresponding SNP id from dictionary
-    if loc in snp_info.keys():
-        line[1] = snp_info[loc]
-        # if snp was found, delete this one from dictionary, so no duplicate SNPs end up in bim file
-        # (second snp of duplicate gets '.' for snp id).
-        del snp_info[loc]
+    return line
+
+
+def get_snp_name(line, snp_id, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp):
+    """
+    :param line: input row of bim file (with updated chromosome)
+    :param snp_id: SNP id found in the position index for the chromosome and location of this row, None if the location
+    is not in the index or was already found for an earlier row (so no duplicate SNPs end up in bim file)
+    :param count_false_indel: counter for how many false indels were found
+    :param count_snp_id_not_found: counter for how many snps miss a snp id
+    :param count_indel_shown_as_snp: counter for how many snps falsly call for indel
+    :return: row with added SNP id when the chromosome and location combination was found in the position index, and
+    updated alleles for indel snps (insertion becomes A, deletion becomes G). Changed SNP_id to '.' when non-indel SNPs
+    code for indels, and when a * is present in the alleles (‘*’ indicates that the allele is missing due to a upstream
+    deletion).
+    """
+    if snp_id is not None:
+        line[1] = snp_id
         # change alleles of indel SNPs to insertion = A and deletion = G
         if line[1].endswith('INDEL'):
             first = line[4]
@@ -82,16 +92,18 @@ def get_snp_name_and_update_chromosome(line, snp_info, count_false_indel, count_
 def get_snp_info(file):
     """
     :param file: input bim file from neogen, which is filtered, only correct snps with positions in this file
-    :return: snp dictionary with format ('location:chromosome': 'SNP id') and alleles dictionary with format
-    (SNPid: [allele1, allele2])
+    :return: position index with the SNP id of each chromosome and location (made by make_position_index) and alleles
+    dictionary with format (SNPid: [allele1, allele2])
     """
-    snp_info = {}
+    chromosomes, locations, snp_ids = [], [], []
     forward_alleles = {}
     for line in file:
         line = split_and_strip(line)
-        snp_info[line[0] + ':' + line[3]] = line[1]
+        chromosomes.append(line[0])
+        locations.append(line[3])
+        snp_ids.append(line[1])
         forward_alleles[line[1]] = [line[4], line[5]]
-    return snp_info, forward_alleles
+    return make_position_index(chromosomes, locations, snp_ids), forward_alleles
 
 
 def update_alleles(line, forward_alleles, count_flip, count_tri_allelic):
@@ -170,27 +182,33 @@ def main():
     snps_to_extract = sys.argv[2] + '_extract.list'
 
     with open(filename_bim, mode="r") as DataBIM, \
-            open(filename_snps, mode="r") as DataSNPs, \
             open(newfile_bim, "w", newline='') as NewFileBIM, \
             open(snps_to_extract, "w", newline='') as NewFileExtractedSNPs:
         writer_extract = csv.writer(NewFileExtractedSNPs, delimiter='\t')
         writer_map = csv.writer(NewFileBIM, delimiter='\t')
 
-        # get dictionary of known SNPs
-        snp_info, forward_alleles = get_snp_info(DataSNPs)
+        # get position index and dictionary of known SNPs
+        snp_index, forward_alleles = load_table(filename_snps, get_snp_info)
+        # get dictionary with the TOP and forward alleles of the SNPs in the SNP table
+        snp_table = load_snp_table(tool_directory)
 
         count_flip, count_tri_allelic, count_removed, count_kept, \
             count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp = 0, 0, 0, 0, 0, 0, 0
 
         snps_to_extract = []
-        for line in DataBIM:
-            line = split_and_strip(line)
-            # add SNP id to known SNPs and divide chromosome 39 over 39 and 41 (pseudo-autosomal)
-            line, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp = get_snp_name_and_update_chromosome(line, snp_info, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp)
+        # divide chromosome 39 over 39 and 41 (pseudo-autosomal), and look up the SNP ids of the whole .bim file at once
+        lines = [update_chromosome(split_and_strip(line)) for line in DataBIM]
+        snp_ids = find_locations(snp_index, [line[0] for line in lines], [line[3] for line in lines])
+        for line, snp_id in zip(lines, snp_ids):
+            # add SNP id to known SNPs
+            line, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp = get_snp_name(line, snp_id, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp)
             # update alleles, flip strand when necessary
             line, count_flip, count_tri_allelic = update_alleles(line, forward_alleles, count_flip, count_tri_allelic)
             snps_to_extract, count_kept, count_removed = get_snps_to_extract(line, snps_to_extract,
                                                                              count_kept, count_removed)
+            # convert forward alleles of the SNPs to extract to TOP calling
+            if line[1] != '.':
+                line[4], line[5] = convert_alleles(line[1], line[4], line[5], snp_table, 'dbsnp', 'top')
             writer_map.writerow(line)
 
         for line in snps_to_extract:
@@ -213,4 +231,4 @@ et = time.time()
 
 # get the execution time
 elapsed_time = et - st
-print('Execution time:', elapsed_time, 'seconds')
\ No newline at end of file
+print('Execution time:', elapsed_time, 'seconds')
\ No newline at end of file
@@ -5,16 +5,28 @@ Creates a new bim file with these changes:
     SNPs on chromosome 39 are divided over 39 and 41 (pseudo-autosomal)
     flipped strands when needed
     changes alleles of indel IDs to fictional alleles A (insertion) and G (deletion)
+    converts the alleles from forward to TOP calling (for SNPs to extract)
 Creates a file with SNPs to extract
     only snps:
         with a SNP id
         bi-allelic
         that are SNPs and not indels, except for the known indels
+with the extra argument 'bed', reads the VCF file instead of the .bim made by plink and directly creates the .bed, .bim
+and .fam file:
+    only the locations in VCFFilterFileCF3_big.txt are read from the VCF file (no tabix is needed)
+    the same changes are made to the .bim rows, and only the SNPs to extract are written
+    all samples get family id 0 (as plink --const-fid 0)
 """
 
 import csv
+import os
 import time
 import sys
+from itertools import islice
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common_scripts'))
+from ReferenceTables import load_table
+from ConvertBimAllele import load_snp_table, convert_alleles
+from PositionIndex import make_position_index, find_locations
 # get the start time
 st = time.time()
 
@@ -29,17 +41,10 @@ def split_and_strip(line, delimiter='\t'):
     return split_line
 
 
-def get_snp_name_and_update_chromosome(line, snp_info, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp):
+def update_chromosome(line):
     """
     :param line: input row of bim file
-    :param snp_info: dictionary with snp information in format ('location:chromosome': 'SNP id')
-    :param count_false_indel: counter for how many false indels were found
-    :param count_snp_id_not_found: counter for how many snps miss a snp id
-    :param count_indel_shown_as_snp: counter for how many snps falsly call for indel
-    :return: row with updated chromosome (chr 39 divided over 39 and 41 = pseudo-autosomal), added SNP id when location
-    and chromosome combination match with a SNP in snp_info dictionary, and updated alleles for indel snps (insertion
-    becomes A, deletion becomes G). Changed SNP_id to '.' when non-indel SNPs code for indels, and when a * is present
-    in the alleles (‘*’ indicates that the allele is missing due to a upstream deletion).
+    :return: row with updated chromosome (chr 39 divided over 39 and 41 = pseudo-autosomal)
     """
     # divide chr 39 over 39 and 41 (pseudo-autosomal)
     if line[0] == '39' or line[0] == '41':
@@ -47,13 +52,24 @@ def get_snp_name_and_update_chromosome(line, snp_info, count_false_indel, count_
             line[0] = '41'
         else:
             line[0] = '39'
-    loc = line[0] + ':' + line[3]
-    # if chromosome-location combination is in the snp_info dictionary, get corresponding SNP id from dictionary
-    if loc in snp_info.keys():
-        line[1] = snp_info[loc]
-        # if snp was found, delete this snp from dictionary, so no duplicate SNPs end up in bim file
-        # (second snp of duplicate gets '.' for snp id).
-        del snp_info[loc]
+    return line
+
+
+def get_snp_name(line, snp_id, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp):
+    """
+    :param line: input row of bim file (with updated chromosome)
+    :param snp_id: SNP id found in the position index for the chromosome and location of this row, None if the location
+    is not in the index or was already found for an earlier row (so no duplicate SNPs end up in bim file)
+    :param count_false_indel: counter for how many false indels were found
+    :param count_snp_id_not_found: counter for how many snps miss a snp id
+    :param count_indel_shown_as_snp: counter for how many snps falsly call for indel
+    :return: row with added SNP id when the chromosome and location combination was found in the position index, and
+    updated alleles for indel snps (insertion becomes A, deletion becomes G). Changed SNP_id to '.' when non-indel SNPs
+    code for indels, and when a * is present in the alleles (‘*’ indicates that the allele is missing due to a upstream
+    deletion).
+    """
+    if snp_id is not None:
+        line[1] = snp_id
         # change alleles of indel SNPs to insertion = A and deletion = G
         if line[1].endswith('INDEL'):  # line[1] is SNP id
             first = line[4]  # line[4] is allele 1
@@ -82,15 +98,18 @@ def get_snp_name_and_update_chromosome(line, snp_info, count_false_indel, count_
 def get_snp_info(file):
     """
     :param file: input bim file with correct locations and alleles in forward
-    :return: dictionary with format ('location:chromosome': 'SNP id') and dictionary with format ('snp id': [allele 1, allele 2]
+    :return: position index with the SNP id of each chromosome and location (made by make_position_index) and dictionary
+    with format ('snp id': [allele 1, allele 2]
     """
-    snp_info = {}
+    chromosomes, locations, snp_ids = [], [], []
     forward_alleles = {}
     for line in file:
         line = split_and_strip(line)
-        snp_info[line[0] + ':' + line[3]] = line[1]
+        chromosomes.append(line[0])
+        locations.append(line[3])
+        snp_ids.append(line[1])
         forward_alleles[line[1]] = [line[4], line[5]]
-    return snp_info, forward_alleles
+    return make_position_index(chromosomes, locations, snp_ids), forward_alleles
 
 
 def update_alleles(line, forward_alleles, count_flip, count_tri_allelic):
@@ -154,52 +173,95 @@ def get_snps_to_extract(line, snps_to_extract, count_kept, count_removed):
     return snps_to_extract, count_kept, count_removed
 
 
-def main():
-    """"
-    Creates a new BIM file and a SNPSToExtract list file to use in plink --extract
+def update_rows(records, snp_index, forward_alleles, snp_table, chunk_size=4096):
     """
-    # input files
-    filename_bim = sys.argv[1]  # input plink .bim file
-    tool_directory = sys.argv[3] # tool path Galaxy
-    filename_forward_snps = f'{tool_directory}/convert_files/common_files/SNP_Table_Big_Forward.bim'
+    :param records: iterable with per SNP the .bim row and the genotype codes (None when reading a .bim file)
+    :param snp_index: position index with the SNP id of each chromosome and location
+    :param forward_alleles: dictionary with forward alleles for each SNP
+    :param snp_table: dictionary with the TOP and forward alleles of the SNPs in the SNP table
+    :param chunk_size: number of rows of which the SNP ids are looked up at once
+    :return: generator with the updated .bim row and the genotype codes, the numbers of changed and removed SNPs are
+    printed when all rows are updated
+    """
+    count_flip, count_tri_allelic, count_removed, count_kept, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp = 0, 0, 0, 0, 0, 0, 0
 
-    # output files
-    newfile_bim = sys.argv[2] + '.bim'
-    snps_to_extract = sys.argv[2] + '_extract.list'
+    snps_to_extract = []
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        # divide chromosome 39 over 39 and 41 (pseudo-autosomal), and look up the SNP ids of the whole chunk at once
+        lines = [update_chromosome(line) for line, _ in chunk]
+        snp_ids = find_locations(snp_index, [line[0] for line in lines], [line[3] for line in lines])
+        for (line, codes), snp_id in zip(chunk, snp_ids):
+            # add SNP id to known SNPs
+            line, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp = get_snp_name(line, snp_id, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp)
+            # update alleles, flip strand when necessary
+            line, count_flip, count_tri_allelic = update_alleles(line, forward_alleles, count_flip, count_tri_allelic)
+            snps_to_extract, count_kept, count_removed = get_snps_to_extract(line, snps_to_extract,
+                                                                             count_kept, count_removed)
+            # convert forward alleles of the SNPs to extract to TOP calling
+            if line[1] != '.':
+                line[4], line[5] = convert_alleles(line[1], line[4], line[5], snp_table, 'dbsnp', 'top')
+            yield line, codes
+
+    print('Number of strand flips:', count_flip)
+    print('Number of SNPs calling wrong alleles:', count_tri_allelic)
+    print('Number of snps incorrectly shown as indels:', count_false_indel)
+    print('Number of indels SNPs not coding for indel:', count_indel_shown_as_snp)
+    print('Number of snps for which no SNP id was found:', count_snp_id_not_found)
+    print('Number of snps to remove (wrong alleles + incorrect indels + no SNP-id found):', count_removed)
+    print('Number of correct snps:', count_kept)
 
-    with open(filename_bim, mode="r") as DataBIM, \
-            open(filename_forward_snps, mode="r") as DataForwardSNPs, \
-            open(newfile_bim, "w", newline='') as NewFileBIM, \
-            open(snps_to_extract, "w", newline='') as NewFileExtractedSNPs:
+
+def write_bim_files(rows, output_prefix):
+    """
+    :param rows: iterable with the updated .bim rows and genotype codes (None)
+    :param output_prefix: prefix of the new .bim file and the list with SNPs to extract
+    """
+    with open(output_prefix + '.bim', "w", newline='') as NewFileBIM, \
+            open(output_prefix + '_extract.list', "w", newline='') as NewFileExtractedSNPs:
         writer_extract = csv.writer(NewFileExtractedSNPs, delimiter='\t')
         writer_map = csv.writer(NewFileBIM, delimiter='\t')
+        for line, _ in rows:
+            writer_map.writerow(line)
+            if line[1] != '.':
+                writer_extract.writerow([line[1]])
 
-        # get dictionary of known SNPs and a dictionary of their forward alleles
-        snp_info, forward_alleles = get_snp_info(DataForwardSNPs)
 
-        count_flip, count_tri_allelic, count_removed, count_kept, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp = 0, 0, 0, 0, 0, 0, 0
+def main():
+    """"
+    Creates a new BIM file and a SNPSToExtract list file to use in plink --extract,
+    or with the extra argument 'bed' a new .bed, .bim and .fam file from the VCF file
+    """
+    # input files
+    filename_input = sys.argv[1]  # input plink .bim file, or the VCF file with the extra argument 'bed'
+    tool_directory = sys.argv[3] # tool path Galaxy
+    filename_forward_snps = f'{tool_directory}/convert_files/common_files/SNP_Table_Big_Forward.bim'
+    filename_filter = f'{tool_directory}/convert_files/VCF3/VCFFilterFileCF3_big.txt'  # locations to read from the VCF
+    write_bed = len(sys.argv) > 4 and sys.argv[4] == 'bed'  # read the VCF and write .bed, .bim and .fam
 
-        snps_to_extract = []
-        for line in DataBIM:
-            line = split_and_strip(line)
-            # add SNP id to known SNPs and divide chromosome 39 over 39 and 41 (pseudo-autosomal)
-            line, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp = get_snp_name_and_update_chromosome(line, snp_info, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp)
-            # update alleles, flip strand when necessary
-            line, count_flip, count_tri_allelic = update_alleles(line, forward_alleles, count_flip, count_tri_allelic)
-            snps_to_extract, count_kept, count_removed = get_snps_to_extract(line, snps_to_extract,
-                                                                             count_kept, count_removed)
-            writer_map.writerow(line)
+    # output files
+    output_prefix = sys.argv[2]  # prefix for the .bim and _extract.list, or for the .bed, .bim and .fam file
 
-        for line in snps_to_extract:
-            writer_extract.writerow([line])
+    # get dictionary of known SNPs and a dictionary of their forward alleles
+    snp_index, forward_alleles = load_table(filename_forward_snps, get_snp_info)
+    # get dictionary with the TOP and forward alleles of the SNPs in the SNP table
+    snp_table = load_snp_table(tool_directory)
 
-        print('Number of strand flips:', count_flip)
-        print('Number of SNPs calling wrong alleles:', count_tri_allelic)
-        print('Number of snps incorrectly shown as indels:', count_false_indel)
-        print('Number of indels SNPs not coding for indel:', count_indel_shown_as_snp)
-        print('Number of snps for which no SNP id was found:', count_snp_id_not_found)
-        print('Number of snps to remove (wrong alleles + incorrect indels + no SNP-id found):', count_removed)
-        print('Number of correct snps:', count_kept)
+    if write_bed:
+        # numpy is only needed when writing the .bed file directly
+        from VcfReader import open_vcf, get_filter_locations, get_sample_ids, iter_vcf_records, write_bed_files
+        with open_vcf(filename_input) as DataVCF:
+            sample_ids = get_sample_ids(DataVCF, const_fid='0')
+            records = iter_vcf_records(DataVCF, load_table(filename_filter, get_filter_locations))
+            write_bed_files(update_rows(records, snp_index, forward_alleles, snp_table), sample_ids, output_prefix)
+    else:
+        with open(filename_input, mode="r") as DataBIM:
+            # the SNP ids of the whole .bim file are looked up at once
+            records = [(split_and_strip(line), None) for line in DataBIM]
+            write_bim_files(update_rows(records, snp_index, forward_alleles, snp_table, len(records)), output_prefix)
 
 
 main()
@@ -210,4 +272,4 @@ et = time.time()
 
 # get the execution time
 elapsed_time = et - st
-print('Execution time:', elapsed_time, 'seconds')
\ No newline at end of file
+print('Execution time:', elapsed_time, 'seconds')
\ No newline at end of file
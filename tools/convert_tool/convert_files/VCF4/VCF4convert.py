@@ -5,17 +5,29 @@ Creates a new bim file with these changes:
     SNPs on chromosome 39 are divided over 39 and 41 (pseudo-autosomal)
     flipped strands when needed
     changes alleles of indel IDs to fictional alleles A (insertion) and G (deletion)
+    converts the alleles from forward to TOP calling (for SNPs to extract)
     changes locations from canfam 4 to 3
 Creates a file with SNPs to extract
     only snps:
         with a SNP id
         bi-allelic
         that are SNPs and not indels, except for the known indels
+with the extra argument 'bed', reads the VCF file instead of the .bim made by plink and directly creates the .bed, .bim
+and .fam file:
+    only the locations in VCFFilterFileCF4_big.txt are read from the VCF file (no tabix is needed)
+    the same changes are made to the .bim rows, and only the SNPs to extract are written
+    sample ids with a '_' are split into family and individual id (as plink does)
 """
 
 import csv
+import os
 import time
 import sys
+from itertools import islice
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common_scripts'))
+from ReferenceTables import load_table
+from ConvertBimAllele import load_snp_table, convert_alleles
+from PositionIndex import make_position_index, find_locations
 # get the start time
 st = time.time()
 
@@ -30,17 +42,10 @@ def split_and_strip(line, delimiter='\t'):
     return split_line
 
 
-def get_snp_name_and_update_chromosome(line, snp_info, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp):
+def update_chromosome(line):
     """
     :param line: input row of bim file
-    :param snp_info: dictionary with snp information in format ('location:chromosome': 'SNP id')
-    :param count_false_indel: counter for how many false indels were found
-    :param count_snp_id_not_found: counter for how many snps miss a snp id
-    :param count_indel_shown_as_snp: counter for how many snps falsly call for indel
-    :return: row with updated chromosome (chr 39 divided over 39 and 41 = pseudo-autosomal), added SNP id when location
-    and chromosome combination match with a SNP in snp_info dictionary, and updated alleles for indel snps (insertion
-    becomes A, deletion becomes G). Changed SNP_id to '.' when non-indel SNPs code for indels, and when a * is present
-    in the alleles (‘*’ indicates that the allele is missing due to a upstream deletion).
+    :return: row with updated chromosome (chr 39 divided over 39 and 41 = pseudo-autosomal)
     """
     # divide chr 39 over 39 and 41 (pseudo-autosomal)
     if line[0] == '39' or line[0] == '41':
@@ -48,13 +53,24 @@ def get_snp_name_and_update_chromosome(line, snp_info, count_false_indel, count_
             line[0] = '41'
         else:
             line[0] = '39'
-    loc = line[0] + ':' + line[3]
-    # if chromosome-location combination is in the snp_info dictionary, get corresponding SNP id from dictionary
-    if loc in snp_info.keys():
-        line[1] = snp_info[loc]
-        # if snp was found, delete this one from dictionary, so no duplicate SNPs end up in bim file
-        # (second snp of duplicate gets '.' for snp id).
-        del snp_info[loc]
+    return line
+
+
+def get_snp_name(line, snp_id, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp):
+    """
+    :param line: input row of bim file (with updated chromosome)
+    :param snp_id: SNP id found in the position index for the chromosome and location of this row, None if the location
+    is not in the index or was already found for an earlier row (so no duplicate SNPs end up in bim file)
+    :param count_false_indel: counter for how many false indels were found
+    :param count_snp_id_not_found: counter for how many snps miss a snp id
+    :param count_indel_shown_as_snp: counter for how many snps falsly call for indel
+    :return: row with added SNP id when the chromosome and location combination was found in the position index, and
+    updated alleles for indel snps (insertion becomes A, deletion becomes G). Changed SNP_id to '.' when non-indel SNPs
+    code for indels, and when a * is present in the alleles (‘*’ indicates that the allele is missing due to a upstream
+    deletion).
+    """
+    if snp_id is not None:
+        line[1] = snp_id
         # change alleles of indel SNPs to insertion = A and deletion = G
         if line[1].endswith('INDEL'):   # line[1] is SNP id
             first = line[4]  # line[4] is allele 1
@@ -156,15 +172,18 @@ def get_snps_to_extract(line, snps_to_extract, count_kept, count_removed):
 def get_cf3_and_cf4_locations(file):
     """
     :param file: input file with snps in canfam 3 and 4
-    :return: dictionaries of snps in canfam3 (snp_id : [chromosome, location] and cf4 (chromosome:basepair : snpid)
+    :return: dictionary of snps in canfam3 (snp_id : [chromosome, location]) and position index with the snp id of each
+    chromosome and location in canfam 4 (made by make_position_index)
     """
     snps_cf3_info = {}
-    snps_cf4_info = {}
+    cf4_chromosomes, cf4_locations, cf4_snp_ids = [], [], []
     for line in file:
         line = split_and_strip(line)
         snps_cf3_info[line[0]] = [line[1], line[2]]
-        snps_cf4_info[line[3] + ':' + line[4]] = line[0]
-    return snps_cf3_info, snps_cf4_info
+        cf4_chromosomes.append(line[3])
+        cf4_locations.append(line[4])
+        cf4_snp_ids.append(line[0])
+    return snps_cf3_info, make_position_index(cf4_chromosomes, cf4_locations, cf4_snp_ids)
 
 
 def update_location(line, snps_cf3_info):
@@ -179,58 +198,104 @@ def update_location(line, snps_cf3_info):
     return line
 
 
-def main():
-    """"
-    Creates a new BIM file and a SNPSToExtract list file to use in plink --extract
+def update_rows(records, snps_cf4_index, forward_alleles, snps_cf3_info, snp_table, chunk_size=4096):
     """
-
-    # input files
-    filename_bim = sys.argv[1]  # input plink .bim file
-    filename_forward_snps = 'convert_files/common_files/SNP_Table_Big_Forward.bim'
-    filename_cf34 = "convert_files/VCF4/SNPs_CF3_CF4.txt"  # map file with locations in canfam 3 and canfam 4 for liftover
-
-    # output files
-    newfile_bim = sys.argv[2] + '.bim'
-    snps_to_extract = sys.argv[2] + '_extract.list'
-
-    with open(filename_bim, mode="r") as DataBIM, \
-            open(filename_forward_snps, mode="r") as DataForwardSNPs, \
-            open(filename_cf34, mode="r") as DataCF34, \
-            open(newfile_bim, "w", newline='') as NewFileBIM, \
-            open(snps_to_extract, "w", newline='') as NewFileExtractedSNPs:
-        writer_extract = csv.writer(NewFileExtractedSNPs, delimiter='\t')
-        writer_map = csv.writer(NewFileBIM, delimiter='\t')
-
-        # get dictionary of known SNPs and a dictionary of their forward alleles
-        forward_alleles = get_snp_info(DataForwardSNPs)
-
-        # Make dictionary of snp locations canfam 3 and 4
-        snps_cf3_info, snps_cf4_info = get_cf3_and_cf4_locations(DataCF34)
-
-        count_flip, count_tri_allelic, count_removed, count_kept, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp = 0, 0, 0, 0, 0, 0, 0
-
-        snps_to_extract = []
-        for line in DataBIM:
-            line = split_and_strip(line)
-            # add SNP id to known SNPs and divide chromosome 39 over 39 and 41 (pseudo-autosomal)
-            line, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp = get_snp_name_and_update_chromosome(line, snps_cf4_info, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp)
+    :param records: iterable with per SNP the .bim row and the genotype codes (None when reading a .bim file)
+    :param snps_cf4_index: position index with the SNP id of each chromosome and location in canfam 4
+    :param forward_alleles: dictionary with forward alleles for each SNP
+    :param snps_cf3_info: dictionary of snps in canfam 3
+    :param snp_table: dictionary with the TOP and forward alleles of the SNPs in the SNP table
+    :param chunk_size: number of rows of which the SNP ids are looked up at once
+    :return: generator with the updated .bim row and the genotype codes, the numbers of changed and removed SNPs are
+    printed when all rows are updated
+    """
+    count_flip, count_tri_allelic, count_removed, count_kept, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp = 0, 0, 0, 0, 0, 0, 0
+
+    snps_to_extract = []
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        # divide chromosome 39 over 39 and 41 (pseudo-autosomal), and look up the SNP ids of the whole chunk at once
+        lines = [update_chromosome(line) for line, _ in chunk]
+        snp_ids = find_locations(snps_cf4_index, [line[0] for line in lines], [line[3] for line in lines])
+        for (line, codes), snp_id in zip(chunk, snp_ids):
+            # add SNP id to known SNPs
+            line, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp = get_snp_name(line, snp_id, count_false_indel, count_snp_id_not_found, count_indel_shown_as_snp)
             # update alleles, flip strand when necessary
             line, count_flip, count_tri_allelic = update_alleles(line, forward_alleles, count_flip, count_tri_allelic)
             line = update_location(line, snps_cf3_info)
             snps_to_extract, count_kept, count_removed = get_snps_to_extract(line, snps_to_extract,
                                                                              count_kept, count_removed)
+            # convert forward alleles of the SNPs to extract to TOP calling
+            if line[1] != '.':
+                line[4], line[5] = convert_alleles(line[1], line[4], line[5], snp_table, 'dbsnp', 'top')
+            yield line, codes
+
+    print('Number of strand flips:', count_flip)
+    print('Number of SNPs calling wrong alleles:', count_tri_allelic)
+    print('Number of snps incorrectly shown as indels:', count_false_indel)
+    print('Number of indels SNPs not coding for indel:', count_indel_shown_as_snp)
+    print('Number of snps for which no SNP id was found:', count_snp_id_not_found)
+    print('Number of snps to remove (wrong alleles + incorrect indels + no SNP-id found):', count_removed)
+    print('Number of correct snps:', count_kept)
+
+
+def write_bim_files(rows, output_prefix):
+    """
+    :param rows: iterable with the updated .bim rows and genotype codes (None)
+    :param output_prefix: prefix of the new .bim file and the list with SNPs to extract
+    """
+    with open(output_prefix + '.bim', "w", newline='') as NewFileBIM, \
+            open(output_prefix + '_extract.list', "w", newline='') as NewFileExtractedSNPs:
+        writer_extract = csv.writer(NewFileExtractedSNPs, delimiter='\t')
+        writer_map = csv.writer(NewFileBIM, delimiter='\t')
+        for line, _ in rows:
             writer_map.writerow(line)
+            if line[1] != '.':
+                writer_extract.writerow([line[1]])
+
+
+def main():
+    """"
+    Creates a new BIM file and a SNPSToExtract list file to use in plink --extract,
+    or with the extra argument 'bed' a new .bed, .bim and .fam file from the VCF file
+    """
 
-        for line in snps_to_extract:
-            writer_extract.writerow([line])
+    # input files
+    filename_input = sys.argv[1]  # input plink .bim file, or the VCF file with the extra argument 'bed'
+    tool_directory = sys.argv[3]  # tool path Galaxy
+    filename_forward_snps = f'{tool_directory}/convert_files/common_files/SNP_Table_Big_Forward.bim'
+    filename_cf34 = f'{tool_directory}/convert_files/VCF4/SNPs_CF3_CF4.txt'  # map file with locations in canfam 3 and canfam 4 for liftover
+    filename_filter = f'{tool_directory}/convert_files/VCF4/VCFFilterFileCF4_big.txt'  # locations to read from the VCF
+    write_bed = len(sys.argv) > 4 and sys.argv[4] == 'bed'  # read the VCF and write .bed, .bim and .fam
 
-        print('Number of strand flips:', count_flip)
-        print('Number of SNPs calling wrong alleles:', count_tri_allelic)
-        print('Number of snps incorrectly shown as indels:', count_false_indel)
-        print('Number of indels SNPs not coding for indel:', count_indel_shown_as_snp)
-        print('Number of snps for which no SNP id was found:', count_snp_id_not_found)
-        print('Number of snps to remove (wrong alleles + incorrect indels + no SNP-id found):', count_removed)
-        print('Number of correct snps:', count_kept)
+    # output files
+    output_prefix = sys.argv[2]  # prefix for the .bim and _extract.list, or for the .bed, .bim and .fam file
+
+    # get dictionary of known SNPs and a dictionary of their forward alleles
+    forward_alleles = load_table(filename_forward_snps, get_snp_info)
+
+    # Make dictionary of snp locations canfam 3 and 4
+    snps_cf3_info, snps_cf4_index = load_table(filename_cf34, get_cf3_and_cf4_locations)
+    # Make dictionary with the TOP and forward alleles of the SNPs in the SNP table
+    snp_table = load_snp_table(tool_directory)
+
+    if write_bed:
+        # numpy is only needed when writing the .bed file directly
+        from VcfReader import open_vcf, get_filter_locations, get_sample_ids, iter_vcf_records, write_bed_files
+        with open_vcf(filename_input) as DataVCF:
+            sample_ids = get_sample_ids(DataVCF)
+            records = iter_vcf_records(DataVCF, load_table(filename_filter, get_filter_locations))
+            write_bed_files(update_rows(records, snps_cf4_index, forward_alleles, snps_cf3_info, snp_table),
+                            sample_ids, output_prefix)
+    else:
+        with open(filename_input, mode="r") as DataBIM:
+            # the SNP ids of the whole .bim file are looked up at once
+            records = [(split_and_strip(line), None) for line in DataBIM]
+            write_bim_files(update_rows(records, snps_cf4_index, forward_alleles, snps_cf3_info, snp_table,
+                                        len(records)), output_prefix)
 
 
 main()
@@ -241,4 +306,4 @@ et = time.time()
 
 # get the execution time
 elapsed_time = et - st
-print('Execution time:', elapsed_time, 'seconds')
\ No newline at end of file
+print('Execution time:', elapsed_time, 'seconds')
\ No newline at end of file
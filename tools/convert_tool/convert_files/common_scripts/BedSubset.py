@@ -0,0 +1,158 @@
+"""
+This script:
+writes the new .bed, .bim and .fam file for platforms that already have plink binary files (embark, lupa170 and mdd),
+instead of plink --make-bed --exclude
+    the converters only change the .bim file and make a list of SNPs to exclude, the genotypes in the .bed stay the same
+    the input .bed is memory-mapped, and the SNPs that are not excluded are copied in runs of SNPs that follow each other
+    in the .bed, so most of the .bed is written without decoding the genotypes
+    the new files are the same as plink --make-bed --chr-set 38 makes them:
+        chromosome X, Y, XY and MT are coded as 39, 40, 41 and 42
+        allele 1 is the minor allele, for SNPs of which allele 1 is the major allele the alleles (and genotypes) are
+        swapped
+        the SNPs are sorted on chromosome and location
+        the .fam file is space separated, with missing phenotypes (0) as -9
+usage:
+    python3 BedSubset.py <input .bed> <new .bim of the converter> <.fam> <list with SNPs to exclude> <output prefix>
+"""
+import csv
+import os
+import time
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from PlinkBed import PLINK_CHROMOSOMES, open_bed, count_alleles, copy_snps, get_sort_order
+# get the start time
+st = time.time()
+
+
+def split_and_strip(line, delimiter=None):
+    """
+    :param line: row of input file
+    :param delimiter: which delimiter to use, None for any whitespace (as plink reads .bim and .fam files)
+    :return: stripped and split row
+    """
+    split_line = line.strip().split(delimiter)
+    return split_line
+
+
+def get_snps_to_exclude(file):
+    """
+    :param file: input file with SNPs to exclude, made by the converter
+    :return: set with the SNP ids to exclude
+    """
+    snps_to_exclude = set()
+    for line in file:
+        line = split_and_strip(line)
+        if line:
+            snps_to_exclude.add(line[0])
+    return snps_to_exclude
+
+
+def update_chromosome(line):
+    """
+    :param line: row of .bim file
+    :return: row with chromosome X, Y, XY and MT coded as 39, 40, 41 and 42 (as plink --chr-set 38 writes them)
+    """
+    line[0] = PLINK_CHROMOSOMES.get(line[0].upper(), line[0])  # line[0] is chromosome
+    if not line[0].isdigit():
+        sys.exit(f"ERROR: invalid chromosome code {line[0]} for SNP {line[1]} in the .bim file")
+    return line
+
+
+def update_phenotype(line):
+    """
+    :param line: row of .fam file
+    :return: row with missing phenotype (0 or -9) written as -9, as plink does
+    """
+    if line[5] in ('0', '-9'):  # line[5] is phenotype
+        line[5] = '-9'
+    return line
+
+
+def get_snp_order(bim_rows, keep):
+    """
+    :param bim_rows: list with the rows of the .bim file
+    :param keep: list with per row of the .bim file whether the SNP is not excluded
+    :return: list with the index in the .bed of the SNPs to write, in the order of the new .bim file
+    """
+    kept = [index for index, kept in enumerate(keep) if kept]
+    order = get_sort_order([bim_rows[index] for index in kept])
+    if order is not None:
+        kept = [kept[index] for index in order]
+    return kept
+
+
+def get_swap(data, order, bim_rows, number_samples, chunk_size=1024):
+    """
+    :param data: memory map of the input .bed, made by open_bed
+    :param order: list with the index in the .bed of the SNPs to write
+    :param bim_rows: list with the rows of the .bim file, allele 1 and 2 are swapped for the SNPs that are swapped
+    :param number_samples: number of samples in the .fam file
+    :param chunk_size: number of SNPs that are counted at once
+    :return: list with per SNP in order whether allele 1 and allele 2 change places, so allele 1 is the minor allele
+    """
+    swap = []
+    for start in range(0, len(order), chunk_size):
+        chunk = sorted(order[start:start + chunk_size])
+        count_first, count_second = count_alleles(data[chunk], number_samples)
+        chunk_swap = {}
+        for index, first, second in zip(chunk, count_first, count_second):
+            chunk_swap[index] = bool(first > second or bim_rows[index][5] == '0')
+        for index in order[start:start + chunk_size]:
+            swap.append(chunk_swap[index])
+            if chunk_swap[index]:
+                bim_rows[index][4], bim_rows[index][5] = bim_rows[index][5], bim_rows[index][4]
+    return swap
+
+
+def main():
+    """
+    Creates the new .bed, .bim and .fam file without the SNPs to exclude
+    """
+    # input files
+    filename_bed = sys.argv[1]  # input plink .bed file
+    filename_bim = sys.argv[2]  # .bim file made by the converter, with the same SNPs in the same order as the .bed
+    filename_fam = sys.argv[3]  # input plink .fam file (or .fam file made by the converter)
+    filename_exclude = sys.argv[4]  # file with SNPs to exclude, made by the converter
+
+    # output files
+    output_prefix = sys.argv[5]  # prefix for the new .bed, .bim and .fam file
+
+    with open(filename_bim, mode="r") as DataBIM, \
+            open(filename_fam, mode="r") as DataFAM, \
+            open(filename_exclude, mode="r") as DataExclude:
+        bim_rows = [split_and_strip(line) for line in DataBIM]
+        fam_rows = [update_phenotype(split_and_strip(line)) for line in DataFAM]
+        snps_to_exclude = get_snps_to_exclude(DataExclude)
+
+    keep = [line[1] not in snps_to_exclude for line in bim_rows]  # line[1] is SNP id
+    for line, kept in zip(bim_rows, keep):
+        if kept:
+            update_chromosome(line)
+    order = get_snp_order(bim_rows, keep)
+
+    data = open_bed(filename_bed, len(bim_rows), len(fam_rows))
+    swap = get_swap(data, order, bim_rows, len(fam_rows))
+    copy_snps(data, output_prefix + '.bed', order, swap, len(fam_rows))
+    del data
+
+    with open(output_prefix + '.bim', "w", newline='') as NewFileBIM, \
+            open(output_prefix + '.fam', "w", newline='') as NewFileFAM:
+        writer_bim = csv.writer(NewFileBIM, delimiter='\t')
+        for index in order:
+            writer_bim.writerow(bim_rows[index])
+        for line in fam_rows:
+            NewFileFAM.write(' '.join(line) + '\n')
+
+    print("Number of SNPs excluded: ", len(bim_rows) - len(order))
+    print("Number of SNPs of which allele 1 and 2 were swapped (allele 1 is the minor allele): ", sum(swap))
+    print("Number of samples written to .bed file: ", len(fam_rows))
+    print("Number of SNPs written to .bed file: ", len(order))
+
+
+main()
+
+# get the end time
+et = time.time()
+# get the execution time
+elapsed_time = et - st
+print('Execution time:', elapsed_time, 'seconds')
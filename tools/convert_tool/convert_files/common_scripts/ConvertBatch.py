@@ -0,0 +1,177 @@
+"""
+This script:
+converts many input files in one run (batch mode), each input file is converted with convert.sh, so the output is the
+same as when convert.sh is used for each input file separately
+    the manifest is a tab separated file with per row:
+        platform (embark, neogen170, neogen220, lupa170, mdd, wisdom, vcf3, vcf4 or affymetrix)
+        input file (for embark, mdd, lupa170 and affymetrix the prefix of the .bed, .bim and .fam file)
+        optional: output name (default: name of the input file + _converted)
+        optional: extra options for convert.sh, separated by spaces (e.g. -d or -l)
+    empty rows and rows starting with # are skipped
+    the SNP table that is shared by most platforms is loaded once before the conversions start, and for each platform
+    the first input file is converted before the other input files of this platform, so the reference tables are
+    parsed only once and all other conversions load them from the table cache (see ReferenceTables.py)
+    the conversions run in parallel, each in its own convert.sh process
+    each input file gets its own log file (output name + _Log.txt, made by convert.sh), if convert.sh stops before it
+    made its log file, the output of convert.sh is written to this log file
+    a summary with per input file the status, number of samples and SNPs and execution time is written to
+    <manifest name>_Summary.txt
+usage:
+    python3 ConvertBatch.py <manifest> [number of parallel conversions, default number of CPUs]
+"""
+import csv
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from ConvertBimAllele import load_snp_table
+
+TOOL_DIRECTORY = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir))
+# option of convert.sh for the input file of each platform
+INPUT_OPTIONS = {'embark': '-f', 'mdd': '-f', 'lupa170': '-f', 'affymetrix': '-f', 'neogen170': '-n',
+                 'neogen220': '-n', 'wisdom': '-w', 'vcf3': '-v', 'vcf4': '-v'}
+# platforms of which the converter uses SNP_Table_Big.txt
+SNP_TABLE_PLATFORMS = ['mdd', 'lupa170', 'wisdom', 'vcf3', 'vcf4', 'affymetrix']
+SUMMARY_HEADER = ['Platform', 'Input', 'Output', 'Status', 'Exit code', 'Samples', 'SNPs', 'Seconds']
+
+
+def get_output_name(input_name):
+    """
+    :param input_name: input file or prefix given in the manifest
+    :return: default output name: name of the input file without folder and extension, with _converted
+    """
+    name = os.path.basename(input_name)
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return os.path.splitext(name)[0] + '_converted'
+
+
+def get_jobs(file):
+    """
+    :param file: input manifest file
+    :return: list with per conversion a dictionary with the platform, input, output and extra options
+    """
+    jobs = []
+    for number, line in enumerate(file, 1):
+        line = line.rstrip('\r\n')
+        if not line.strip() or line.startswith('#'):
+            continue
+        line = [column.strip() for column in line.split('\t')]
+        if len(line) < 2 or line[0] not in INPUT_OPTIONS:
+            sys.exit(f"ERROR: row {number} of the manifest should start with a platform "
+                     f"({', '.join(INPUT_OPTIONS)}) and an input file, separated by a tab")
+        output = line[2] if len(line) > 2 and line[2] else get_output_name(line[1])
+        options = line[3].split() if len(line) > 3 else []
+        jobs.append({'platform': line[0], 'input': line[1], 'output': output, 'options': options})
+    # convert.sh uses the output name for its temporary files, so the output names must be unique
+    outputs = [job['output'] for job in jobs]
+    duplicates = sorted({output for output in outputs if outputs.count(output) > 1})
+    if duplicates:
+        sys.exit(f"ERROR: output name used more than once in the manifest: {', '.join(duplicates)}")
+    return jobs
+
+
+def count_lines(filename):
+    """
+    :param filename: file to count the rows of
+    :return: number of rows, or an empty string if the file does not exist
+    """
+    if not os.path.exists(filename):
+        return ''
+    with open(filename, mode="rb") as Data:
+        return sum(1 for _ in Data)
+
+
+def run_job(job):
+    """
+    :param job: dictionary with the platform, input, output and extra options of one conversion
+    :return: row of the summary for this conversion
+    """
+    input_name = job['input']
+    if INPUT_OPTIONS[job['platform']] == '-f' and input_name.endswith(('.bed', '.bim', '.fam')):
+        input_name = input_name[:-4]
+    command = ['bash', os.path.join(TOOL_DIRECTORY, 'convert.sh'), INPUT_OPTIONS[job['platform']], input_name,
+               '-p', job['platform'], '-o', job['output'], '-x', TOOL_DIRECTORY] + job['options']
+    start = time.time()
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    seconds = round(time.time() - start)
+
+    # convert.sh stops without log file for some errors (e.g. the output name already exists)
+    log_file = job['output'] + '_Log.txt'
+    if not os.path.exists(log_file):
+        with open(log_file, "w") as NewFileLog:
+            NewFileLog.write(result.stdout)
+    complete = all(os.path.exists(job['output'] + extension) for extension in ('.bed', '.bim', '.fam'))
+    status = 'OK' if result.returncode == 0 and complete else 'FAILED'
+    return [job['platform'], job['input'], job['output'], status, result.returncode,
+            count_lines(job['output'] + '.fam'), count_lines(job['output'] + '.bim'), seconds]
+
+
+def run_jobs(jobs, number_processes):
+    """
+    :param jobs: list made by get_jobs
+    :param number_processes: number of conversions that run at the same time
+    :return: list with the summary row of each conversion, in the order of the manifest
+    The first conversion of each platform starts right away, the other conversions of a platform start when the first
+    one is finished and the reference tables of this platform are in the table cache.
+    """
+    waiting = {}
+    for index, job in enumerate(jobs):
+        waiting.setdefault(job['platform'], []).append(index)
+    results = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=number_processes) as pool:
+        running = {pool.submit(run_job, jobs[indexes[0]]): indexes[0] for indexes in waiting.values()}
+        for indexes in waiting.values():
+            del indexes[0]
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                results[index] = future.result()
+                print(f"{results[index][3]}\t{jobs[index]['platform']}\t{jobs[index]['input']}\t"
+                      f"{results[index][7]} seconds", flush=True)
+                for next_index in waiting.pop(jobs[index]['platform'], []):
+                    running[pool.submit(run_job, jobs[next_index])] = next_index
+    return results
+
+
+def main():
+    """
+    Converts all input files of the manifest with convert.sh and writes a summary file
+    """
+    # input files
+    filename_manifest = sys.argv[1]  # manifest with per row platform, input file, output name and extra options
+    number_processes = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+    # output files
+    filename_summary = os.path.splitext(filename_manifest)[0] + '_Summary.txt'
+
+    with open(filename_manifest, mode="r") as DataManifest:
+        jobs = get_jobs(DataManifest)
+    if not jobs:
+        sys.exit(f"ERROR: no input files found in the manifest {filename_manifest}")
+
+    # load the SNP table once, the conversions load it from the table cache
+    if any(job['platform'] in SNP_TABLE_PLATFORMS for job in jobs):
+        load_snp_table(TOOL_DIRECTORY)
+
+    start = time.time()
+    results = run_jobs(jobs, number_processes)
+    with open(filename_summary, "w", newline='') as NewFileSummary:
+        writer_summary = csv.writer(NewFileSummary, delimiter='\t')
+        writer_summary.writerow(SUMMARY_HEADER)
+        writer_summary.writerows(results)
+
+    count_failed = sum(1 for result in results if result[3] != 'OK')
+    print("Number of converted input files: ", len(results) - count_failed)
+    print("Number of failed input files: ", count_failed)
+    print("Summary written to: ", filename_summary)
+    print('Execution time:', time.time() - start, 'seconds')
+    if count_failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
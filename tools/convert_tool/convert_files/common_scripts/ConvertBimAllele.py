@@ -0,0 +1,170 @@
+"""
+This script:
+contains functions to change the allele calling of SNPs in a .bim file, the python version of convert_bim_allele.pl
+    allele callings: top (Illumina TOP), dbsnp (forward), ilmn12 (Illumina A/B coded as 1/2) and ilmnab (Illumina A/B)
+    the SNP table (SNP_Table_Big.txt) is read into a dictionary (SNP id: [TOP alleles, forward alleles, type]) that is
+    stored with ReferenceTables.load_table, so following runs do not parse the SNP table again
+    the converters use convert_alleles() while writing their .bim file, so no extra step to rewrite the .bim is needed
+    the alleles are the same as with convert_bim_allele.pl (without --force and --replacezero):
+        unobserved (0) alleles stay 0
+        a SNP that is not in the SNP table, or with alleles that do not match the SNP table, stops the conversion
+can also be used as script to convert a .bim file made by plink:
+    python3 ConvertBimAllele.py <input .bim> <new .bim> <tool directory> <intype> <outtype>
+"""
+import os
+import re
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from ReferenceTables import load_table
+
+ALLELE_TYPES = ['top', 'dbsnp', 'ilmn12', 'ilmnab']
+REVERSE = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A'}
+ILMN_ALLELES = {'ilmn12': '12', 'ilmnab': 'AB'}
+
+
+def get_snp_table(file):
+    """
+    :param file: input file (SNP_Table_Big.txt) with columns Name, SNP, ILMN Strand and Customer Strand
+    :return: dictionary with per SNP id [TOP alleles, forward alleles, type], the alleles as string of 2 characters
+    (e.g. 'AG'), type is 'snp', 'indel' or 'unknown' (ALLELE UNKNOWN in the SNP table, has no alleles)
+    """
+    header = file.readline().rstrip('\r\n').split('\t')
+    try:
+        name_index, snp_index = header.index('Name'), header.index('SNP')
+        ilmn_index, cust_index = header.index('ILMN Strand'), header.index('Customer Strand')
+    except ValueError:
+        sys.exit("ERROR: cannot find Name, SNP, ILMN Strand or Customer Strand column in the first line of the SNP table")
+    snp_table = {}
+    for line in file:
+        line = line.rstrip('\r\n').split('\t')
+        name, snp, ilmn, cust = line[name_index], line[snp_index], line[ilmn_index].upper(), line[cust_index].upper()
+        # insertion/deletion polymorphism, alleles are D and I
+        if snp == '[D/I]' or snp == '[I/D]':
+            snp_table[name] = [snp[1] + snp[3], snp[1] + snp[3], 'indel']
+            continue
+        if snp == '[N/A':
+            snp_table[name] = [None, None, 'unknown']
+            continue
+        alleles = re.match(r'^\[(\w)/(\w)\]$', snp)
+        if alleles is None or ilmn not in ('TOP', 'BOT') or cust not in ('TOP', 'BOT'):
+            sys.exit(f"ERROR: invalid record found in the SNP table: {name} {snp} {ilmn} {cust}")
+        alleles = alleles.group(1) + alleles.group(2)
+        reverse = REVERSE.get(alleles[0], '') + REVERSE.get(alleles[1], '')
+        # the alleles in the SNP column are on the ILMN strand, the forward alleles are on the customer strand
+        top_alleles = alleles if ilmn == 'TOP' else reverse
+        forward_alleles = alleles if ilmn == cust else reverse
+        snp_table[name] = [top_alleles, forward_alleles, 'snp']
+    return snp_table
+
+
+def load_snp_table(tool_directory):
+    """
+    :param tool_directory: tool path Galaxy
+    :return: dictionary made by get_snp_table from SNP_Table_Big.txt
+    """
+    return load_table(f'{tool_directory}/convert_files/common_files/SNP_Table_Big.txt', get_snp_table)
+
+
+def get_snp_alleles(snp, snp_table, allele_type):
+    """
+    :param snp: SNP id
+    :param snp_table: dictionary made by get_snp_table
+    :param allele_type: allele calling (top, dbsnp, ilmn12 or ilmnab)
+    :return: the two alleles of the SNP in this allele calling
+    """
+    if allele_type in ILMN_ALLELES:
+        return ILMN_ALLELES[allele_type]
+    if snp not in snp_table:
+        sys.exit(f"ERROR: the SNP {snp} is not annotated in the SNP table")
+    if snp_table[snp][2] == 'unknown':
+        sys.exit(f"ERROR: the SNP {snp} is annotated as ALLELE UNKNOWN (CNV marker?) in the SNP table "
+                 f"(remove it from the .bim file before conversion)")
+    return snp_table[snp][0] if allele_type == 'top' else snp_table[snp][1]
+
+
+def convert_alleles(snp, allele1, allele2, snp_table, intype, outtype):
+    """
+    :param snp: SNP id
+    :param allele1: allele 1 (column 5 of the .bim file)
+    :param allele2: allele 2 (column 6 of the .bim file)
+    :param snp_table: dictionary made by get_snp_table
+    :param intype: allele calling of allele 1 and 2 (top, dbsnp, ilmn12 or ilmnab)
+    :param outtype: allele calling to convert to (top, dbsnp, ilmn12 or ilmnab)
+    :return: allele 1 and allele 2 in the allele calling of outtype
+    """
+    # check if the SNP is in the SNP table, also when converting between ilmn12 and ilmnab
+    get_snp_alleles(snp, snp_table, 'top')
+    if allele1 != '0' and allele2 == '0':
+        sys.exit(f"ERROR: the minor allele for SNP {snp} is {allele1} but major allele is a zero allele")
+    out_alleles = get_snp_alleles(snp, snp_table, outtype)
+
+    if intype in ILMN_ALLELES:
+        new1, new2 = allele1.translate(str.maketrans('AB', '12')), allele2.translate(str.maketrans('AB', '12'))
+        if new1 not in ('0', '1', '2') or new2 not in ('0', '1', '2'):
+            sys.exit(f"ERROR: invalid allele designation for SNP {snp} ({allele1} {allele2}), "
+                     f"0/1/2 or 0/A/B expected for {intype}")
+        # fill in the unobserved allele 1, it is set back to 0 at the end
+        if new1 == '0':
+            new1 = '2' if new2 == '1' else '1'
+        new1, new2 = (out_alleles[0], out_alleles[1]) if new1 == '1' else (out_alleles[1], out_alleles[0])
+    else:
+        if not re.match('^[ACGT0]$', allele1) or not re.match('^[ACGT0]$', allele2):
+            sys.exit(f"ERROR: invalid alleles for SNP {snp} ({allele1} {allele2}), ACGT0 expected for {intype}")
+        in_alleles = get_snp_alleles(snp, snp_table, intype)
+        if allele2 == '0':
+            new1, new2 = out_alleles[0], out_alleles[1]
+        elif allele2 == in_alleles[1] and allele1 in ('0', in_alleles[0]):
+            new1, new2 = out_alleles[0], out_alleles[1]
+        elif allele2 == in_alleles[0] and allele1 in ('0', in_alleles[1]):
+            new1, new2 = out_alleles[1], out_alleles[0]
+        else:
+            sys.exit(f"ERROR: the SNP {snp} {intype} alleles are annotated as '{in_alleles[0]} {in_alleles[1]}' in the "
+                     f"SNP table, but are '{allele1} {allele2}' in the .bim file")
+
+    # unobserved alleles stay 0
+    if allele1 == '0':
+        new1 = '0'
+    if allele2 == '0':
+        new2 = '0'
+    return new1, new2
+
+
+def main():
+    """
+    Creates a new .bim file with the alleles converted from intype to outtype
+    """
+    # input files
+    filename_bim = sys.argv[1]  # input plink .bim file
+    tool_directory = sys.argv[3]  # tool path Galaxy
+    intype = sys.argv[4]  # allele calling of the input .bim file
+    outtype = sys.argv[5]  # allele calling of the new .bim file
+
+    # output files
+    new_filename_bim = sys.argv[2]
+
+    if intype not in ALLELE_TYPES or outtype not in ALLELE_TYPES or intype == outtype:
+        sys.exit(f"ERROR: cannot convert from {intype} to {outtype}, choose two different types from "
+                 f"{', '.join(ALLELE_TYPES)}")
+
+    snp_table = load_snp_table(tool_directory)
+    count_snps = 0
+    count_indel = 0
+    with open(filename_bim, mode="r") as DataBIM, \
+            open(new_filename_bim, "w", newline='') as NewFileBIM:
+        for line in DataBIM:
+            line = line.split()
+            if len(line) != 6:
+                sys.exit(f"ERROR: invalid row found in .bim file {filename_bim} (6 columns expected): {' '.join(line)}")
+            line[4], line[5] = convert_alleles(line[1], line[4], line[5], snp_table, intype, outtype)
+            if snp_table[line[1]][2] == 'indel':
+                count_indel += 1
+            NewFileBIM.write('\t'.join(line) + '\n')
+            count_snps += 1
+
+    print(f"Number of SNPs converted from {intype} to {outtype}: ", count_snps)
+    if count_indel:
+        print("WARNING: number of indels in the .bim file (removal is recommended): ", count_indel)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+This script:
+contains functions to collect the SNPs to exclude with plink --exclude
+    the SNPs to exclude are kept in a dictionary (SNP id: None), which works as an ordered set:
+        checking if a SNP is already in the list is fast, also for many thousands of SNPs
+        the SNPs are written to the exclude file in the order they were added
+    each reason to exclude a SNP has its own counter, a counter is only raised when the SNP was not yet in the list
+"""
+import csv
+
+
+def new_exclude_list():
+    """
+    :return: new empty collection of SNPs to exclude
+    """
+    return {}
+
+
+def add_snp_to_exclude(snps_to_exclude, snp, count_reason):
+    """
+    :param snps_to_exclude: collection of SNPs to exclude, made with new_exclude_list()
+    :param snp: SNP id to exclude
+    :param count_reason: counter for the reason this SNP is excluded
+    :return: updated snps_to_exclude, and the counter raised by one if the SNP was not yet in snps_to_exclude
+    """
+    if snp not in snps_to_exclude:
+        snps_to_exclude[snp] = None
+        count_reason += 1
+    return snps_to_exclude, count_reason
+
+
+def write_snps_to_exclude(file, snps_to_exclude):
+    """
+    :param file: new file with SNPs to exclude, to use in --exclude plink
+    :param snps_to_exclude: collection of SNPs to exclude
+    """
+    writer_exclude = csv.writer(file, delimiter='\t')
+    for snp in snps_to_exclude:
+        writer_exclude.writerow([snp])
@@ -0,0 +1,122 @@
+"""
+This script:
+contains functions to read a Neogen final report sample by sample, with the samples decoded in parallel
+    a first scan only reads the sample id column (column 2) and indexes the byte offsets of each sample block (the
+    rows of one sample after each other), the rows before and including the header (row starting with SNP) are
+    skipped, as skip_description and check_if_same_sample of the converters do
+    the sample blocks are decoded by a pool of worker processes, each worker reads its own blocks from the final report
+    the decoded samples are returned in the order of the final report, so the output is the same as when the final
+    report is read row by row
+    the number of worker processes is the number of slots Galaxy gives the job (GALAXY_SLOTS), else the number of CPUs,
+    and at most 2 blocks per worker are decoded ahead of the writer, so the memory use does not grow when the writer is
+    slower than the workers
+    the converters only call main() when they are run as a script, so the workers can be started with the default
+    start method of the platform
+"""
+import io
+import multiprocessing
+import os
+from collections import deque
+
+# filename, decode function and extra arguments of the worker processes, set by set_worker
+WORKER = {}
+
+
+def index_sample_blocks(filename):
+    """
+    :param filename: input final report file
+    :return: list with per sample block the byte offset of the first row and the byte offset after the last row
+    """
+    blocks = []
+    sample = None
+    header = False
+    offset = 0
+    with open(filename, mode="rb") as Data:
+        for line in Data:
+            start = offset
+            offset += len(line)
+            # skip the first lines with data description, until and including the header
+            if not header:
+                header = line.startswith(b'SNP')
+                continue
+            columns = line.strip().split(b'\t', 2)
+            if len(columns) < 2:  # empty row
+                continue
+            # a new block starts where the sample id differs from the previous row
+            if columns[1] != sample:
+                sample = columns[1]
+                blocks.append([start, offset])
+            else:
+                blocks[-1][1] = offset
+    return blocks
+
+
+def read_sample_block(filename, block):
+    """
+    :param filename: input final report file
+    :param block: byte offsets of the block, made by index_sample_blocks
+    :return: list with the split and stripped rows of the sample block
+    """
+    with open(filename, mode="rb") as Data:
+        Data.seek(block[0])
+        data = Data.read(block[1] - block[0])
+    return [line.strip().split('\t') for line in io.StringIO(data.decode(), newline=None) if line.strip()]
+
+
+def set_worker(filename, decode_function, arguments):
+    """
+    :param filename: input final report file
+    :param decode_function: function that gets the rows of one sample block and the arguments, and returns the decoded
+    sample
+    :param arguments: tuple with the extra arguments of decode_function (e.g. the dictionary with correct alleles)
+    """
+    WORKER['filename'] = filename
+    WORKER['decode_function'] = decode_function
+    WORKER['arguments'] = arguments
+
+
+def decode_sample_block(block):
+    """
+    :param block: byte offsets of the block, made by index_sample_blocks
+    :return: the sample block decoded with the decode function given to set_worker
+    """
+    lines = read_sample_block(WORKER['filename'], block)
+    return WORKER['decode_function'](lines, *WORKER['arguments'])
+
+
+def get_number_processes():
+    """
+    :return: number of worker processes: the number of slots of the Galaxy job (GALAXY_SLOTS), else the number of CPUs
+    """
+    slots = os.environ.get('GALAXY_SLOTS', '')
+    if slots.isdigit() and int(slots) > 0:
+        return int(slots)
+    return os.cpu_count() or 1
+
+
+def iter_samples(filename, decode_function, arguments=(), number_processes=None):
+    """
+    :param filename: input final report file
+    :param decode_function: function that gets the rows of one sample block and the arguments, and returns the decoded
+    sample (decode_function must be defined at module level)
+    :param arguments: tuple with the extra arguments of decode_function
+    :param number_processes: number of worker processes, default made by get_number_processes
+    :return: generator with the decoded sample blocks, in the order of the final report
+    At most 2 blocks per worker process are submitted ahead of the block that is returned, so decoded samples do not
+    pile up in memory.
+    """
+    blocks = index_sample_blocks(filename)
+    number_processes = min(number_processes or get_number_processes(), len(blocks))
+    if number_processes <= 1:
+        set_worker(filename, decode_function, arguments)
+        yield from map(decode_sample_block, blocks)
+        return
+    with multiprocessing.Pool(number_processes, initializer=set_worker,
+                              initargs=(filename, decode_function, arguments)) as pool:
+        running = deque()
+        for block in blocks:
+            running.append(pool.apply_async(decode_sample_block, (block,)))
+            if len(running) == 2 * number_processes:
+                yield running.popleft().get()
+        while running:
+            yield running.popleft().get()
@@ -0,0 +1,100 @@
+"""
+This script:
+contains functions for an index of SNP locations (chromosome and basepair position), used instead of a dictionary
+with 'chromosome:location' strings as keys
+    each location is coded as one int64: chromosome number * 2^32 + basepair position, the chromosome numbers are given
+    in order of appearance to the chromosome names of the reference file (so 1, chr1 and X can all be used)
+    the index holds the sorted location codes and the values (e.g. SNP ids) in numpy arrays, which use a fraction of
+    the memory of a dictionary and can be stored by ReferenceTables.load_table
+    all locations of a .bim file (or of a chunk of it) are looked up at once with numpy searchsorted
+    the lookup gives the same result as the dictionaries did:
+        a location that is more than once in the reference file gets the value of the last row
+        with find_locations a location is found only once, the first row with this location gets the value and the
+        next rows are not found (no duplicate SNPs end up in the bim file)
+"""
+import numpy as np
+
+LOCATION_BITS = 32  # basepair positions are below 2^32
+
+
+def encode_locations(chromosome_numbers, chromosomes, locations):
+    """
+    :param chromosome_numbers: dictionary with per chromosome name its number in the index
+    :param chromosomes: list with the chromosome of each location
+    :param locations: list with the basepair positions (as string or int)
+    :return: int64 array with the location codes, -1 for chromosomes that are not in the index
+    """
+    numbers = np.array([chromosome_numbers.get(chromosome, -1) for chromosome in chromosomes], dtype=np.int64)
+    codes = (numbers << LOCATION_BITS) | np.array(locations, dtype=np.int64).reshape(-1)
+    codes[numbers < 0] = -1
+    return codes
+
+
+def make_position_index(chromosomes, locations, values=None):
+    """
+    :param chromosomes: list with the chromosome of each location in the reference file
+    :param locations: list with the basepair positions (as string or int)
+    :param values: list with the value of each location (e.g. SNP id), None for an index to only check locations
+    :return: dictionary with the chromosome numbers, the sorted location codes and the values of these locations (as
+    bytes)
+    """
+    chromosome_numbers = {}
+    for chromosome in chromosomes:
+        chromosome_numbers.setdefault(chromosome, len(chromosome_numbers))
+    codes = encode_locations(chromosome_numbers, chromosomes, locations)
+    order = np.argsort(codes, kind='stable')
+    codes = codes[order]
+    # for locations that are in the reference file more than once, keep the last row (as a dictionary does)
+    last = np.append(codes[1:] != codes[:-1], True) if len(codes) else np.zeros(0, dtype=bool)
+    index = {'chromosomes': chromosome_numbers, 'codes': codes[last], 'values': None}
+    if values is not None:
+        index['values'] = np.array(values, dtype=np.bytes_)[order][last]
+    return index
+
+
+def get_index_positions(index, chromosomes, locations):
+    """
+    :param index: dictionary made by make_position_index
+    :param chromosomes: list with the chromosomes to look up
+    :param locations: list with the basepair positions to look up
+    :return: array with per location the position in the index, and boolean array with which locations are in the index
+    """
+    codes = encode_locations(index['chromosomes'], chromosomes, locations)
+    positions = np.searchsorted(index['codes'], codes)
+    positions[positions == len(index['codes'])] = 0
+    if not len(index['codes']):
+        return positions, np.zeros(len(codes), dtype=bool)
+    present = (codes >= 0) & (index['codes'][positions] == codes)
+    return positions, present
+
+
+def contains_locations(index, chromosomes, locations):
+    """
+    :param index: dictionary made by make_position_index
+    :param chromosomes: list with the chromosomes to look up
+    :param locations: list with the basepair positions to look up
+    :return: boolean array with which locations are in the index
+    """
+    return get_index_positions(index, chromosomes, locations)[1]
+
+
+def find_locations(index, chromosomes, locations):
+    """
+    :param index: dictionary made by make_position_index with values
+    :param chromosomes: list with the chromosomes to look up
+    :param locations: list with the basepair positions to look up
+    :return: list with the value of each location, None when the location is not in the index or was already found
+    (in this list or in an earlier call for this index)
+    """
+    positions, present = get_index_positions(index, chromosomes, locations)
+    if 'found' not in index:
+        index['found'] = np.zeros(len(index['codes']), dtype=bool)
+    rows = np.flatnonzero(present)
+    rows = rows[~index['found'][positions[rows]]]
+    # only the first row with a location gets the value
+    rows = rows[np.unique(positions[rows], return_index=True)[1]]
+    index['found'][positions[rows]] = True
+    values = [None] * len(present)
+    for row, value in zip(rows, index['values'][positions[rows]]):
+        values[row] = value.decode()
+    return values
@@ -0,0 +1,140 @@
+"""
+This script:
+contains a function to load the static reference files of the convert tool (like SNP_Table_Big_Forward.bim,
+SNPs_CF3_CF4.txt, Neogen220K_SNP_Map_CF3.txt, WisdomTranslationTableUnchanged.txt and EmbarkSNPIdConversion)
+    the first time a reference file is loaded, the table made from it is stored in a binary cache file in
+    convert_files/table_cache, following runs load the table from this cache file instead of parsing the reference file
+    the cache is invalidated when the content of the reference file, the function that makes the table or the script
+    with this function (and with the functions it calls) changes
+    when the cache folder cannot be written (for example a read-only tool directory), the reference file is parsed
+"""
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+CACHE_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'table_cache')
+CACHE_VERSION = 1
+
+
+def get_file_hash(filename):
+    """
+    :param filename: reference file
+    :return: sha1 hash of the content of the file
+    """
+    file_hash = hashlib.sha1()
+    with open(filename, mode="rb") as Data:
+        for block in iter(lambda: Data.read(1 << 20), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def get_source_file(function):
+    """
+    :param function: function or class
+    :return: script in which the function is defined, None for built-in functions
+    """
+    module = sys.modules.get(getattr(function, '__module__', None))
+    return getattr(module, '__file__', None)
+
+
+def get_function_hash(parse_function):
+    """
+    :param parse_function: function that makes the table from the reference file
+    :return: hash of the code of the function and of the scripts with this function and the functions it calls (e.g.
+    split_and_strip), so the cache is invalidated when one of these changes
+    """
+    function_hash = hashlib.sha1()
+    source_files = {get_source_file(parse_function)}
+    codes = [parse_function.__code__]
+    while codes:
+        code = codes.pop()
+        function_hash.update(code.co_code)
+        function_hash.update(repr(code.co_names).encode())
+        for name in code.co_names:
+            value = parse_function.__globals__.get(name)
+            if callable(value):
+                source_files.add(get_source_file(value))
+        for constant in code.co_consts:
+            # nested functions (e.g. a lambda) have their own code object
+            if hasattr(constant, 'co_code'):
+                codes.append(constant)
+            else:
+                function_hash.update(repr(constant).encode())
+    for source_file in sorted(source_files - {None}):
+        function_hash.update(get_file_hash(source_file).encode())
+    return function_hash.hexdigest()[:12]
+
+
+def get_cache_filename(filename, parse_function):
+    """
+    :param filename: reference file
+    :param parse_function: function that makes the table from the reference file
+    :return: name of the cache file for this reference file and function
+    """
+    return os.path.join(CACHE_DIRECTORY, f'{os.path.basename(filename)}.{parse_function.__name__}.'
+                                         f'{get_function_hash(parse_function)}.pickle')
+
+
+def read_cache(cache_filename, file_status):
+    """
+    :param cache_filename: name of the cache file
+    :param file_status: os.stat result of the reference file
+    :return: the content of the cache file (dictionary), and True if the size and modification time of the reference
+    file are the same as when the cache was made. None if there is no usable cache file.
+    """
+    try:
+        with open(cache_filename, mode="rb") as DataCache:
+            cache = pickle.load(DataCache)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None, False
+    if not isinstance(cache, dict) or cache.get('version') != (CACHE_VERSION, sys.version_info[:2]):
+        return None, False
+    same_status = cache['size'] == file_status.st_size and cache['mtime'] == file_status.st_mtime_ns
+    return cache, same_status
+
+
+def write_cache(cache_filename, cache):
+    """
+    :param cache_filename: name of the cache file
+    :param cache: dictionary with the table and the information of the reference file
+    The cache file is first written to a temporary file and then renamed, so jobs running at the same time never read
+    a half written cache file. If the cache folder cannot be written, no cache is made.
+    """
+    try:
+        os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+        file_descriptor, temp_filename = tempfile.mkstemp(dir=CACHE_DIRECTORY, suffix='.temp')
+        try:
+            with os.fdopen(file_descriptor, "wb") as NewFileCache:
+                pickle.dump(cache, NewFileCache, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_filename, cache_filename)
+        except BaseException:
+            os.remove(temp_filename)
+            raise
+    except OSError:
+        pass
+
+
+def load_table(filename, parse_function):
+    """
+    :param filename: reference file
+    :param parse_function: function that makes the table from the opened reference file, e.g. get_snp_info
+    :return: the table made by parse_function, loaded from the cache if the content of the reference file did not change
+    """
+    file_status = os.stat(filename)
+    cache_filename = get_cache_filename(filename, parse_function)
+    cache, same_status = read_cache(cache_filename, file_status)
+    if cache is not None and same_status:
+        return cache['table']
+
+    # size or modification time differs (e.g. the tool was copied), only parse again if the content changed
+    file_hash = get_file_hash(filename)
+    if cache is not None and cache['hash'] == file_hash:
+        table = cache['table']
+    else:
+        with open(filename, mode="r") as Data:
+            table = parse_function(Data)
+    write_cache(cache_filename, {'version': (CACHE_VERSION, sys.version_info[:2]), 'size': file_status.st_size,
+                                 'mtime': file_status.st_mtime_ns, 'hash': file_hash, 'table': table})
+    return table
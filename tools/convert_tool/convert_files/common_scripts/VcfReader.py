@@ -0,0 +1,238 @@
+"""
+This script:
+contains functions to read a (whole genome) VCF file directly into plink binary files, without tabix and plink
+    the VCF is read as a stream (plain text, gzip or bgzip), only records on a location of the filter file
+    (VCFFilterFileCF3_big.txt or VCFFilterFileCF4_big.txt) are parsed
+    each record is returned as a .bim row the same way plink --vcf --chr-set 38 makes it:
+        chromosome X, Y, XY and MT are coded as 39, 40, 41 and 42 (with or without 'chr' in front)
+        allele 1 is the ALT allele and allele 2 the REF allele, for multi-allelic records the most common ALT allele
+        is used and genotypes with another ALT allele are missing
+    the genotypes (GT) are coded as in PlinkBed, half missing genotypes (e.g. ./1) are missing
+    the .bed is written like plink --make-bed: allele 1 is the minor allele, and the SNPs are sorted on chromosome and
+    location
+"""
+import csv
+import gzip
+import re
+import sys
+from itertools import compress, islice
+import numpy as np
+from PlinkBed import BED_MAGIC, HOM_A1, MISSING, HET, HOM_A2, PLINK_CHROMOSOMES, NUMBER_CHROMOSOMES, pack_codes, \
+    orient_minor_allele, reorder_snps, get_sort_order
+from PositionIndex import make_position_index, contains_locations
+
+GZIP_MAGIC = b'\x1f\x8b'
+# genotype codes of the genotypes that are seen, filled by get_genotype_code
+GENOTYPE_CODES = {}
+
+
+def open_vcf(filename):
+    """
+    :param filename: VCF file, plain text or compressed with gzip/bgzip
+    :return: opened VCF file (text mode)
+    """
+    with open(filename, mode="rb") as Data:
+        compressed = Data.read(2) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(filename, mode="rt")
+    return open(filename, mode="r")
+
+
+def get_filter_locations(file):
+    """
+    :param file: input filter file (as used by tabix -R) with per row chromosome and location, or chromosome, start and
+    end location
+    :return: position index (made by make_position_index) with the locations, with the chromosome as written in the
+    VCF file
+    """
+    chromosomes, locations = [], []
+    for line in file:
+        line = line.split()
+        if not line or line[0].startswith('#'):
+            continue
+        start = int(line[1])
+        end = int(line[2]) if len(line) > 2 else start
+        for location in range(start, end + 1):
+            chromosomes.append(line[0])
+            locations.append(location)
+    return make_position_index(chromosomes, locations)
+
+
+def get_plink_chromosome(chromosome):
+    """
+    :param chromosome: chromosome as written in the VCF file (e.g. 1, chr1, X or chrX)
+    :return: chromosome as plink --chr-set 38 writes it in the .bim file
+    """
+    if chromosome.lower().startswith('chr'):
+        chromosome = chromosome[3:]
+    chromosome = PLINK_CHROMOSOMES.get(chromosome.upper(), chromosome)
+    if not chromosome.isdigit() or not 0 < int(chromosome) <= NUMBER_CHROMOSOMES:
+        sys.exit(f"ERROR: invalid chromosome code {chromosome} in the VCF file")
+    return str(int(chromosome))
+
+
+def get_sample_ids(file, const_fid=None):
+    """
+    :param file: opened VCF file, is read until the #CHROM header line
+    :param const_fid: family id for all samples (as plink --const-fid), None to split the VCF sample id on '_' into
+    family and individual id (as plink does by default)
+    :return: list with [family id, individual id] per sample
+    """
+    for line in file:
+        if line.startswith('#CHROM'):
+            break
+        if not line.startswith('##'):
+            sys.exit("ERROR: no #CHROM header line was found in the VCF file")
+    else:
+        sys.exit("ERROR: no #CHROM header line was found in the VCF file")
+    sample_ids = []
+    for sample in line.rstrip('\r\n').split('\t')[9:]:
+        if const_fid is not None:
+            sample_ids.append([const_fid, sample])
+        elif sample.count('_') == 1:
+            sample_ids.append(sample.split('_'))
+        elif '_' in sample:
+            sys.exit(f"ERROR: multiple instances of '_' in sample id {sample}, use a constant family id instead")
+        else:
+            sample_ids.append([sample, sample])
+    return sample_ids
+
+
+def get_genotype_code(genotype, alt_allele='1'):
+    """
+    :param genotype: GT field of one sample (e.g. 0/1, 1|1, ./. or 1 for haploid)
+    :param alt_allele: number of the ALT allele that is allele 1 in the .bim
+    :return: 2 bit genotype code, coded against the ALT allele (00) and REF allele (11)
+    """
+    alleles = re.split('[/|]', genotype)
+    if any(allele not in ('0', alt_allele) for allele in alleles):
+        return MISSING
+    number_alt = alleles.count(alt_allele)
+    if number_alt == len(alleles):
+        return HOM_A1
+    if number_alt == 0:
+        return HOM_A2
+    return HET
+
+
+def get_alt_allele(alt_alleles, samples):
+    """
+    :param alt_alleles: list with the ALT alleles of a multi-allelic record
+    :param samples: list with the sample fields of the record
+    :return: number of the most common ALT allele in the genotypes (the first one if equally common)
+    """
+    counts = [0] * (len(alt_alleles) + 1)
+    for sample in samples:
+        for allele in re.split('[/|]', sample.split(':', 1)[0]):
+            if allele.isdigit() and int(allele) < len(counts):
+                counts[int(allele)] += 1
+    return str(counts.index(max(counts[1:]), 1))
+
+
+def iter_filtered_lines(file, filter_locations, block_size=1024):
+    """
+    :param file: opened VCF file, read until the #CHROM header line by get_sample_ids
+    :param filter_locations: position index made by get_filter_locations
+    :param block_size: number of lines of which the locations are looked up at once
+    :return: generator with the chromosome, location and the rest of the line, for the lines on a filter location
+    """
+    while True:
+        lines = [line.split('\t', 2) for line in islice(file, block_size)]
+        if not lines:
+            break
+        in_filter = contains_locations(filter_locations, [line[0] for line in lines], [line[1] for line in lines])
+        yield from compress(lines, in_filter)
+
+
+def iter_vcf_records(file, filter_locations):
+    """
+    :param file: opened VCF file, read until the #CHROM header line by get_sample_ids
+    :param filter_locations: position index made by get_filter_locations
+    :return: generator with per record on a filter location the .bim row (chromosome, VCF id, 0, location,
+    allele 1, allele 2) and the genotype codes of the samples
+    """
+    for chromosome, location, rest in iter_filtered_lines(file, filter_locations):
+        snp_id, ref, alt, _, _, _, format_field, samples = rest.rstrip('\r\n').split('\t', 7)
+        samples = samples.split('\t')
+        if not format_field.startswith('GT'):
+            # without genotypes all samples are missing
+            yield [get_plink_chromosome(chromosome), snp_id, '0', location, '0' if alt == '.' else alt, ref], \
+                [MISSING] * len(samples)
+            continue
+        alt_alleles = alt.split(',')
+        if len(alt_alleles) == 1:
+            codes = []
+            for sample in samples:
+                genotype = sample.split(':', 1)[0]
+                code = GENOTYPE_CODES.get(genotype)
+                if code is None:
+                    code = GENOTYPE_CODES[genotype] = get_genotype_code(genotype)
+                codes.append(code)
+        else:
+            alt_allele = get_alt_allele(alt_alleles, samples)
+            alt = alt_alleles[int(alt_allele) - 1]
+            codes = [get_genotype_code(sample.split(':', 1)[0], alt_allele) for sample in samples]
+        yield [get_plink_chromosome(chromosome), snp_id, '0', location, '0' if alt == '.' else alt, ref], codes
+
+
+def write_bed_chunk(file, bim_rows, codes):
+    """
+    :param file: new .bed file
+    :param bim_rows: list with the .bim rows of the chunk
+    :param codes: list with the genotype codes of the chunk, coded against allele 1 (00) and allele 2 (11) of the rows
+    :return: .bim rows with allele 1 and 2 swapped where allele 1 is not the minor allele (as plink --make-bed does)
+    """
+    codes = np.array(codes, dtype=np.uint8).reshape(len(bim_rows), -1)
+    first_alleles = np.array([row[4] for row in bim_rows], dtype=object)
+    second_alleles = np.array([row[5] for row in bim_rows], dtype=object)
+    codes, allele1, allele2 = orient_minor_allele(codes, first_alleles, second_alleles, zero_unobserved=False)
+    file.write(pack_codes(codes).tobytes())
+    for row, first, second in zip(bim_rows, allele1, allele2):
+        row[4], row[5] = first, second
+    return bim_rows
+
+
+def write_fam(file, sample_ids):
+    """
+    :param file: new .fam file
+    :param sample_ids: list made by get_sample_ids
+    """
+    for family_id, individual_id in sample_ids:
+        file.write(f'{family_id} {individual_id} 0 0 0 -9\n')
+
+
+def write_bed_files(rows, sample_ids, output_prefix, chunk_size=4096):
+    """
+    :param rows: iterable with the .bim rows and genotype codes, only the rows with a SNP id (not '.') are written
+    :param sample_ids: list made by get_sample_ids
+    :param output_prefix: prefix of the new .bed, .bim and .fam file
+    :param chunk_size: number of SNPs that are packed at once
+    The SNPs are written in chunks to the .bed file, afterwards the .bed file is sorted on chromosome and location
+    when needed (e.g. after the liftover of canfam 4 locations).
+    """
+    bim_rows = []
+    with open(output_prefix + '.bed', "wb") as NewFileBED, \
+            open(output_prefix + '.fam', "w", newline='') as NewFileFAM:
+        write_fam(NewFileFAM, sample_ids)
+        NewFileBED.write(BED_MAGIC)
+        chunk_rows, chunk_codes = [], []
+        for line, codes in rows:
+            if line[1] == '.':
+                continue
+            chunk_rows.append(line)
+            chunk_codes.append(codes)
+            if len(chunk_rows) == chunk_size:
+                bim_rows += write_bed_chunk(NewFileBED, chunk_rows, chunk_codes)
+                chunk_rows, chunk_codes = [], []
+        if chunk_rows:
+            bim_rows += write_bed_chunk(NewFileBED, chunk_rows, chunk_codes)
+
+    order = get_sort_order(bim_rows)
+    if order is not None:
+        reorder_snps(output_prefix + '.bed', order, len(sample_ids))
+        bim_rows = [bim_rows[index] for index in order]
+    with open(output_prefix + '.bim', "w", newline='') as NewFileBIM:
+        writer_bim = csv.writer(NewFileBIM, delimiter='\t')
+        writer_bim.writerows(bim_rows)
+    print("Number of samples written to .bed file: ", len(sample_ids))
+    print("Number of SNPs written to .bed file: ", len(bim_rows))
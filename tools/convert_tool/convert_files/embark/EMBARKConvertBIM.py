@@ -16,9 +16,13 @@ creates a new bim file with these changes:
 """
 
 import csv
+import os
 import re
 import time
 import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common_scripts'))
+from ReferenceTables import load_table
+from ExcludeList import new_exclude_list, add_snp_to_exclude, write_snps_to_exclude
 # get the start time
 st = time.time()
 
@@ -49,29 +53,25 @@ def update_id(line, indel_snps):
 def get_excluded_snps_merge(file, snps_to_exclude, count_no_correct_location):
     """
     :param file: input file with snps to exclude when merging
-    :param snps_to_exclude: set with snps to exclude
+    :param snps_to_exclude: collection with snps to exclude
     :param count_no_correct_location: counter for how many snps will be removed because location between arrays differs
-    :return: updated set of SNP IDs that have to be excluded
+    :return: updated collection of SNP IDs that have to be excluded
     """
     for line in file:
         line = split_and_strip(line)
-        if line[0] not in snps_to_exclude:  # line[0] is SNP id
-            snps_to_exclude.add(line[0])
-            count_no_correct_location += 1
+        snps_to_exclude, count_no_correct_location = add_snp_to_exclude(snps_to_exclude, line[0], count_no_correct_location)  # line[0] is SNP id
     return snps_to_exclude, count_no_correct_location
 
 
 def get_snps_without_location(line, snps_to_exclude, count_no_correct_location):
     """
     :param line: row of input map file
-    :param snps_to_exclude: set of SNP IDs that have to be excluded
+    :param snps_to_exclude: collection of SNP IDs that have to be excluded
     :param count_no_correct_location: counter for how many snps will be removed because location is missing
-    :return: updated snps_to_exclude set with SNP ids with no chromosome information (chromosome = 0, or position = 0)
+    :return: updated snps_to_exclude collection with SNP ids with no chromosome information (chromosome = 0, or position = 0)
     """
     if line[0] == '0' or line[3] == '0':  # line[0] is chromosome and line[3] is basepair position of SNP on chromosome
-        if line[1] not in snps_to_exclude:
-            snps_to_exclude.add(line[1])
-            count_no_correct_location += 1
+        snps_to_exclude, count_no_correct_location = add_snp_to_exclude(snps_to_exclude, line[1], count_no_correct_location)
     return snps_to_exclude, count_no_correct_location
 
 
@@ -150,7 +150,7 @@ def get_location(line, correct_location_snps, snps_to_exclude, count_locations_c
     """
     :param line: row of input bim file
     :param correct_location_snps: dictionary with correct snps locations
-    :param snps_to_exclude: set with snps to exclude
+    :param snps_to_exclude: collection with snps to exclude
     :param count_locations_changed: number count of how many locations were wrong in original file and are changed
     :param count_no_correct_location: number count of snps with a wrong location and no correct location is available
     :return: row with updated snp location, and counts of how many locations were changed,
@@ -165,9 +165,7 @@ def get_location(line, correct_location_snps, snps_to_exclude, count_locations_c
         line[0] = correct_location_snps[line[1]][0]
         line[3] = correct_location_snps[line[1]][1]
     else:
-        count_no_correct_location += 1
-        if line[1] not in snps_to_exclude:
-            snps_to_exclude.add(line[1])
+        snps_to_exclude, count_no_correct_location = add_snp_to_exclude(snps_to_exclude, line[1], count_no_correct_location)
     return line, snps_to_exclude, count_locations_changed, count_no_correct_location
 
 
@@ -206,36 +204,30 @@ def check_if_duplicate(line, wrong_duplicates, duplicate_snps, snps_to_exclude,
     :param line: input row of bim file
     :param duplicate_snps: dictionary with duplicate snp ids
     :param wrong_duplicates: set with snps that call wrong allele, and are part of a duplicate snp
-    :param snps_to_exclude: set with snps to exclude
+    :param snps_to_exclude: collection with snps to exclude
     :param all_snps: list to which snp ids are added
     :param count_duplicates: number count of duplicates
     :param merge_duplicates: True if duplicates other than the snps in the EmbarkDuplicatesOrWrongAlelle are present
-    :return: updated line, snps to exclude set, all snps list, number count of duplicates,
+    :return: updated line, snps to exclude collection, all snps list, number count of duplicates,
     and status of having to merge duplicates after script converted file
     """
     # change id of the duplicate snps (that both call correct allele) with id that not corresponds with other arrays and
     # is in EmbarkDuplicatesOrWrongAlelle
     if line[1] in wrong_duplicates:  # line[1] is SNP id
-        if line[1] not in snps_to_exclude:
-            snps_to_exclude.add(line[1])
-            count_duplicates += 1
+        snps_to_exclude, count_duplicates = add_snp_to_exclude(snps_to_exclude, line[1], count_duplicates)
     if line[1] in duplicate_snps.keys():
         line[1] = duplicate_snps[line[1]]
     # add _DUPLICATE to id (of snps that both call correct allele and are in DuplicatesOrWrongAlelle) that have
     # to be removed, so 1 of the duplicate pair remains
     elif line[1] in duplicate_snps.values():
         line[1] = line[1] + '_DUPLICATE'
-        if line[1] not in snps_to_exclude:
-            snps_to_exclude.add(line[1])
-            count_duplicates += 1
+        snps_to_exclude, count_duplicates = add_snp_to_exclude(snps_to_exclude, line[1], count_duplicates)
     # if other duplicates snps are found (are double in the all_snps list), add _DUPLICATE to SNP id and set status
     # of having to merge the duplicates to true
     if line[1] in all_snps:
         merge_duplicates = True
         line[1] = line[1] + '_DUPLICATE'
-        if line[1] not in snps_to_exclude:
-            snps_to_exclude.add(line[1])
-            count_duplicates += 1
+        snps_to_exclude, count_duplicates = add_snp_to_exclude(snps_to_exclude, line[1], count_duplicates)
     # if SNPid is not yet in all_snps list, add this snp
     else:
         all_snps.add(line[1])
@@ -265,17 +257,11 @@ def main():
 
     with open(filename_bim, mode="r") as DataBIM, \
             open(snps_to_exclude_merge, mode="r") as DataExcludeMerge, \
-            open(embark_duplicates_or_different_allele, mode="r") as DataUnusualSNPs, \
-            open(embark_correct_locations, mode="r") as DataCorrectLocations, \
             open(new_filename_bim, "w", newline='') as NewFileBIM, \
-            open(embark_snps_to_exclude, "w", newline='') as NewFileExcludedSNPs, \
-            open(filename_indels, mode="r") as DataIndels, \
-            open(snp_id_conversion, mode="r") as DataSNPID, \
-            open(embark_correct_alleles, mode="r") as DataCorrectAlleles:
-        writer_exclude = csv.writer(NewFileExcludedSNPs, delimiter='\t')
+            open(embark_snps_to_exclude, "w", newline='') as NewFileExcludedSNPs:
         writer_bim = csv.writer(NewFileBIM, delimiter='\t')
 
-        snps_to_exclude = set()
+        snps_to_exclude = new_exclude_list()
         all_snps = set()
         count_locations_changed = 0
         count_no_correct_location = 0
@@ -283,23 +269,23 @@ def main():
         count_wrong_allele = 0
         count_id_changed = 0
 
-        indel_snps = get_indel_snps(DataIndels)  # Get set of indel snps
+        indel_snps = load_table(filename_indels, get_indel_snps)  # Get set of indel snps
 
         # Get dictionary of embark SNP ids with different id in other array, and corresponding other platform ids
-        different_snp_ids = get_id(DataSNPID)
+        different_snp_ids = load_table(snp_id_conversion, get_id)
 
         # Get dictionary of SNPs with their correct alleles
-        correct_alleles = get_correct_alleles(DataCorrectAlleles)
+        correct_alleles = load_table(embark_correct_alleles, get_correct_alleles)
 
         # Get dictionary of the correct locations of SNPs
-        correct_location_snps = get_correct_locations(DataCorrectLocations)
+        correct_location_snps = load_table(embark_correct_locations, get_correct_locations)
 
         # set status for having to merge duplicates with plink after converting this file
         merge_duplicates = False
 
         # Add snps that are duplicates and call wrong allele, to SNPs to exclude set, and
         # make dictionary of the duplicate snps that both call correct allele for same snp, but with different ID
-        wrong_duplicates, duplicate_snps = get_duplicate_or_different_call_snps(DataUnusualSNPs)
+        wrong_duplicates, duplicate_snps = load_table(embark_duplicates_or_different_allele, get_duplicate_or_different_call_snps)
 
         # create a new bim file, mitochondrial snp file, and add snps to Embarks snps to exclude file
         for line in DataBIM:
@@ -321,15 +307,14 @@ def main():
                 line, wrong_duplicates, duplicate_snps, snps_to_exclude, all_snps, count_duplicates, merge_duplicates)
             # Write adjusted row to new bim file
             writer_bim.writerow(line)
-            # Add snps with chromosome 0 or position 0 to embarks snps to exclude set
+            # Add snps with chromosome 0 or position 0 to embarks snps to exclude collection
             snps_to_exclude, count_no_correct_location = get_snps_without_location(line, snps_to_exclude, count_no_correct_location)
 
-        # Add snps from SNPsToExcludeMerge.list to embarks snps to exclude set
+        # Add snps from SNPsToExcludeMerge.list to embarks snps to exclude collection
         snps_to_exclude, count_no_correct_location = get_excluded_snps_merge(DataExcludeMerge, snps_to_exclude, count_no_correct_location)
 
         # Write snps to exclude to new file
-        for snp in snps_to_exclude:
-            writer_exclude.writerow([snp])
+        write_snps_to_exclude(NewFileExcludedSNPs, snps_to_exclude)
 
         print("Number of SNPs to be deleted: ", len(snps_to_exclude))
         print("\t- Number of SNPs of which no correct location is available, or location differs between arrays: ", count_no_correct_location)
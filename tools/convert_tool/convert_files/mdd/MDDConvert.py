@@ -7,15 +7,20 @@ makes a new 'SNPsToExclude' file with:
 creates a new bim file with these changes:
     removes the rs numbers from the snp names
     makes the SNP names uppercase
+    converts the alleles from illumina 1 2 to TOP calling (for SNPs that are not excluded)
 creates a new fam file with these changes:
     if family id is 0, change this value to individual id
 input file is bim file
 """
 
 import csv
+import os
 import re
 import sys
 import time
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common_scripts'))
+from ExcludeList import new_exclude_list, add_snp_to_exclude, write_snps_to_exclude
+from ConvertBimAllele import load_snp_table, convert_alleles
 # get the start time
 st = time.time()
 
@@ -32,29 +37,24 @@ def split_and_strip(line):
 def get_excluded_snps_merge(file):
     """
     :param file: input file
-    :return: list with snps that have different locations between arrays
+    :return: set with snps that have different locations between arrays
     """
-    snps_exclude_merge = []
+    snps_exclude_merge = set()
     for line in file:
-        split_line = [line.strip()]
-        snps_exclude_merge.append(split_line)
+        snps_exclude_merge.add(line.strip())
     return snps_exclude_merge
 
 
 def get_unknown_snps(line, count_unknown, snps_to_exclude):
     """
-    :param line: row of the input bim file
+    :param line: row of the new bim file (SNP id in uppercase without rs_number)
     :param count_unknown: counter for how many unknown snps
-    :param snps_to_exclude: list with snps to exclude
-    :return: line with updated snp id, counts of how many unknown snps, and updated list with snps to exclude
+    :param snps_to_exclude: collection with snps to exclude
+    :return: counts of how many unknown snps, and updated collection with snps to exclude
     """
-    split_line = line.strip().split("\t")
-    if split_line[1].startswith('unknown'):  # split_line[1] is SNP id
-        split_line[1] = [split_line[1].upper()]
-        count_unknown += 1
-        if split_line[1] not in snps_to_exclude:
-            snps_to_exclude.append(split_line[1])
-    return split_line, count_unknown, snps_to_exclude
+    if line[1].startswith('UNKNOWN'):  # line[1] is SNP id
+        snps_to_exclude, count_unknown = add_snp_to_exclude(snps_to_exclude, line[1], count_unknown)
+    return count_unknown, snps_to_exclude
 
 
 def remove_rs(line):
@@ -80,15 +80,13 @@ def change_family_id(line):
 def get_snps_to_exclude(line, snps_to_exclude, snps_exclude_merge, count_exclude_merge):
     """
     :param line: input row
-    :param snps_to_exclude: list with snps to exclude, to which to append new snps
-    :param snps_exclude_merge: list with snps that have a different location between arrays
+    :param snps_to_exclude: collection with snps to exclude, to which to add new snps
+    :param snps_exclude_merge: set with snps that have a different location between arrays
     :param count_exclude_merge: counter for how many snps to exclude because location differs between arrays
-    :return: list with snps that have to be excluded
+    :return: collection with snps that have to be excluded
     """
     if line[1] in snps_exclude_merge:  # line[1] is SNP id
-        if line[1] not in snps_to_exclude:
-            snps_to_exclude.append(line[1])
-            count_exclude_merge += 1
+        snps_to_exclude, count_exclude_merge = add_snp_to_exclude(snps_to_exclude, line[1], count_exclude_merge)
     return snps_to_exclude, count_exclude_merge
 
 
@@ -113,22 +111,25 @@ def main():
             open(new_filename_fam, "w", newline='') as NewFileFam:
         writer_bim = csv.writer(NewFileBim, delimiter='\t')
         writer_fam = csv.writer(NewFileFam, delimiter='\t')
-        writer_exclude = csv.writer(NewFileExcludedSNPs, delimiter='\t')
 
         count_unknown = 0
-        count_exclude = 0
         count_exclude_merge = 0
-        snps_to_exclude = []
-        # put the SNPs on the SNPsToExcludeMerge.list in a list
-        new_line, snps_exclude_merge = get_excluded_snps_merge(DataExcludeMerge)
+        snps_to_exclude = new_exclude_list()
+        # put the SNPs on the SNPsToExcludeMerge.list in a set
+        snps_exclude_merge = get_excluded_snps_merge(DataExcludeMerge)
+        # make dictionary with the TOP and forward alleles of the SNPs in the SNP table
+        snp_table = load_snp_table(tool_directory)
 
         for line in DataBim:
-            # remove the _rs number in SNP id name and write new bim file
+            # remove the _rs number in SNP id name
             new_line = remove_rs(line)
-            writer_bim.writerow(new_line)
             # write the unknown SNPs to the new file with SNPs that have to be excluded
-            line, count_unknown, snps_to_exclude = get_unknown_snps(line, count_unknown, snps_to_exclude)
-            snps_to_exclude, count_exclude_merge = get_snps_to_exclude(line, snps_to_exclude, snps_exclude_merge, count_exclude_merge)
+            count_unknown, snps_to_exclude = get_unknown_snps(new_line, count_unknown, snps_to_exclude)
+            snps_to_exclude, count_exclude_merge = get_snps_to_exclude(new_line, snps_to_exclude, snps_exclude_merge, count_exclude_merge)
+            # convert illumina 1 2 alleles to TOP calling and write new bim file
+            if new_line[1] not in snps_to_exclude:
+                new_line[4], new_line[5] = convert_alleles(new_line[1], new_line[4], new_line[5], snp_table, 'ilmn12', 'top')
+            writer_bim.writerow(new_line)
 
         # if family id is 0, change this value to the individual id
         for line in DataFam:
@@ -136,12 +137,11 @@ def main():
             line = change_family_id(line)
             writer_fam.writerow(line)
 
-        for snp in snps_to_exclude:
-            writer_exclude.writerow(snp)
+        write_snps_to_exclude(NewFileExcludedSNPs, snps_to_exclude)
 
         print("Number of SNPs to be deleted: ", len(snps_to_exclude))
         print("\t- Number of Unknown SNPs: ", count_unknown)
-        print("\t- Number of SNPs of which no correct location is available, or location differs between arrays: ", count_exclude)
+        print("\t- Number of SNPs of which no correct location is available, or location differs between arrays: ", count_exclude_merge)
 
 
 main()
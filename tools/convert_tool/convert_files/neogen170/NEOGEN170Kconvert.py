@@ -14,11 +14,18 @@ creates a map file with these changes:
 creates a new file with a list of SNP names to be excluded:
     SNPs without location or SNPs that could not be lift over to canfam 3.1
     SNPs on SNPsToExcludeMerge.list
+the samples of the final report are decoded in parallel (see FinalReport.py) and written in the original order
 """
 import csv
+import io
+import os
 import re
 import time
 import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common_scripts'))
+from ReferenceTables import load_table
+from ExcludeList import new_exclude_list, add_snp_to_exclude, write_snps_to_exclude
+from FinalReport import iter_samples
 # get the start time
 st = time.time()
 
@@ -71,36 +78,6 @@ def update_chromosome(line):
     return line
 
 
-def skip_description(line, skip_row, header):
-    """
-    :param line: input row of final report file
-    :param skip_row: True if this row has to be skipped, otherwise false
-    :param header: True when current row is the header, otherwise false
-    :return: status of skip_row and header
-    """
-    # if previous row was the header, then current row, and following rows, should not be skipped
-    if header:
-        skip_row = False
-    # check if current row is header
-    if line.startswith("SNP"):
-        header = True
-    return skip_row, header
-
-
-def check_if_same_sample(line, sample):
-    """
-    :param line: input row of final report file
-    :param sample: the sample in the previous row
-    :return: If still the same sample: True, otherwise if new sample: False
-    """
-    # check if this row has the same sample Id as the previous row (stored in param sample)
-    if line[1] == sample:
-        same_sample = True
-    else:
-        same_sample = False
-    return same_sample
-
-
 def get_info_new_sample(line):
     """
     :param line: input row of ped file
@@ -138,21 +115,19 @@ def add_allele(line, alleles, correct_alleles, count_wrong_allele):
     return alleles, count_wrong_allele
 
 
-def previous_sample_complete(sample_info, sample_alleles):
+def decode_ped_row(lines, correct_alleles):
     """
-    :param sample_info: the sample info list created with function get_info_new_sample(line)
-    :param sample_alleles: list with alleles for this sample
-    :return: if the previous sample is complete, add the sample info list and the alleles list together in one list.
-    Return True if the list is complete, and the return list with complete sample information.
-    First it is checked whether the sample_info list is not empty. This is empty if no info was added yet, because this
-    is the first sample in the loop, there was no previous sample.
+    :param lines: split rows of one sample block of the final report
+    :param correct_alleles: dictionary with snps and their correct alleles
+    :return: row of the new ped file for this sample (as text), and the number of wrong alleles that were updated
     """
-    if len(sample_info) != 0:
-        complete_sample = sample_info + sample_alleles
-        return True, complete_sample
-    else:
-        complete_sample = []
-        return False, complete_sample
+    sample, alleles, sample_info = get_info_new_sample(lines[0])
+    count_wrong_allele = 0
+    for line in lines:
+        alleles, count_wrong_allele = add_allele(line, alleles, correct_alleles, count_wrong_allele)
+    row = io.StringIO(newline='')
+    csv.writer(row, delimiter='\t').writerow(sample_info + alleles)
+    return row.getvalue(), count_wrong_allele
 
 
 def get_excluded_snps_merge(file):
@@ -167,6 +142,20 @@ def get_excluded_snps_merge(file):
     return snps_to_exclude_merge
 
 
+def get_snp_map(file):
+    """
+    :param file: input snp map file from neogen
+    :return: list with the split rows of the snp map file, without the header
+    """
+    snp_map = []
+    for index, line in enumerate(file):
+        # skip first header line
+        if index == 0:
+            continue
+        snp_map.append(split_and_strip(line))
+    return snp_map
+
+
 def get_cf3_locations(file):
     """
     :param file: input file with snps in canfam 3.1
@@ -179,21 +168,19 @@ def get_cf3_locations(file):
     return snps_cf3_info
 
 
-def update_location(line, snps_cf3_info, snps_to_exclude_list, snps_to_exclude_merge, count_merge_exclude, count_no_correct_location, count_locations_changed):
+def update_location(line, snps_cf3_info, snps_to_exclude, snps_to_exclude_merge, count_merge_exclude, count_no_correct_location, count_locations_changed):
     """
     :param line: row of input map file
     :param snps_cf3_info: dictionary of snps in canfam 3
-    :param snps_to_exclude_list: list to which the snps are added that are not liftover to canfam 3.1 to exclude
+    :param snps_to_exclude: collection to which the snps are added that are not liftover to canfam 3.1 to exclude
     :param snps_to_exclude_merge: set with snps that have to be excluded because location differs between arrays
     :param count_merge_exclude: counter of how many snps have no correct location
     :param count_no_correct_location: counter of how many snps have no correct location
     :param count_locations_changed: counter of how many snp locations were updated
-    :return: row with updated location and chromosome, list with snps to exclude
+    :return: row with updated location and chromosome, collection with snps to exclude
     """
     if line[1] in snps_to_exclude_merge:  # line[1] is SNP id
-        if line[1] not in snps_to_exclude_list:
-            snps_to_exclude_list.append(line[1])
-            count_merge_exclude += 1
+        snps_to_exclude, count_merge_exclude = add_snp_to_exclude(snps_to_exclude, line[1], count_merge_exclude)
     elif line[1] in snps_cf3_info.keys():
         # count the number of snps that were changed
         if line[3] != snps_cf3_info[line[1]][1]:
@@ -201,9 +188,8 @@ def update_location(line, snps_cf3_info, snps_to_exclude_list, snps_to_exclude_m
         line[0] = snps_cf3_info[line[1]][0]  # line[0] is chromosome
         line[3] = snps_cf3_info[line[1]][1]  # line[3] is basepair position
     else:
-        count_no_correct_location += 1
-        snps_to_exclude_list.append(line[1])
-    return line, snps_to_exclude_list, count_merge_exclude, count_no_correct_location, count_locations_changed
+        snps_to_exclude, count_no_correct_location = add_snp_to_exclude(snps_to_exclude, line[1], count_no_correct_location)
+    return line, snps_to_exclude, count_merge_exclude, count_no_correct_location, count_locations_changed
 
 
 def get_correct_alleles(file):
@@ -235,92 +221,57 @@ def main():
     new_filename_ped = sys.argv[3] + '.ped'
     neogen_snps_to_exclude = sys.argv[2]  # File with SNPids to use in --exclude plink
 
-    with open(filename_map, mode="r") as DataMAP, \
-            open(filename_final, mode="r") as DataFINAL, \
-            open(filename_cf3_locations, mode="r") as DataCF3, \
-            open(snps_to_exclude_merge, mode="r") as DataExcludeMerge, \
+    with open(snps_to_exclude_merge, mode="r") as DataExcludeMerge, \
             open(neogen_snps_to_exclude, "w", newline='') as NewFileExcludedSNPs, \
-            open(neogen_correct_alleles, mode="r") as DataCorrectAlleles, \
             open(new_filename_map, "w", newline='') as NewFileMAP, \
             open(new_filename_ped, "w", newline='') as NewFilePED:
-        writer_exclude = csv.writer(NewFileExcludedSNPs, delimiter='\t')
         writer_map = csv.writer(NewFileMAP, delimiter='\t')
-        writer_ped = csv.writer(NewFilePED, delimiter='\t')
 
         # Make dictionary of snps that were liftover to canfam 3.1
-        snps_cf3_info = get_cf3_locations(DataCF3)
+        snps_cf3_info = load_table(filename_cf3_locations, get_cf3_locations)
 
         # Add snps from SNPsToExcludeMerge.list to a set
         snps_to_exclude_merge = get_excluded_snps_merge(DataExcludeMerge)
 
         # Get dictionary of SNPs with their correct alleles
-        correct_alleles = get_correct_alleles(DataCorrectAlleles)
+        correct_alleles = load_table(neogen_correct_alleles, get_correct_alleles)
 
         count_locations_changed = 0
         count_no_correct_location = 0
         count_merge_exclude = 0
         count_wrong_allele = 0
 
-        snps_to_exclude_list = []
+        snps_to_exclude = new_exclude_list()
         # create new map file in cf 3.1
-        for index, line in enumerate(DataMAP):
-            # skip first header line
-            if index == 0:
-                continue
-            line = split_and_strip(line)
+        for line in load_table(filename_map, get_snp_map):
             line = reorder_and_select_columns(line)
             line = update_id(line)  # make id uppercase and remove _rsnumber
             # Update location and chromosome and add snps to snp list to exclude when snp could not be liftover
-            line, snps_to_exclude_list, count_merge_exclude, count_no_correct_location, count_locations_changed = update_location(line, snps_cf3_info, snps_to_exclude_list, snps_to_exclude_merge, count_merge_exclude, count_no_correct_location, count_locations_changed)
+            line, snps_to_exclude, count_merge_exclude, count_no_correct_location, count_locations_changed = update_location(line, snps_cf3_info, snps_to_exclude, snps_to_exclude_merge, count_merge_exclude, count_no_correct_location, count_locations_changed)
             # change chromosome coding: X to 39 or 41 (pseudo-autosomal), and Y to 40
             line = update_chromosome(line)
             writer_map.writerow(line)
 
-        # write snps in snps_to_exclude_list to new file
-        for snp in snps_to_exclude_list:
-            writer_exclude.writerow([snp])
-
-        # create new ped file
-        skip_row = True
-        header = False
-        sample = None
-        sample_info = []
-        alleles = []
-        # get index of last sample
-        for line in DataFINAL:
-            # skip the first lines with data description
-            skiprow, header = skip_description(line, skip_row, header)
-            if skiprow:
-                continue
-            line = split_and_strip(line)
-            # check if sample has changed or not
-            if not check_if_same_sample(line, sample):
-                # if this is a new sample, complete the previous sample and write this to a new file
-                complete, complete_sample = previous_sample_complete(sample_info, alleles)
-                if complete:
-                    writer_ped.writerow(complete_sample)
-                # get sample info of new sample (family ID, individual ID, paternal and maternal ID, sex and phenotype)
-                sample, alleles, sample_info = get_info_new_sample(line)
-            # if still on same sample, add new alleles to list
-            if check_if_same_sample(line, sample):
-                # update and add alleles
-                alleles, count_wrong_allele = add_allele(line, alleles, correct_alleles, count_wrong_allele)
-        # completing last sample
-        complete, complete_sample = previous_sample_complete(sample_info, alleles)
-        if complete:
-            writer_ped.writerow(complete_sample)
-
-        print("Number of SNPs to be deleted: ", len(snps_to_exclude_list))
+        # write snps in snps_to_exclude to new file
+        write_snps_to_exclude(NewFileExcludedSNPs, snps_to_exclude)
+
+        # create new ped file, the samples are decoded in parallel and written in the order of the final report
+        for row, count_wrong in iter_samples(filename_final, decode_ped_row, (correct_alleles,)):
+            NewFilePED.write(row)
+            count_wrong_allele += count_wrong
+
+        print("Number of SNPs to be deleted: ", len(snps_to_exclude))
         print("\t- Number of SNPs of which no correct location is available: ", count_no_correct_location)
         print("\t- Number of SNPs to be removed because location of SNP differs between arrays: ", count_merge_exclude)
         print("Number of SNPs of which location is updated (canfam 2 --> canfam 3): ", count_locations_changed)
         print("Number of SNPs in all samples with a wrong allele:", count_wrong_allele)
 
 
-main()
+if __name__ == '__main__':
+    main()
 
-# get the end time
-et = time.time()
-# get the execution time
-elapsed_time = et - st
-print('Execution time:', elapsed_time, 'seconds')
\ No newline at end of file
+    # get the end time
+    et = time.time()
+    # get the execution time
+    elapsed_time = et - st
+    print('Execution time:', elapsed_time, 'seconds')
\ No newline at end of file
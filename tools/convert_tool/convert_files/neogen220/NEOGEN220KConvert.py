@@ -22,12 +22,22 @@ creates a new file with a list of SNP names to be excluded:
     SNPs without location
     Duplicate SNPs
     SNPs on SNPsToExcludeMerge.list
+the samples of the final report are decoded in parallel (see FinalReport.py) and written in the original order
+with the extra argument 'bed', instead of the ped and map file directly creates the .bed, .bim and .fam file:
+    the final report is streamed sample by sample, so memory use is bounded by the samples being decoded
+    SNPs on the list with SNPs to exclude are left out
 
 """
 import csv
+import io
+import os
 import re
 import time
 import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common_scripts'))
+from ReferenceTables import load_table
+from ExcludeList import new_exclude_list, add_snp_to_exclude, write_snps_to_exclude
+from FinalReport import iter_samples
 # get the start time
 st = time.time()
 
@@ -119,36 +129,6 @@ def get_id(file):
     return different_snp_ids
 
 
-def skip_description(line, skip_row, header):
-    """
-    :param line: input row of final report file
-    :param skip_row: True if this row has to be skipped, otherwise false
-    :param header: True when current row is the header, otherwise false
-    :return: status of skip_row and header
-    """
-    # if previous row was the header, then current row, and following rows, should not be skipped
-    if header:
-        skip_row = False
-    # check if current row is header
-    if line.startswith("SNP"):
-        header = True
-    return skip_row, header
-
-
-def check_if_same_sample(line, sample):
-    """
-    :param line: input row of final report file
-    :param sample: the sample in the previous row
-    :return: If still the same sample: True, otherwise if new sample: False
-    """
-    # check if this row has the same sample Id as the previous row (stored in param sample)
-    if line[1] == sample:
-        same_sample = True
-    else:
-        same_sample = False
-    return same_sample
-
-
 def get_location(line, count_locations_changed):
     """
     :param line: row of input snp map file
@@ -218,21 +198,18 @@ def add_allele(line, alleles, correct_alleles, count_wrong_allele):
     return alleles, count_wrong_allele
 
 
-def previous_sample_complete(sample_info, sample_alleles):
+def get_snp_map(file):
     """
-    :param sample_info: the sample info list created with function get_info_new_sample(line)
-    :param sample_alleles: list with alleles for this sample
-    :return: if the previous sample is complete, add the sample info list and the alleles list together in one list.
-    Return True if the list is complete, and the return list with complete sample information.
-    First it is checked whether the sample_info list is not empty. This is empty if no info was added yet, because this
-    is the first sample in the loop, there was no previous sample.
+    :param file: input snp map file from neogen
+    :return: list with the split rows of the snp map file, without the header
     """
-    if len(sample_info) != 0:
-        complete_sample = sample_info + sample_alleles
-        return True, complete_sample
-    else:
-        complete_sample = []
-        return False, complete_sample
+    snp_map = []
+    for index, line in enumerate(file):
+        # skip first header line
+        if index == 0:
+            continue
+        snp_map.append(split_and_strip(line))
+    return snp_map
 
 
 def get_missing_location_snps(file):
@@ -263,50 +240,45 @@ def get_missing_location(line, missing_snps_info, count_locations_changed):
     return line, count_locations_changed
 
 
-def get_snps_without_location_for_exclude_file(line, snps_to_exclude_list, count_no_correct_location):
+def get_snps_without_location_for_exclude_file(line, snps_to_exclude, count_no_correct_location):
     """
     :param line: row of snp map file
-    :param snps_to_exclude_list: list to which the snps are added, which have to be excluded because of no location,
+    :param snps_to_exclude: collection to which the snps are added, which have to be excluded because of no location,
     these snps have as chromosome: 0, so location is incorrect.
     :param count_no_correct_location: counter for how many snps have no location
-    :return: updated list with snps that have to be excluded
+    :return: updated collection with snps that have to be excluded
     """
-    # check if chromosome or basepair position is 0, and snp is not already in snps to exclude list
-    if line[0] == '0' or line[3] == '0' and line[1] not in snps_to_exclude_list:
-        snps_to_exclude_list.append(line[1])
-        count_no_correct_location += 1
-    return snps_to_exclude_list, count_no_correct_location
+    # check if chromosome or basepair position is 0
+    if line[0] == '0' or line[3] == '0':
+        snps_to_exclude, count_no_correct_location = add_snp_to_exclude(snps_to_exclude, line[1], count_no_correct_location)
+    return snps_to_exclude, count_no_correct_location
 
 
-def get_excluded_snps_merge(file, snps_to_exclude_list, count_merge_exclude):
+def get_excluded_snps_merge(file, snps_to_exclude, count_merge_exclude):
     """
     :param file: input file SNPsToExcludeMerge.list
-    :param snps_to_exclude_list: list to which the snps names are added from the SNPsToExcludeMerge.list, if they are not
-    already in the list
+    :param snps_to_exclude: collection to which the snps names are added from the SNPsToExcludeMerge.list, if they are
+    not already in the collection
     :param count_merge_exclude: counter for how many snps will be removed because location differs between arrays
-    :return: updated list with snps that have to be excluded
+    :return: updated collection with snps that have to be excluded
     """
     for line in file:
         line = split_and_strip(line)
-        if line[0] not in snps_to_exclude_list:  # line[0] is SNP id
-            snps_to_exclude_list.append(line[0])
-            count_merge_exclude += 1
-    return snps_to_exclude_list, count_merge_exclude
+        snps_to_exclude, count_merge_exclude = add_snp_to_exclude(snps_to_exclude, line[0], count_merge_exclude)  # line[0] is SNP id
+    return snps_to_exclude, count_merge_exclude
 
 
-def get_duplicates(file, snps_to_exclude_list, count_duplicates):
+def get_duplicates(file, snps_to_exclude, count_duplicates):
     """
     :param file: file Neogen220KDuplicates
-    :param snps_to_exclude_list: list with snps to exclude, to append to
+    :param snps_to_exclude: collection with snps to exclude, to add to
     :param count_duplicates: counter for how many duplicates are removed
     :return: Neogen SNP ids (first column) in this file
     """
     for line in file:
         line = split_and_strip(line, ',')
-        if line[0] not in snps_to_exclude_list:  # line[0] is SNP id
-            snps_to_exclude_list.append(line[0])
-            count_duplicates += 1
-    return snps_to_exclude_list, count_duplicates
+        snps_to_exclude, count_duplicates = add_snp_to_exclude(snps_to_exclude, line[0], count_duplicates)  # line[0] is SNP id
+    return snps_to_exclude, count_duplicates
 
 
 def get_correct_alleles(file):
@@ -321,9 +293,138 @@ def get_correct_alleles(file):
     return correct_alleles
 
 
+def decode_sample(lines, correct_alleles):
+    """
+    :param lines: split rows of one sample block of the final report
+    :param correct_alleles: dictionary with snps and their correct alleles
+    :return: sample info (family ID, individual ID, paternal and maternal ID, sex and phenotype), list with the updated
+    alleles of this sample and the number of wrong alleles that were updated
+    """
+    sample, alleles, sample_info = get_info_new_sample(lines[0])
+    count_wrong_allele = 0
+    for line in lines:
+        alleles, count_wrong_allele = add_allele(line, alleles, correct_alleles, count_wrong_allele)
+    return sample_info, alleles, count_wrong_allele
+
+
+def decode_ped_row(lines, correct_alleles):
+    """
+    :param lines: split rows of one sample block of the final report
+    :param correct_alleles: dictionary with snps and their correct alleles
+    :return: row of the new ped file for this sample (as text), and the number of wrong alleles that were updated
+    """
+    sample_info, alleles, count_wrong_allele = decode_sample(lines, correct_alleles)
+    row = io.StringIO(newline='')
+    csv.writer(row, delimiter='\t').writerow(sample_info + alleles)
+    return row.getvalue(), count_wrong_allele
+
+
+def decode_bed_sample(lines, correct_alleles):
+    """
+    :param lines: split rows of one sample block of the final report
+    :param correct_alleles: dictionary with snps and their correct alleles
+    :return: sample id, array with the updated alleles of this sample and the number of wrong alleles that were updated
+    """
+    import numpy as np
+    sample_info, alleles, count_wrong_allele = decode_sample(lines, correct_alleles)
+    return sample_info[1], np.array(alleles, dtype='U1'), count_wrong_allele
+
+
+def write_map_and_ped(filename, map_rows, correct_alleles, count_wrong_allele, output_prefix):
+    """
+    :param filename: input final report file
+    :param map_rows: list with the rows of the new map file
+    :param correct_alleles: dictionary with snps and their correct alleles
+    :param count_wrong_allele: counter for how many wrong alleles were updated
+    :param output_prefix: prefix of the new map and ped file
+    :return: updated count_wrong_allele
+    """
+    with open(output_prefix + '.map', "w", newline='') as NewFileMAP, \
+            open(output_prefix + '.ped', "w", newline='') as NewFilePED:
+        writer_map = csv.writer(NewFileMAP, delimiter='\t')
+        writer_map.writerows(map_rows)
+
+        # create new ped file, the samples are decoded in parallel and written in the order of the final report
+        for row, count_wrong in iter_samples(filename, decode_ped_row, (correct_alleles,)):
+            NewFilePED.write(row)
+            count_wrong_allele += count_wrong
+    return count_wrong_allele
+
+
+def write_bed_files(filename, map_rows, snps_to_exclude, correct_alleles, count_wrong_allele, output_prefix):
+    """
+    :param filename: input final report file
+    :param map_rows: list with the rows of the new map file
+    :param snps_to_exclude: collection with snps that are left out of the new files
+    :param correct_alleles: dictionary with snps and their correct alleles
+    :param count_wrong_allele: counter for how many wrong alleles were updated
+    :param output_prefix: prefix of the new .bed, .bim and .fam file
+    :return: updated count_wrong_allele, and number of genotypes set to missing because of a third allele
+    The final report is sample-major, the .bed is SNP-major. The samples are decoded in parallel, and each sample is
+    packed into a temporary file in the order of the final report, afterwards this file is transposed in chunks of
+    SNPs into the .bed file, which is then sorted on chromosome and location when needed (as plink --make-bed sorts).
+    """
+    # numpy is only needed when writing the .bed file directly, not for the .map and .ped file
+    import numpy as np
+    from PlinkBed import BED_MAGIC, encode_alleles, pack_codes, orient_minor_allele, iter_snp_chunks, write_fam, \
+        get_sort_order, reorder_snps
+
+    number_snps = len(map_rows)
+    first_alleles = np.full(number_snps, '0', dtype='U1')
+    second_alleles = np.full(number_snps, '0', dtype='U1')
+    sample_ids = []
+    count_third_allele = 0
+    temp_sample_major = output_prefix + '_temp_sample_major'
+
+    def complete_sample(sample_alleles):
+        if len(sample_alleles) != 2 * number_snps:
+            sys.exit(f"ERROR: sample {sample_ids[-1]} has {len(sample_alleles) // 2} SNPs in the final report, "
+                     f"but the SNP map has {number_snps} SNPs")
+        codes, count_third = encode_alleles(sample_alleles, first_alleles, second_alleles)
+        TempFile.write(pack_codes(codes).tobytes())
+        return count_third
+
+    with open(temp_sample_major, "wb") as TempFile:
+        for sample, alleles, count_wrong in iter_samples(filename, decode_bed_sample, (correct_alleles,)):
+            sample_ids.append(sample)
+            count_wrong_allele += count_wrong
+            count_third_allele += complete_sample(alleles)
+    if not sample_ids:
+        os.remove(temp_sample_major)
+        sys.exit("ERROR: no samples found in the final report")
+
+    keep = np.array([row[1] not in snps_to_exclude for row in map_rows], dtype=bool)
+    bim_rows = []
+    with open(output_prefix + '.bed', "wb") as NewFileBED, \
+            open(output_prefix + '.fam', "w", newline='') as NewFileFAM:
+        write_fam(NewFileFAM, sample_ids)
+        NewFileBED.write(BED_MAGIC)
+        for start, codes in iter_snp_chunks(temp_sample_major, len(sample_ids), number_snps):
+            stop = start + len(codes)
+            chunk_keep = keep[start:stop]
+            codes, allele1, allele2 = orient_minor_allele(codes[chunk_keep], first_alleles[start:stop][chunk_keep],
+                                                          second_alleles[start:stop][chunk_keep])
+            NewFileBED.write(pack_codes(codes).tobytes())
+            chunk_rows = [row for row, kept in zip(map_rows[start:stop], chunk_keep) if kept]
+            bim_rows += [row + [a1, a2] for row, a1, a2 in zip(chunk_rows, allele1, allele2)]
+    os.remove(temp_sample_major)
+
+    order = get_sort_order(bim_rows)
+    if order is not None:
+        reorder_snps(output_prefix + '.bed', order, len(sample_ids))
+        bim_rows = [bim_rows[index] for index in order]
+    with open(output_prefix + '.bim', "w", newline='') as NewFileBIM:
+        writer_bim = csv.writer(NewFileBIM, delimiter='\t')
+        writer_bim.writerows(bim_rows)
+    print("Number of samples written to .bed file: ", len(sample_ids))
+    print("Number of SNPs written to .bed file: ", int(np.count_nonzero(keep)))
+    return count_wrong_allele, count_third_allele
+
+
 def main():
     """
-    Creates a new MAP file and a new PED file and a file with SNPs to exclude
+    Creates a new MAP file and a new PED file and a file with SNPs to exclude,
+    or with the extra argument 'bed' a new .bed, .bim and .fam file and a file with SNPs to exclude
     """
     # input files
     filename_final = sys.argv[1]  # input final report file that was given as option in the convert.sh script
@@ -337,23 +438,13 @@ def main():
     neogen_correct_alleles = f'{tool_directory}/convert_files/neogen220/Neogen220KCorrectAlleles.bim'
 
     # output files
-    new_filename_map = sys.argv[3] + '.map'
-    new_filename_ped = sys.argv[3] + '.ped'
+    output_prefix = sys.argv[3]  # prefix for the .map and .ped, or for the .bed, .bim and .fam file
     neogen_snps_to_exclude = sys.argv[2]  # File with SNPids to use in --exclude plink
+    write_bed = len(sys.argv) > 5 and sys.argv[5] == 'bed'  # write .bed, .bim and .fam instead of .map and .ped
 
-    with open(filename_map, mode="r") as DataMAP, \
-            open(filename_final, mode="r") as DataFINAL, \
-            open(duplicates, mode="r") as DataDuplicates, \
-            open(filename_missing_snps, mode="r") as DataMissingSNPs, \
-            open(new_filename_map, "w", newline='') as NewFileMAP, \
-            open(new_filename_ped, "w", newline='') as NewFilePED, \
+    with open(duplicates, mode="r") as DataDuplicates, \
             open(snps_to_exclude_merge, mode="r") as DataExcludeMerge, \
-            open(neogen_correct_alleles, mode="r") as DataCorrectAlleles, \
-            open(other_array_ids, mode="r") as DataOtherIds, \
             open(neogen_snps_to_exclude, "w", newline='') as NewFileExcludedSNPs:
-        writer_map = csv.writer(NewFileMAP, delimiter='\t')
-        writer_ped = csv.writer(NewFilePED, delimiter='\t')
-        writer_exclude = csv.writer(NewFileExcludedSNPs, delimiter='\t')
 
         count_locations_changed = 0
         count_no_correct_location = 0
@@ -361,22 +452,20 @@ def main():
         count_duplicates = 0
         count_merge_exclude = 0
         count_wrong_allele = 0
+        count_third_allele = 0
         # Make dictionary of snps with missing snp info
-        missing_snps_info = get_missing_location_snps(DataMissingSNPs)
+        missing_snps_info = load_table(filename_missing_snps, get_missing_location_snps)
 
         # Make dictionary with neogen snp ids and corresponding other array ids
-        different_snp_ids = get_id(DataOtherIds)
+        different_snp_ids = load_table(other_array_ids, get_id)
 
         # Get dictionary of SNPs with their correct alleles
-        correct_alleles = get_correct_alleles(DataCorrectAlleles)
-
-        snps_to_exclude_list = []
-        # create new  map file
-        for index, line in enumerate(DataMAP):
-            # skip first header line
-            if index == 0:
-                continue
-            line = split_and_strip(line)
+        correct_alleles = load_table(neogen_correct_alleles, get_correct_alleles)
+
+        snps_to_exclude = new_exclude_list()
+        map_rows = []
+        # create new map rows
+        for line in load_table(filename_map, get_snp_map):
             line = reorder_columns(line)
             # make snp id uppercase, remove _rsnumber, change snp id if present in other arrays under different name
             line, count_id_changed = update_snp_id(line, different_snp_ids, count_id_changed)
@@ -389,60 +478,41 @@ def main():
             # change chromosome coding: X to 39 or 41 (pseudo-autosomal), and Y to 40, and MT to 42
             line = update_chromosome(line)
             # Add snps with chromosome 0 or position 0 to neogen snps to exclude file
-            snps_to_exclude_list, count_no_correct_location = get_snps_without_location_for_exclude_file(line, snps_to_exclude_list, count_no_correct_location)
-            writer_map.writerow(line)
+            snps_to_exclude, count_no_correct_location = get_snps_without_location_for_exclude_file(line, snps_to_exclude, count_no_correct_location)
+            map_rows.append(line)
 
         # Add snps from SNPsToExcludeMerge.list to snps to exclude list
-        snps_to_exclude_list, count_merge_exclude = get_excluded_snps_merge(DataExcludeMerge, snps_to_exclude_list, count_merge_exclude)
+        snps_to_exclude, count_merge_exclude = get_excluded_snps_merge(DataExcludeMerge, snps_to_exclude, count_merge_exclude)
 
         # Add duplicate snps to the snps to exclude list
-        snps_to_exclude_list, count_duplicates = get_duplicates(DataDuplicates, snps_to_exclude_list, count_duplicates)
-
-        # write snps in snps_to_exclude_list to new file
-        for snp in snps_to_exclude_list:
-            writer_exclude.writerow([snp])
-
-        # create new ped file
-        skip_row = True
-        header = False
-        sample = None
-        sample_info = []
-        alleles = []
-        for line in DataFINAL:
-            # skip the first lines with data description
-            skiprow, header = skip_description(line, skip_row, header)
-            if skiprow:
-                continue
-            line = split_and_strip(line)
-            # check if sample has changed or not
-            if not check_if_same_sample(line, sample):
-                # if this is a new sample, complete the previous sample and write this to a new file
-                complete, complete_sample = previous_sample_complete(sample_info, alleles)
-                if complete:
-                    writer_ped.writerow(complete_sample)
-                # get sample info of new sample (family ID, individual ID, paternal and maternal ID, sex and phenotype)
-                sample, alleles, sample_info = get_info_new_sample(line)
-            # if still on same sample, add new alleles to list
-            if check_if_same_sample(line, sample):
-                # update and add alleles
-                alleles, count_wrong_allele = add_allele(line, alleles, correct_alleles, count_wrong_allele)
-        # completing last sample
-        complete, complete_sample = previous_sample_complete(sample_info, alleles)
-        if complete:
-            writer_ped.writerow(complete_sample)
-
-        print("Number of SNPs to be deleted: ", len(snps_to_exclude_list))
+        snps_to_exclude, count_duplicates = get_duplicates(DataDuplicates, snps_to_exclude, count_duplicates)
+
+        # write snps in snps_to_exclude to new file
+        write_snps_to_exclude(NewFileExcludedSNPs, snps_to_exclude)
+
+        if write_bed:
+            # stream the final report directly into a new .bed, .bim and .fam file
+            count_wrong_allele, count_third_allele = write_bed_files(filename_final, map_rows, snps_to_exclude, correct_alleles, count_wrong_allele, output_prefix)
+        else:
+            # create new map and ped file
+            count_wrong_allele = write_map_and_ped(filename_final, map_rows, correct_alleles, count_wrong_allele, output_prefix)
+
+        print("Number of SNPs to be deleted: ", len(snps_to_exclude))
         print("\t- Number of SNPs of which no correct location is available: ", count_no_correct_location)
         print("\t- Number of duplicate SNPs: ", count_duplicates)
         print("\t- Number of SNPs to be removed because location of SNP differs between arrays: ", count_merge_exclude)
         print("Number of SNPs of which location is updated: ", count_locations_changed)
         print("Number of SNPs of which id is updated: ", count_id_changed)
         print("Number of SNPs in all samples with a wrong allele:", count_wrong_allele)
+        if write_bed:
+            print("Number of genotypes set to missing because of a third allele:", count_third_allele)
+
 
-main()
+if __name__ == '__main__':
+    main()
 
-# get the end time
-et = time.time()
-# get the execution time
-elapsed_time = et - st
-print('Execution time:', elapsed_time, 'seconds')
\ No newline at end of file
+    # get the end time
+    et = time.time()
+    # get the execution time
+    elapsed_time = et - st
+    print('Execution time:', elapsed_time, 'seconds')
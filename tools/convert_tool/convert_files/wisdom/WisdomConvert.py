@@ -12,15 +12,32 @@ Creates a file with SNPs to use in --exclude in plink
     SNPs not in translation table
     SNPs with wrong alleles in translation table
     SNP AMELOGENIN_C_SEX
+with the extra argument 'bed', instead of the ped and map file directly creates the .bed, .bim and .fam file:
+    the 0-1-2 codes are translated per SNP with a lookup table made once from the translation table
+    SNPs on the list with SNPs to exclude are left out
+    the alleles in the .bim file are converted from forward to TOP calling
+The input file can be the xlsx file of wisdom, or the same table as tab or comma separated text file:
+    the rows are read one by one (xlsx with openpyxl in read-only mode) and converted in chunks of rows,
+    the size of the chunks can be given as extra argument
 """
-import pandas as pd
+import numpy as np
 import csv
+import os
 import re
 import time
 import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'common_scripts'))
+from ReferenceTables import load_table
+from ExcludeList import new_exclude_list, add_snp_to_exclude, write_snps_to_exclude
+from ConvertBimAllele import load_snp_table, convert_alleles
+from PlinkBed import BED_MAGIC, MISSING, encode_alleles, pack_codes, orient_minor_allele, remove_snps, write_fam, \
+    get_sort_order, reorder_snps
 # get the start time
 st = time.time()
 
+XLSX_MAGIC = b'PK\x03\x04'  # xlsx files are zip files
+WISDOM_CODES = {0: 0, 1: 1, 2: 2, '0': 0, '1': 1, '2': 2}  # all other values are missing (-1)
+
 
 def split_and_strip(line, delimiter='\t'):
     """
@@ -73,16 +90,87 @@ def update_id(line):
     return line
 
 
-def get_sample_ids(file):
+def get_cell_text(value):
     """
-    :param file: input file
+    :param value: value of a cell of the input file
+    :return: the value as text, whole numbers without decimals (1.0 becomes 1) and empty cells as ''
+    """
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def read_rows(inputfile):
+    """
+    :param inputfile: input file, xlsx or text file with tab or comma separated values
+    :return: generator with the rows (lists) of the input file, the first row is the header
+    """
+    with open(inputfile, mode="rb") as Data:
+        is_xlsx = Data.read(len(XLSX_MAGIC)) == XLSX_MAGIC
+    if is_xlsx:
+        import openpyxl  # only needed for xlsx input files
+        workbook = openpyxl.load_workbook(inputfile, read_only=True, data_only=True)
+        try:
+            for row in workbook.worksheets[0].iter_rows(values_only=True):
+                yield list(row)
+        finally:
+            workbook.close()
+    else:
+        with open(inputfile, mode="r", newline='') as Data:
+            delimiter = '\t' if '\t' in Data.readline() else ','
+            Data.seek(0)
+            yield from csv.reader(Data, delimiter=delimiter)
+
+
+def get_sample_ids(header):
+    """
+    :param header: first row of the input file
     :return: list with sample ids (are the column names)
     """
-    sample_ids = list(file.columns)
-    sample_ids = sample_ids[3:]
+    sample_ids = [get_cell_text(value) for value in header[3:]]
+    # empty columns at the end of a sheet are not samples
+    while sample_ids and sample_ids[-1] == '':
+        sample_ids.pop()
     return sample_ids
 
 
+def get_genotype_codes(row, number_samples):
+    """
+    :param row: row of the input file
+    :param number_samples: number of samples in the input file
+    :return: list with the wisdom codes of the samples, values other than 0, 1 and 2 become -1 (missing)
+    """
+    genotypes = row[3:3 + number_samples]
+    codes = [WISDOM_CODES.get(value.strip() if isinstance(value, str) else value, -1) for value in genotypes]
+    return codes + [-1] * (number_samples - len(genotypes))
+
+
+def get_chunks(rows, number_samples, chunk_size):
+    """
+    :param rows: generator with the rows of the input file, without header
+    :param number_samples: number of samples in the input file
+    :param chunk_size: number of rows in a chunk
+    :return: generator with per chunk a list with SNP id, chromosome and position of each row, and an array
+    (SNPs x samples) with the wisdom codes of the rows
+    """
+    snp_rows = []
+    codes = []
+    for row in rows:
+        # skip empty rows
+        if not row or get_cell_text(row[0]) == '':
+            continue
+        snp_rows.append([get_cell_text(value) for value in row[:3]] + [''] * (3 - len(row[:3])))
+        codes.append(get_genotype_codes(row, number_samples))
+        if len(snp_rows) == chunk_size:
+            yield snp_rows, np.array(codes, dtype=np.int8).reshape(-1, number_samples)
+            snp_rows = []
+            codes = []
+    if snp_rows:
+        yield snp_rows, np.array(codes, dtype=np.int8).reshape(-1, number_samples)
+
+
 def get_sample_info(sample):
     """
     :param sample: input sample
@@ -96,159 +184,236 @@ def get_sample_info(sample):
 def get_wrong_allele_snps(file, snps_to_exclude, count_wrong_allele):
     """
     :param file: input file with the snps with wrong alleles
-    :param snps_to_exclude: list with snps to exclude
+    :param snps_to_exclude: collection with snps to exclude
     :param count_wrong_allele: counter for how many snps have wrong alleles
-    :return: updated list with snps to exclude and counts of number snps with wrong alleles
+    :return: updated collection with snps to exclude and counts of number snps with wrong alleles
     """
     for index, line in enumerate(file):
         if index == 0:
             continue
         line = split_and_strip(line, ',')
-        if line[0] not in snps_to_exclude:  # line[0] is snp id
-            snps_to_exclude.append(line[0])
-            count_wrong_allele += 1
+        snps_to_exclude, count_wrong_allele = add_snp_to_exclude(snps_to_exclude, line[0], count_wrong_allele)  # line[0] is snp id
     return snps_to_exclude, count_wrong_allele
 
 
-def get_alleles(data, sample, sample_info, translation_snp_info):
+def get_allele_lookup(snp_ids, translation_snp_info):
     """
-    :param data: input data
-    :param sample: current sample
-    :param sample_info: list with family ID, individual ID, Paternal Id, Maternal Id, Sex, Phenotype
+    :param snp_ids: SNP ids (without _rsnumber, in uppercase) in the order of the input file
     :param translation_snp_info: dictionary with snp info of snps in translation table
-    :return: sample_info list with added alleles in ACTG format
-    """
-    column = data[sample]
-    for index, SNP in enumerate(column):
-        SNP_id = re.sub("(_rs.*)", "", data.iloc[index, 0]).upper()
-        # if allele is coded as -1 (missing), change this to 0 0
-        if SNP == -1:
-            sample_info += ['0', '0']
-
-        # change non-missing alleles
-        elif SNP_id in translation_snp_info.keys():
-            # translate allele 0
-            if SNP == 0:
-                allele1 = re.findall('(.) ', translation_snp_info[SNP_id][0])
-                allele2 = re.findall(' (.)', translation_snp_info[SNP_id][0])
-                sample_info += allele1 + allele2
-            # translate allele 1
-            if SNP == 1:
-                allele1 = re.findall('(.) ', translation_snp_info[SNP_id][1])
-                allele2 = re.findall(' (.)', translation_snp_info[SNP_id][1])
-                sample_info += allele1 + allele2
-            # translate allele 2
-            if SNP == 2:
-                allele1 = re.findall('(.) ', translation_snp_info[SNP_id][2])
-                allele2 = re.findall(' (.)', translation_snp_info[SNP_id][2])
-                sample_info += allele1 + allele2
-        elif SNP_id not in translation_snp_info.keys():
-            sample_info += ['0', '0']
-    return sample_info
+    :return: array (SNPs x 3 x 2) with for each SNP the two alleles of code 0, 1 and 2, the alleles are 0 for SNPs
+    not in the translation table
+    """
+    allele_lookup = np.full((len(snp_ids), 3, 2), '0', dtype='U1')
+    for index, snp_id in enumerate(snp_ids):
+        if snp_id in translation_snp_info:
+            for code, alleles in enumerate(translation_snp_info[snp_id]):
+                alleles = alleles.split(' ')
+                if len(alleles) == 2:
+                    allele_lookup[index, code] = alleles
+    return allele_lookup
+
+
+def get_code_table(allele_lookup):
+    """
+    :param allele_lookup: array (SNPs x 3 x 2) with for each SNP the two alleles of code 0, 1 and 2
+    :return: array (SNPs x 4) with the 2 bit .bed genotype code of wisdom code 0, 1, 2 and -1 (missing, last column),
+    and arrays with per SNP the alleles coded as 00 and as 11 in the .bed
+    """
+    number_snps = len(allele_lookup)
+    first_alleles = np.full(number_snps, '0', dtype='U1')
+    second_alleles = np.full(number_snps, '0', dtype='U1')
+    code_table = np.full((number_snps, 4), MISSING, dtype=np.uint8)
+    for code in range(3):
+        code_table[:, code] = encode_alleles(allele_lookup[:, code].ravel(), first_alleles, second_alleles)[0]
+    return code_table, first_alleles, second_alleles
+
+
+def write_bed_chunk(file, map_rows, codes, translation_snp_info, snps_to_exclude, wrong_allele_snps):
+    """
+    :param file: new .bed file
+    :param map_rows: rows of the new map file of this chunk
+    :param codes: array (SNPs x samples) with the wisdom codes of this chunk
+    :param translation_snp_info: dictionary with snp info of snps in translation table
+    :param snps_to_exclude: collection with snps that are left out of the new files
+    :param wrong_allele_snps: collection with snps with wrong alleles in translation table, also left out
+    :return: rows of the new .bim file of the SNPs written to the .bed file
+    """
+    keep = np.array([row[1] not in snps_to_exclude and row[1] not in wrong_allele_snps for row in map_rows], dtype=bool)
+    map_rows = [row for row, kept in zip(map_rows, keep) if kept]
+    code_table, first_alleles, second_alleles = get_code_table(get_allele_lookup([row[1] for row in map_rows],
+                                                                                 translation_snp_info))
+    # look up the .bed code of each wisdom code, -1 (missing) takes the last column of the code table
+    codes = np.take_along_axis(code_table, codes[keep].astype(np.intp), axis=1)
+    codes, allele1, allele2 = orient_minor_allele(codes, first_alleles, second_alleles)
+    file.write(pack_codes(codes).tobytes())
+    return [row + [a1, a2] for row, a1, a2 in zip(map_rows, allele1, allele2)]
+
+
+def write_bim_and_fam(output_prefix, bim_rows, sample_ids, snps_to_exclude, snp_table):
+    """
+    :param output_prefix: prefix of the new .bed, .bim and .fam file
+    :param bim_rows: rows of the new .bim file, in the order of the SNPs in the .bed file
+    :param sample_ids: list with sample ids
+    :param snps_to_exclude: collection with all snps that are left out of the new files
+    :param snp_table: dictionary with the TOP and forward alleles of the SNPs in the SNP table, to convert the forward
+    alleles to TOP calling
+    A SNP id can be on more than one row of the input file, when a later row excluded the SNP it is removed from the
+    .bed file afterwards, as plink --exclude does. The SNPs are then sorted on chromosome and location when needed (as
+    plink --make-bed sorts).
+    """
+    keep = np.array([row[1] not in snps_to_exclude for row in bim_rows], dtype=bool)
+    if not keep.all():
+        remove_snps(output_prefix + '.bed', keep, len(sample_ids))
+    bim_rows = [row for row, kept in zip(bim_rows, keep) if kept]
+    for row in bim_rows:
+        row[4], row[5] = convert_alleles(row[1], row[4], row[5], snp_table, 'dbsnp', 'top')
+    order = get_sort_order(bim_rows)
+    if order is not None:
+        reorder_snps(output_prefix + '.bed', order, len(sample_ids))
+        bim_rows = [bim_rows[index] for index in order]
+    with open(output_prefix + '.bim', "w", newline='') as NewFileBIM, \
+            open(output_prefix + '.fam', "w", newline='') as NewFileFAM:
+        writer_bim = csv.writer(NewFileBIM, delimiter='\t')
+        writer_bim.writerows(bim_rows)
+        write_fam(NewFileFAM, sample_ids)
+    print("Number of samples written to .bed file: ", len(sample_ids))
+    print("Number of SNPs written to .bed file: ", int(np.count_nonzero(keep)))
 
 
 def get_snps_to_exclude(line, snps_to_exclude, snps_exclude_merge, translation_snp_info, count_no_correct_location, count_not_in_snptable, count_exclude_merge):
     """
     :param line: input row
-    :param snps_to_exclude: list with snps to exclude, to which to append new snps
-    :param snps_exclude_merge: list with snps that have a different location between arrays
+    :param snps_to_exclude: collection with snps to exclude, to which to add new snps
+    :param snps_exclude_merge: set with snps that have a different location between arrays
     :param translation_snp_info: dictionary with snp info translation table
     :param count_no_correct_location: counter for how many snps have no location
     :param count_not_in_snptable: counter for how many snps are not in snptable, so no alleles known
-    :return: list with snps that have to be excluded
+    :return: collection with snps that have to be excluded
     """
     # for snps that have different location between arrays:
     if line[0] in snps_exclude_merge:
-        if line[0] not in snps_to_exclude:
-            snps_to_exclude.append(line[0])
-            count_exclude_merge += 1
+        snps_to_exclude, count_exclude_merge = add_snp_to_exclude(snps_to_exclude, line[0], count_exclude_merge)
     # for snps without a known correct location:
     if line[1] == '0' or line[1] == 'Y/X':
-        if line[0] not in snps_to_exclude:
-            snps_to_exclude.append(line[0])
-            count_no_correct_location += 1
+        snps_to_exclude, count_no_correct_location = add_snp_to_exclude(snps_to_exclude, line[0], count_no_correct_location)
     # for snps not present in SNP table:
-    if line[0] not in translation_snp_info.keys() and line[0] not in snps_to_exclude:
-        snps_to_exclude.append(line[0])
-        count_not_in_snptable += 1
+    if line[0] not in translation_snp_info.keys():
+        snps_to_exclude, count_not_in_snptable = add_snp_to_exclude(snps_to_exclude, line[0], count_not_in_snptable)
     return snps_to_exclude, count_no_correct_location, count_not_in_snptable, count_exclude_merge
 
 
 def get_excluded_snps_merge(file):
     """
     :param file: input file
-    :return: list with snps that have different locations between arrays
+    :return: set with snps that have different locations between arrays
     """
-    snps_exclude_merge = []
+    snps_exclude_merge = set()
     for line in file:
-        split_line = [line.strip()]
-        snps_exclude_merge.append(split_line)
+        snps_exclude_merge.add(line.strip())
     return snps_exclude_merge
 
 
+def write_map_and_ped(codes, map_rows, sample_ids, translation_snp_info, output_prefix):
+    """
+    :param codes: array (SNPs x samples) with the wisdom codes of all rows
+    :param map_rows: list with the rows of the new map file
+    :param sample_ids: list with sample ids
+    :param translation_snp_info: dictionary with snp info of snps in translation table
+    :param output_prefix: prefix of the new map and ped file
+    """
+    # alleles of code 0, 1 and 2 per SNP, and 0 0 for missing (-1, the last code)
+    allele_lookup = get_allele_lookup([row[1] for row in map_rows], translation_snp_info)
+    allele_lookup = np.concatenate([allele_lookup, np.full((len(map_rows), 1, 2), '0', dtype='U1')], axis=1)
+    snp_index = np.arange(len(map_rows))
+    with open(output_prefix + '.map', "w", newline='') as NewFileMAP, \
+            open(output_prefix + '.ped', "w", newline='') as NewFilePED:
+        writer_map = csv.writer(NewFileMAP, delimiter='\t')
+        writer_ped = csv.writer(NewFilePED, delimiter='\t')
+        writer_map.writerows(map_rows)
+
+        # make ped file
+        for index, sample in enumerate(sample_ids):
+            # get Family id, sample id and 4 zeros
+            sample_info = get_sample_info(sample)
+            # add alleles to the sample info
+            sample_info += allele_lookup[snp_index, codes[:, index]].ravel().tolist()
+            writer_ped.writerow(sample_info)
+
+
 def main():
     """
-    Creates a new map and ped file, and a file with snps to exclude.
+    Creates a new map and ped file, and a file with snps to exclude,
+    or with the extra argument 'bed' a new .bed, .bim and .fam file and a file with snps to exclude.
     """
     # input files
-    inputfile = sys.argv[1]  # input .xlsx file
+    inputfile = sys.argv[1]  # input .xlsx file, or tab or comma separated text file
     tool_directory = sys.argv[4]  # tool path Galaxy
     file_wrong_snps = f'{tool_directory}/convert_files/wisdom/WisdomWrongAlleleInTranslationTable.txt'
     translation_table = f'{tool_directory}/convert_files/wisdom/WisdomTranslationTableUnchanged.txt'
     snps_to_exclude_merge = f'{tool_directory}/convert_files/common_files/SNPsToExcludeMerge.list'  # file with SNPids to exclude when merging files
 
     # output files
-    snps_to_exclude = sys.argv[2]
-    new_filename_map = sys.argv[3] + '.map'
-    new_filename_ped = sys.argv[3] + '.ped'
+    wisdom_snps_to_exclude = sys.argv[2]  # file with SNPids to use in --exclude plink
+    output_prefix = sys.argv[3]  # prefix for the .map and .ped, or for the .bed, .bim and .fam file
+    write_bed = len(sys.argv) > 5 and sys.argv[5] == 'bed'  # write .bed, .bim and .fam instead of .map and .ped
+    chunk_size = int(sys.argv[6]) if len(sys.argv) > 6 else 4096  # number of rows of the input file converted at once
 
-    with open(inputfile, mode="rb") as Data, \
-            open(translation_table, mode="r") as DataTranslation, \
-            open(file_wrong_snps, mode="r") as WrongAlleleSNPs, \
+    with open(file_wrong_snps, mode="r") as WrongAlleleSNPs, \
             open(snps_to_exclude_merge, mode="r") as DataExcludeMerge, \
-            open(new_filename_map, "w", newline='') as NewFileMAP, \
-            open(snps_to_exclude, "w", newline='') as NewFileExcludedSNPs, \
-            open(new_filename_ped, "w", newline='') as NewFilePED:
-        writer_map = csv.writer(NewFileMAP, delimiter='\t')
-        writer_ped = csv.writer(NewFilePED, delimiter='\t')
-        writer_exclude = csv.writer(NewFileExcludedSNPs, delimiter='\t')
+            open(wisdom_snps_to_exclude, "w", newline='') as NewFileExcludedSNPs:
 
-        data = pd.read_excel(Data, header=0)
-        # put the SNPs on the SNPsToExcludeMerge.list in a list
-        new_line, snps_exclude_merge = get_excluded_snps_merge(DataExcludeMerge)
+        rows = read_rows(inputfile)
+        # make list with sample ids
+        sample_ids = get_sample_ids(next(rows))
+        # put the SNPs on the SNPsToExcludeMerge.list in a set
+        snps_exclude_merge = get_excluded_snps_merge(DataExcludeMerge)
+        # snps that have wrong allele in translation table, these are added to the list with excluded snps at the end
+        wrong_allele_snps = get_wrong_allele_snps(WrongAlleleSNPs, new_exclude_list(), 0)[0]
 
         # make dictionary of SNPs in translation table
-        translation_snp_info = get_translation_info(DataTranslation)
+        translation_snp_info = load_table(translation_table, get_translation_info)
 
         count_wrong_allele = 0
         count_no_correct_location = 0
         count_not_in_snptable = 0
         count_exclude_merge = 0
-        # make list with sample ids
-        sample_ids = get_sample_ids(data)
-        snps_to_exclude = []
-        # make map file
-        for index, line in data.iterrows():
-            line = update_chromosome(line)
-            line = update_id(line)
-            # check if snps needs to be excluded
-            snps_to_exclude, count_no_correct_location, count_not_in_snptable, count_exclude_merge = get_snps_to_exclude(line, snps_to_exclude, snps_exclude_merge, translation_snp_info, count_no_correct_location, count_not_in_snptable, count_exclude_merge)
-            line_map = [str(line[1]), str(line[0]), '0', str(line[2])]
-            writer_map.writerow(line_map)
+        snps_to_exclude = new_exclude_list()
+        map_rows = []
+        bim_rows = []
+        genotype_chunks = []
+        if write_bed:
+            NewFileBED = open(output_prefix + '.bed', "wb")
+            NewFileBED.write(BED_MAGIC)
+        for snp_rows, codes in get_chunks(rows, len(sample_ids), chunk_size):
+            # make map rows
+            chunk_map_rows = []
+            for line in snp_rows:
+                line = update_chromosome(line)
+                line = update_id(line)
+                # check if snps needs to be excluded
+                snps_to_exclude, count_no_correct_location, count_not_in_snptable, count_exclude_merge = get_snps_to_exclude(line, snps_to_exclude, snps_exclude_merge, translation_snp_info, count_no_correct_location, count_not_in_snptable, count_exclude_merge)
+                chunk_map_rows.append([str(line[1]), str(line[0]), '0', str(line[2])])
+            if write_bed:
+                # translate the wisdom codes of this chunk directly into the new .bed file
+                bim_rows += write_bed_chunk(NewFileBED, chunk_map_rows, codes, translation_snp_info, snps_to_exclude, wrong_allele_snps)
+            else:
+                map_rows += chunk_map_rows
+                genotype_chunks.append(codes)
+        if write_bed:
+            NewFileBED.close()
 
         # add snps that have wrong allele in translation table to the list with excluded snps
-        snps_to_exclude, count_wrong_allele = get_wrong_allele_snps(WrongAlleleSNPs, snps_to_exclude, count_wrong_allele)
+        for snp in wrong_allele_snps:
+            snps_to_exclude, count_wrong_allele = add_snp_to_exclude(snps_to_exclude, snp, count_wrong_allele)
 
-        for snp in snps_to_exclude:
-            writer_exclude.writerow([snp])
+        write_snps_to_exclude(NewFileExcludedSNPs, snps_to_exclude)
 
-        # make ped file
-        for index, sample in enumerate(sample_ids):
-            # get Family id, sample id and 4 zeros
-            sample_info = get_sample_info(sample)
-            # add alleles to the sample info
-            sample_info = get_alleles(data, sample, sample_info, translation_snp_info)
-            writer_ped.writerow(sample_info)
+        if write_bed:
+            write_bim_and_fam(output_prefix, bim_rows, sample_ids, snps_to_exclude, load_snp_table(tool_directory))
+        else:
+            # create new map and ped file
+            codes = np.concatenate(genotype_chunks) if genotype_chunks else np.zeros((0, len(sample_ids)), dtype=np.int8)
+            write_map_and_ped(codes, map_rows, sample_ids, translation_snp_info, output_prefix)
 
         print("Number of SNPs to be deleted: ", len(snps_to_exclude))
         print("\t- Number of SNPs of which no correct location is available, or location differs between arrays: ",
@@ -265,4 +430,4 @@ et = time.time()
 
 # get the execution time
 elapsed_time = et - st
-print('Execution time:', elapsed_time, 'seconds')
\ No newline at end of file
+print('Execution time:', elapsed_time, 'seconds')
\ No newline at end of file
@@ -120,7 +120,7 @@ if [ $h_option -eq 1 ]; then
   echo -e "\tbash quality_control.sh -a inputfile.fam -i inputfile.bim -e inputfile.bed -p mdd -o newfilename\n"
   echo -e "\tbash quality_control.sh -f inputfile -p neogen220 -b phylip -o newfilename\n"
   echo "DEPENDENCIES NEEDED:"
-  echo -e "\tpython3 with package biopython if chosen tree construction method is biopython"
+  echo -e "\tpython3 with package numpy"
   echo -e "\tplink 1.9 (included in this tool)"
   echo -e "\tplink 2 (included in this tool)\n"
   echo -e "\tPhylip's programs neighbor (included in this tool) if chosen tree construction method is phylip"
@@ -282,89 +282,69 @@ duplicate_ids=$(sort -k2n "$file_fam" | awk 'a[$2]++{ if(a[$2]==2){ print b }; p
       exit 1
     fi
 
+# Check if numpy python package is installed, needed for the sample call rate check, the sex check, option -m and the
+# breed check
+if [ "$platform" != 'merged' ] || [ $s_option -eq 1 ] || [ $m_option -eq 1 ] || [ $b_option -eq 1 ]; then
+  python3 -c "import pkgutil; exit(0 if pkgutil.find_loader('numpy') else 1)"
+  if [ $? -eq 1 ]; then
+    echo "ERROR: required python package 'numpy' is not installed" 2>&1 | tee -a "$log_file"
+    echo "Use 'sudo pip3 install numpy' in terminal" 2>&1 | tee -a "$log_file"
+    exit 1
+  fi
+fi
+
 # action to perform is chosen platform is not 'merged'
 if [ "$platform" != 'merged' ]; then
-  {
-  # actions to perform if platform is embark or neogen220
-  if [ "$platform" = 'embark' ] || [ "$platform" = 'neogen220' ]; then
-    # set variables needed for removal of bad Y snps in embark and neogen 220K
-    if [ "$platform" = 'embark' ]; then
-        y_nr="46"
-        bad_y_file=""${tool_directory}"/quality_control_files/embark/EmbarkYSNPsFemales.list"
-    fi
-    if [ "$platform" = 'neogen220' ]; then
-        y_nr="49"
-        bad_y_file=""${tool_directory}"/quality_control_files/neogen220/Neogen220YSNPsFemales.list"
+  # set variables needed for removal of bad Y snps in embark and neogen 220K, and for the sex check
+  bad_y_file="none"
+  sex_check="none"
+  if [ "$platform" = 'embark' ]; then
+      y_nr="46"
+      y_limit="100"
+      bad_y_file=""${tool_directory}"/quality_control_files/embark/EmbarkYSNPsFemales.list"
+  fi
+  if [ "$platform" = 'neogen220' ]; then
+      y_nr="49"
+      y_limit="130"
+      bad_y_file=""${tool_directory}"/quality_control_files/neogen220/Neogen220YSNPsFemales.list"
+  fi
+  if [ $s_option -eq 1 ]; then
+    # sex check based on the number of Y calls for embark and neogen 220K, else based on X SNP homozygosity
+    if [ "$platform" = 'embark' ] || [ "$platform" = 'neogen220' ]; then
+      sex_check="$y_limit"
+    else
+      sex_check="X"
     fi
-
-    echo -e "\n\n--- Checking quality of samples using sample call rate"
-    echo -e "Using plink for removing bad samples (sample call rate under 90%) and $y_nr bad Y snps (call Y alleles in females)"
-
-    # checking for sample call rate >90% and removing bad Y SNPs
-    "${tool_directory}"/quality_control_files/common_scripts/plink  \
-    --bim "$file_bim"  \
-    --fam "$file_fam"  \
-    --bed "$file_bed"  \
-    --make-bed  \
-    --mind 0.1  \
-    --exclude $bad_y_file  \
-    --allow-no-sex  \
-    --chr-set 38  \
-    --out ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp"  \
-    --silent
-    cat ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp.log" >> "$log_file"
-
-  # actions to perform is platform is not embark or neogen220 or merged
-  else
-    echo -e "\n\n--- Checking quality of samples using sample call rate"
-    echo -e "Using plink for removing bad samples (sample call rate under 90%)"
-    # using plink to remove samples with callrate under 90%
-    "${tool_directory}"/quality_control_files/common_scripts/plink  \
-    --bim "$file_bim"  \
-    --fam "$file_fam"  \
-    --bed "$file_bed"  \
-    --make-bed  \
-    --mind 0.1  \
-    --chr-set 38  \
-    --allow-no-sex  \
-    --out ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp"  \
-    --silent
-    cat ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp.log" >> "$log_file"
-
   fi
-
-  # get sample call rate if sample failed (less than 90% call rate)
-  if [ -f ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp.irem" ]; then # check if file with removed samples exists
-    echo -e "Using plink2 for getting SNP call rate of removed bad samples"
-    "${tool_directory}"/quality_control_files/common_scripts/plink2  \
-    --bim "$file_bim"  \
-    --fam "$file_fam"  \
-    --bed "$file_bed"  \
-    --make-bed  \
-    --missing sample-only 'scols=maybefid,nmiss,nobs,fmiss'  \
-    --keep ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp.irem"  \
-    --allow-no-sex  \
-    --chr-set 38  \
-    --out ""${tool_directory}"/quality_control_files/temp_files/${file_new}_bad_sample"  \
-    --silent
-    cat ""${tool_directory}"/quality_control_files/temp_files/${file_new}_bad_sample.log" >> "$log_file"
-    echo -e "\nThe samples which were removed and the percentage missing SNPs per sample: "
-    # get the sample call rate of the removed samples and report this
-    awk 'NR!=1{$1=$1;print$1,$2,"has sample missing rate of",$5*100,"%"}' ""${tool_directory}"/quality_control_files/temp_files/${file_new}_bad_sample.smiss"
-    mv ""${tool_directory}"/quality_control_files/temp_files/${file_new}_bad_sample.fam" "${file_new}_bad_sample.fam"
-    mv ""${tool_directory}"/quality_control_files/temp_files/${file_new}_bad_sample.bed" "${file_new}_bad_sample.bed"
-    mv ""${tool_directory}"/quality_control_files/temp_files/${file_new}_bad_sample.bim" "${file_new}_bad_sample.bim"
-    rm "${tool_directory}"/quality_control_files/temp_files/"${file_new}"_bad_sample*
+  {
+  echo -e "\n\n--- Checking quality of samples using sample call rate"
+  if [ "$bad_y_file" != 'none' ]; then
+    echo -e "Using python script SampleQC.py for removing bad samples (sample call rate under 90%) and $y_nr bad Y snps (call Y alleles in females)"
   else
-    echo -e "\nNo samples were removed because of a bad sample call rate"
+    echo -e "Using python script SampleQC.py for removing bad samples (sample call rate under 90%)"
+  fi
+  if [ "$sex_check" != 'none' ]; then
+    echo -e "and to check if sex in $original_name.fam is same as SNP sex, in the same read of $file_bed"
   fi
-  mv ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp.bim" "$file_new.bim"
-  mv ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp.bed" "$file_new.bed"
-  mv ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp.fam" "$file_new.fam"
-  rm "${tool_directory}"/quality_control_files/temp_files/"${file_new}"_temp*
 
+  # checking for sample call rate >90%, removing bad Y SNPs and checking sex, the removed samples are written to
+  # ${file_new}_bad_sample
+  python3 "${tool_directory}"/quality_control_files/common_scripts/SampleQC.py  \
+  "$file_bed"  \
+  "$file_bim"  \
+  "$file_fam"  \
+  "$bad_y_file"  \
+  "$file_new"  \
+  "$sex_check"  \
+  "${file_new}_sex_changed.txt"
   } 2>&1 | tee -a "$log_file" # put output in log file
 
+  # stop if no new files were made (e.g. all samples were removed)
+  if ! [ -f "$file_new.bed" ] || ! [ -f "$file_new.bim" ] || ! [ -f "$file_new.fam" ]; then
+    echo -e "ERROR: the sample call rate check did not make $file_new.bed, .bim and .fam" 2>&1 | tee -a "$log_file"
+    exit 1
+  fi
+
   file_bim="$file_new.bim"
   file_fam="$file_new.fam"
   file_bed="$file_new.bed"
@@ -382,59 +362,11 @@ else
   fi
 fi
 
-# execute when s option for sex check is used
+# execute when s option for sex check is used, for merged files (for the other platforms the sex check is performed by
+# SampleQC.py)
 if [ $s_option -eq 1 ]; then
-  # set variable for Y call limit for embark and neogen220K, is used in script GetSexY.py
-  if [ "$platform" = 'embark' ] || [ "$platform" = 'neogen220' ]; then
-    if [ "$platform" = 'embark' ]; then
-        y_limit="100"
-    fi
-    if [ "$platform" = 'neogen220' ]; then
-        y_limit="130"
-    fi
-    {
-    echo -e "\n\n--- Performing sex check based on number of Y SNP calls"
-
-    # get number of Y alleles called per sample to determine sex
-    echo -e "Using plink2 for getting Y calls per sample to determine sex"
-    "${tool_directory}"/quality_control_files/common_scripts/plink2  \
-    --bim "$file_bim"  \
-    --fam "$file_fam"  \
-    --bed "$file_bed"  \
-    --missing sample-only 'scols=maybefid,nmiss,nobs,fmiss'  \
-    --chr-set 40  \
-    --chr 40  \
-    --out ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp3"  \
-    --silent
-    cat ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp3.log" >> "$log_file"
-
-    # execute python script to check if sex is correct
-    echo -e "Using python script GetSexY.py to check if sex in $original_name.fam is same as SNP sex"
-    python3 "${tool_directory}"/quality_control_files/common_scripts/GetSexY.py  \
-    $y_limit  \
-    ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp3.smiss"  \
-    "$file_fam"  \
-    ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp3.fam"  \
-    "${file_new}_sex_changed.txt"
-
-    # check if file with new filename already exists, if not, change input file name to new file name for .bim and .bed
-    if [ "$file_bim" !=  "$file_new.bim" ]; then
-      cp "$file_bim" "$file_new.bim"
-      cp "$file_bed" "$file_new.bed"
-    fi
-    mv ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp3.fam" "$file_new.fam"
-    # remove temporary file
-    rm "${tool_directory}"/quality_control_files/temp_files/"${file_new}"_temp*
-    } 2>&1 | tee -a "$log_file" # put output in log file
-
-    file_bim="$file_new.bim"
-    file_fam="$file_new.fam"
-    file_bed="$file_new.bed"
-  fi
-
-  # sex check based on X snps for Neogen 170K, Lupa 170K, wisdom, vcf, affymetrix, mdd, merged, other
-  platform_sexx=(neogen170 wisdom lupa170 vcf3 vcf4 affymetrix merged mdd other)
-  if printf '%s\0' "${platform_sexx[@]}" | grep -Fzxq -- "$platform"; then # check if selected platform -p is in platform list
+  # sex check based on X snps for merged files
+  if [ "$platform" = 'merged' ]; then
     echo -e "\n\n--- Performing sex check based on X SNP homozygosity"
     # check if .bim file contains X snps
     sex_SNPs_available=$(awk '$1==39 {print $1}' "$file_bim")
@@ -443,38 +375,21 @@ if [ $s_option -eq 1 ]; then
       exit 1
     fi
     {
-    # get number of homozygous and heterozygous X alleles per sample to determine sex
-    echo -e "Using plink2 for getting number of homozygous X SNPs "
-    "${tool_directory}"/quality_control_files/common_scripts/plink2  \
-    --bim "$file_bim"  \
-    --fam "$file_fam"  \
-    --bed "$file_bed"  \
-    --missing sample-only 'scols=maybefid,nmiss,nobs,fmiss'  \
-    --sample-counts 'cols=maybefid,hetsnp'  \
-    --chr-set 40  \
-    --chr 39  \
-    --allow-no-sex  \
-    --out ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp2"  \
-    --silent
-    cat ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp2.log" >> "$log_file"
-
-    # execute python script to check if sex is correct
-    echo -e "Using python script GetSexX.py to check if sex in $original_name.fam is same as SNP sex"
+    # count the missing and heterozygous X calls per sample in the .bed file and check if sex is correct
+    echo -e "Using python script GetSexX.py to get the proportion of homozygous X SNPs from $file_bed"
+    echo -e "and to check if sex in $original_name.fam is same as SNP sex"
     python3 "${tool_directory}"/quality_control_files/common_scripts/GetSexX.py  \
-    ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp2.scount"  \
-    ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp2.smiss"  \
+    "$file_bed"  \
+    "$file_bim"  \
     "$file_fam"  \
-    ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp3.fam"  \
+    "$file_new.fam"  \
     "${file_new}_sex_changed.txt"
 
-    mv ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp3.fam" "$file_new.fam"
     # check if file with new filename already exists, if not, change input file name to new file name for .bim and .bed
     if [ "$file_bim" !=  "$file_new.bim" ]; then
       cp "$file_bim" "$file_new.bim"
       cp "$file_bed" "$file_new.bed"
     fi
-    # remove temporary file
-    rm ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp"*
     } 2>&1 | tee -a "$log_file" # put output in log file
 
     file_bim="$file_new.bim"
@@ -586,41 +501,17 @@ if [ $d_option -eq 1 ]; then
     ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp.fam"
     } 2>&1 | tee -a "$log_file" # put output in log file
 
-    # Merge the first (-f or -i,a,e) and second file (-m)
-    echo -e "Using plink to merge $original_name and $database"
-    "${tool_directory}"/quality_control_files/common_scripts/plink  \
-      --allow-no-sex  \
-      --bed "$file_bed"  \
-      --bim "$file_bim"  \
-      --fam ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp.fam"  \
-      --bmerge "$database_bed" "$database_bim" "$database_fam"  \
-      --chr-set 38  \
-      --make-bed  \
-      --out ""${tool_directory}"/quality_control_files/temp_files/${file_new}_merge"  \
-      --silent
-    cat ""${tool_directory}"/quality_control_files/temp_files/${file_new}_merge.log" >> "$log_file"
-
     {
-    echo -e "Using plink2 to get kinship scores of samples in merged file of $original_name and $database"
-    # use plink2 to make a kinship table with scores higher than 0.1875
-    "${tool_directory}"/quality_control_files/common_scripts/plink2  \
-    --bim ""${tool_directory}"/quality_control_files/temp_files/${file_new}_merge.bim"  \
-    --fam ""${tool_directory}"/quality_control_files/temp_files/${file_new}_merge.fam"  \
-    --bed ""${tool_directory}"/quality_control_files/temp_files/${file_new}_merge.bed"  \
-    --make-king-table  \
-    --king-table-filter 0.1875  \
-    --king-table-require ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp.fam"  \
-    --chr-set 38  \
-    --out ""${tool_directory}"/quality_control_files/temp_files/${file_new}_between_files_temp_kinship"  \
-    --silent
-    cat ""${tool_directory}"/quality_control_files/temp_files/${file_new}_between_files_temp_kinship.log" >> "$log_file"
-
-    echo -e "Using python script ExtractKinshipScores.py to extract sample pairs between $original_name and $database"
-    # extract sample pairs between the first (-f or -i,a,e) and second file (-m), the sample pairs within the first file are removed.
-    python3 "${tool_directory}"/quality_control_files/common_scripts/ExtractKinshipScores.py  \
+    echo -e "Using python script KinshipIndex.py to get kinship scores between samples of $original_name and $database"
+    # score the samples of the first file (-f or -i,a,e) against the kinship index of the second file (-m), without merging
+    # the files. Only kinship scores higher than 0.1875 between samples of the two files are written
+    python3 "${tool_directory}"/quality_control_files/common_scripts/KinshipIndex.py  \
+    "$file_bed"  \
+    "$file_bim"  \
     ""${tool_directory}"/quality_control_files/temp_files/${file_new}_temp.fam"  \
-    ""${tool_directory}"/quality_control_files/temp_files/${file_new}_between_files_temp_kinship.kin0"  \
-    "${file_new}_between_files_kinship.kin0"
+    "$database"  \
+    "${file_new}_between_files_kinship.kin0"  \
+    ""${tool_directory}"/quality_control_files/temp_files/${file_new}_between_files_called.smiss"
 
     # get number of kinship scores by counting rows in file
     number_kinship_scores=$(wc -l < "${file_new}_between_files_kinship.kin0")
@@ -636,37 +527,14 @@ if [ $d_option -eq 1 ]; then
         # Put duplicate samples in temporary file
         echo -e "$duplicate_kin" > ""${tool_directory}"/quality_control_files/temp_files/${file_new}_between_files_duplicates.txt"
 
-        # make arrays of duplicate samples, put sample ID in the array
-        duplicate_kin1=$(awk 'FNR==1{next} $8>0.4 {print $1,$2}' "${file_new}_between_files_kinship.kin0")
-        duplicate_kin2=$(awk 'FNR==1{next} $8>0.4 {print $3,$4}' "${file_new}_between_files_kinship.kin0")
-        duplicate_kin3=("${duplicate_kin1[@]}" "${duplicate_kin2[@]}") # add arrays together
-        duplicate_kin4=$(printf "%s\n" "${duplicate_kin3[@]}" | sort -u) # get unique samples
-
-        # Put ids of duplicate samples in temporary list file, which can be used in plink to extract these samples
-        echo -e "$duplicate_kin4" > ""${tool_directory}"/quality_control_files/temp_files/${file_new}_between_files_duplicates.list"
-
-        # for duplicate samples, get number of SNPs per sample
-        echo -e "Using plink2 to get number of successfully genotyped SNPs"
-        "${tool_directory}"/quality_control_files/common_scripts/plink2  \
-        --bim ""${tool_directory}"/quality_control_files/temp_files/${file_new}_merge.bim"  \
-        --fam ""${tool_directory}"/quality_control_files/temp_files/${file_new}_merge.fam"  \
-        --bed ""${tool_directory}"/quality_control_files/temp_files/${file_new}_merge.bed"  \
-        --missing sample-only 'scols=maybefid,nmiss,nobs,fmiss'  \
-        --keep ""${tool_directory}"/quality_control_files/temp_files/${file_new}_between_files_duplicates.list"  \
-        --allow-no-sex  \
-        --chr-set 60  \
-        --out ""${tool_directory}"/quality_control_files/temp_files/${file_new}_between_files_duplicates_missing"  \
-        --silent
-        cat ""${tool_directory}"/quality_control_files/temp_files/${file_new}_between_files_duplicates_missing.log" >> "$log_file"
-
         # make a summary for duplicate samples
         echo -e "Using python script GetDuplicateInfo.py to get duplicate samples summary"
         python3 "${tool_directory}"/quality_control_files/common_scripts/GetDuplicateInfo.py  \
         ""${tool_directory}"/quality_control_files/temp_files/${file_new}_between_files_duplicates.txt"  \
-        ""${tool_directory}"/quality_control_files/temp_files/${file_new}_between_files_duplicates_missing.smiss"  \
+        ""${tool_directory}"/quality_control_files/temp_files/${file_new}_between_files_called.smiss"  \
         "${file_new}_between_files_duplicate_summary.txt"
 
-        echo -e "\nDuplicate samples based on kinship in merged $original_name and $database:"
+        echo -e "\nDuplicate samples based on kinship between $original_name and $database:"
         cat "${file_new}_between_files_duplicate_summary.txt"
 
         echo -e "\nNOTE: no duplicate samples are removed from the input file.
@@ -677,8 +545,7 @@ if [ $d_option -eq 1 ]; then
         echo -e "No duplicates found between $original_name and $database based on kinship"
       fi
     fi
-    rm "${tool_directory}"/quality_control_files/temp_files/"${file_new}"_between_files_temp_kinship*
-    rm "${tool_directory}"/quality_control_files/temp_files/"${file_new}_"merge*
+    rm "${tool_directory}"/quality_control_files/temp_files/"${file_new}"_between_files_called.smiss
     rm "${tool_directory}"/quality_control_files/temp_files/"${file_new}_"temp*
     } 2>&1 | tee -a "$log_file" # put output in log file
   fi
@@ -697,59 +564,23 @@ if [ $b_option -eq 1 ]; then
   echo "Number of common SNPs: $innerjoin_size"
   } 2>&1 | tee -a "$log_file" # put output in log file
 
-  {
-  # Merge the breed_database and the input file
-  echo -e "Using plink to merge $original_name and the breed database"
-  "${tool_directory}"/quality_control_files/common_scripts/plink  \
-    --allow-no-sex  \
-    --bed "$file_bed"  \
-    --bim "$file_bim"  \
-    --fam "$file_fam"  \
-    --bmerge ""${tool_directory}"/quality_control_files/breed_database/Dogs_for_tree.bed"   \
-    ""${tool_directory}"/quality_control_files/breed_database/Dogs_for_tree.bim"   \
-    ""${tool_directory}"/quality_control_files/breed_database/Dogs_for_tree.fam"  \
-    --extract ""${tool_directory}"/quality_control_files/temp_files/${file_new}_innerjoin.list"  \
-    --chr-set 38  \
-    --make-bed  \
-    --out ""${tool_directory}"/quality_control_files/temp_files/${file_new}_breed_merge"  \
-    --silent
-  cat ""${tool_directory}"/quality_control_files/temp_files/${file_new}_breed_merge.log" >> "$log_file"
-
-  rm ""${tool_directory}"/quality_control_files/temp_files/${file_new}_innerjoin.list"
-  } 2>&1 | tee -a "$log_file" # put output in log file
   if [ "$method_tree" = 'biopython' ]; then
     {
-    # Check if biopython python package is installed
-    python3 -c "import pkgutil; exit(0 if pkgutil.find_loader('Bio') else 1)"
-    if [ $? -eq 1 ]; then
-      echo "ERROR: required python package 'biopython' is not installed" 2>&1 | tee -a "$log_file"
-      echo "Use 'sudo pip3 install biopython' in terminal" 2>&1 | tee -a "$log_file"
-      exit 1
-    fi
-
-    # Make a distance matrix of the merged file
-    echo -e "Using plink to make a distance matrix of the merged file"
-    "${tool_directory}"/quality_control_files/common_scripts/plink  \
-      --allow-no-sex  \
-      --bfile ""${tool_directory}"/quality_control_files/temp_files/${file_new}_breed_merge"  \
-      --distance triangle 1-ibs  \
-      --chr-set 38  \
-      --out ""${tool_directory}"/quality_control_files/temp_files/${file_new}_breed_distance"  \
-      --silent
-    cat ""${tool_directory}"/quality_control_files/temp_files/${file_new}_breed_distance.log" >> "$log_file"
-
-    rm "${tool_directory}"/quality_control_files/temp_files/"${file_new}_"breed_merge*
-
-    echo -e "\nUsing python script MakeTree.py to create a phylogenetic tree"
+    # the 1-IBS distance matrix of the input file and the breed database (on the common SNPs) is made by MakeTree.py,
+    # without merging the files, the tree is made with NeighborJoining.py (neighbor joining as biopython does it)
+    echo -e "\nUsing python script MakeTree.py to make a distance matrix of $original_name and the breed database,"
+    echo -e "and to create a phylogenetic tree"
     python3 "${tool_directory}"/quality_control_files/common_scripts/MakeTree.py  \
-        ""${tool_directory}"/quality_control_files/temp_files/${file_new}_breed_distance.mdist"  \
-        ""${tool_directory}"/quality_control_files/temp_files/${file_new}_breed_distance.mdist.id"  \
+        "$file_bed"  \
+        "$file_bim"  \
         "${file_new}_tree.nwk"  \
         "$file_fam"  \
         "${file_new}_tree.png"  \
         "${file_new}_tree_annotation.txt"  \
-        "linux"
-    rm "${tool_directory}"/quality_control_files/temp_files/"${file_new}_"breed_distance*
+        "linux"  \
+        ""${tool_directory}"/quality_control_files/breed_database/Dogs_for_tree"  \
+        ""${tool_directory}"/quality_control_files/temp_files/${file_new}_innerjoin.list"
+    rm ""${tool_directory}"/quality_control_files/temp_files/${file_new}_innerjoin.list"
   } 2>&1 | tee -a "$log_file" # put output in log file
   fi
 
@@ -762,27 +593,20 @@ if [ $b_option -eq 1 ]; then
       exit 1
     fi
 
-    # Make a distance matrix of the merged file
-    echo -e "Using plink to make a distance matrix of the merged file"
-    "${tool_directory}"/quality_control_files/common_scripts/plink  \
-      --allow-no-sex  \
-      --bfile ""${tool_directory}"/quality_control_files/temp_files/${file_new}_breed_merge"  \
-      --distance square 1-ibs  \
-      --chr-set 38  \
-      --out ""${tool_directory}"/quality_control_files/temp_files/${file_new}_breed_distance"  \
-      --silent
-    cat ""${tool_directory}"/quality_control_files/temp_files/${file_new}_breed_distance.log" >> "$log_file"
-
-    rm "${tool_directory}"/quality_control_files/temp_files/"${file_new}_"breed_merge*
-
-    echo -e "\nUsing python script ReformatDist.py to reformat the distance matrix to phylip format"
+    # the 1-IBS distance matrix of the input file and the breed database (on the common SNPs) is made by
+    # ReformatDist.py, without merging the files
+    echo -e "\nUsing python script ReformatDist.py to make a distance matrix of $original_name and the breed database"
+    echo -e "in phylip format"
     python3 "${tool_directory}"/quality_control_files/common_scripts/ReformatDist.py  \
-    ""${tool_directory}"/quality_control_files/temp_files/${file_new}_breed_distance"  \
+    "$file_bed"  \
+    "$file_bim"  \
+    "$file_fam"  \
+    ""${tool_directory}"/quality_control_files/breed_database/Dogs_for_tree"  \
+    ""${tool_directory}"/quality_control_files/temp_files/${file_new}_innerjoin.list"  \
     ""${tool_directory}"/quality_control_files/temp_files/${file_new}_matrix.txt"  \
     ""${tool_directory}"/quality_control_files/temp_files/${file_new}_ids.txt"
 
-    rm "${tool_directory}"/quality_control_files/temp_files/"${file_new}_"breed_distance*
-
+    rm ""${tool_directory}"/quality_control_files/temp_files/${file_new}_innerjoin.list"
 
     row_outgroup=$(sed -n '/Coyote_347/=' ""${tool_directory}"/quality_control_files/temp_files/${file_new}_ids.txt")
     echo -e "\nUsing the Phylip neighbor executable to make a newick tree"
@@ -0,0 +1,148 @@
+"""
+This script:
+contains functions to compute the 1-IBS distance matrix of the input file and the breed database with a distance index
+of the breed database, used by MakeTree.py and ReformatDist.py of the breed check
+    the distances between the database samples do not change between runs, so a distance index of the database is kept
+    in quality_control_files/distance_index: per set of used database SNPs (the SNPs in common with the input file)
+    the IBS distance sums and the number of SNPs called in both samples of all pairs of database samples
+        the index of a set of SNPs is made the first time it is used (e.g. the first run with a file of a platform), and
+        is loaded in following runs with the same set of SNPs
+        when the database changed, the index is made again
+        when the index folder cannot be written (for example a read-only tool directory), the index is only kept in
+        memory
+    per run only the sums of the input samples with the database samples and with each other are counted (count_ibs_tiles
+    of IBSDistance.py), so the time grows with number of input samples x all samples instead of all samples x all
+    samples
+    the full matrix is made in the order of plink --bmerge (input samples first) and is the same as the matrix made by
+    get_bed_distances of IBSDistance.py
+"""
+import hashlib
+import os
+import tempfile
+import numpy as np
+from PlinkBed import open_bed, read_plink_rows, read_bed, get_bit_planes
+from IBSDistance import count_ibs_tiles, get_distances, align_database_snps
+
+INDEX_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'distance_index')
+INDEX_VERSION = 1
+
+
+def get_file_status(prefix):
+    """
+    :param prefix: prefix of the .bed, .bim and .fam file
+    :return: list with the size and modification time of the .bed, .bim and .fam file
+    """
+    status = []
+    for extension in ('.bed', '.bim', '.fam'):
+        file_status = os.stat(prefix + extension)
+        status += [file_status.st_size, file_status.st_mtime_ns]
+    return status
+
+
+def get_index_filename(prefix, database_snps):
+    """
+    :param prefix: prefix of the database .bed, .bim and .fam file
+    :param database_snps: array with the index of the used SNPs in the database
+    :return: name of the index file of this database and set of SNPs
+    """
+    path_hash = hashlib.sha1(os.path.abspath(prefix).encode()).hexdigest()[:12]
+    snps_hash = hashlib.sha1(np.asarray(database_snps, dtype=np.int64).tobytes()).hexdigest()[:12]
+    return os.path.join(INDEX_DIRECTORY, f'{os.path.basename(prefix)}.{path_hash}.{snps_hash}.npz')
+
+
+def read_index(index_filename):
+    """
+    :param index_filename: name of the index file
+    :return: dictionary with the content of the index file, None if there is no usable index file
+    """
+    try:
+        with np.load(index_filename, allow_pickle=False) as DataIndex:
+            index = {key: DataIndex[key] for key in DataIndex.files}
+    except (OSError, ValueError, KeyError, EOFError):
+        return None
+    if index.get('version') is None or int(index['version']) != INDEX_VERSION:
+        return None
+    return index
+
+
+def write_index(index_filename, index):
+    """
+    :param index_filename: name of the index file
+    :param index: dictionary made by load_database_sums
+    The index is first written to a temporary file and then renamed, so jobs running at the same time never read a half
+    written index. If the index folder cannot be written, no index file is made.
+    """
+    try:
+        os.makedirs(INDEX_DIRECTORY, exist_ok=True)
+        file_descriptor, temp_filename = tempfile.mkstemp(dir=INDEX_DIRECTORY, suffix='.temp')
+        try:
+            with os.fdopen(file_descriptor, "wb") as NewFileIndex:
+                np.savez(NewFileIndex, **index)
+            os.replace(temp_filename, index_filename)
+        except BaseException:
+            os.remove(temp_filename)
+            raise
+    except OSError:
+        pass
+
+
+def load_database_sums(prefix, database_snps, planes_database):
+    """
+    :param prefix: prefix of the database .bed, .bim and .fam file
+    :param database_snps: array with the index of the used SNPs in the database
+    :param planes_database: bit-planes of the database samples on these SNPs, used when the index is made
+    :return: arrays (database samples x database samples) with the IBS distance sums and the number of SNPs called in
+    both samples, from the distance index when the index of this database and set of SNPs is up to date
+    """
+    index_filename = get_index_filename(prefix, database_snps)
+    index = read_index(index_filename)
+    if index is not None and list(index['status']) == get_file_status(prefix) and \
+            np.array_equal(index['snps'], database_snps):
+        print("Distance index of the breed database loaded")
+        return index['distance_sum'], index['called_both']
+
+    distance_sum, called_both = count_ibs_tiles(planes_database)
+    print("Number of samples in the new distance index of the breed database: ", planes_database.shape[1])
+    write_index(index_filename, {'version': np.array(INDEX_VERSION),
+                                 'status': np.array(get_file_status(prefix), dtype=np.int64),
+                                 'snps': np.asarray(database_snps, dtype=np.int64),
+                                 'distance_sum': distance_sum, 'called_both': called_both})
+    return distance_sum, called_both
+
+
+def get_indexed_distances(filename_bed, filename_bim, filename_fam, prefix_database, snp_list):
+    """
+    :param filename_bed: input .bed file
+    :param filename_bim: input .bim file
+    :param filename_fam: input .fam file
+    :param prefix_database: prefix of the .bed, .bim and .fam file of the database
+    :param snp_list: set with the SNP ids to use, made by read_snp_list of IBSDistance.py
+    :return: square matrix with the 1-IBS distances between all samples of the input file and the database, and the
+    rows of the .fam files of these samples (in the order of the matrix, input samples first)
+    """
+    with open(filename_bim, mode="r") as DataBIM, \
+            open(filename_fam, mode="r") as DataFAM:
+        bim_rows = read_plink_rows(DataBIM)
+        fam_rows = read_plink_rows(DataFAM)
+    database_data, database_bim, database_fam = read_bed(prefix_database)
+    database_snps, snps, swap = align_database_snps(database_bim, bim_rows, snp_list)
+    data = open_bed(filename_bed, len(bim_rows), len(fam_rows))
+    planes = get_bit_planes(data, len(fam_rows), snps, swap)
+    planes_database = get_bit_planes(database_data, len(database_fam), database_snps)
+    del data, database_data
+
+    # the blocks of the matrix: input x input and input x database are counted, database x database is in the index
+    number_input = len(fam_rows)
+    number_samples = number_input + len(database_fam)
+    distance_sum = np.empty((number_samples, number_samples), dtype=np.float64)
+    called_both = np.empty((number_samples, number_samples), dtype=np.float64)
+    inputs, database = slice(0, number_input), slice(number_input, number_samples)
+    distance_sum[inputs, inputs], called_both[inputs, inputs] = count_ibs_tiles(planes)
+    distance_sum[inputs, database], called_both[inputs, database] = count_ibs_tiles(planes, planes_database)
+    distance_sum[database, inputs], called_both[database, inputs] = \
+        distance_sum[inputs, database].T, called_both[inputs, database].T
+    distance_sum[database, database], called_both[database, database] = \
+        load_database_sums(prefix_database, database_snps, planes_database)
+    distances = get_distances(distance_sum, called_both)
+    np.fill_diagonal(distances, 0)
+    return distances, fam_rows + database_fam
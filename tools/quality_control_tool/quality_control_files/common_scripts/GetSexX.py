@@ -2,10 +2,16 @@
 This script:
 creates a new .fam file with sex based on SNP data
     based on proportion of homozygous chromosome X SNP calls
+    the missing and heterozygous calls of the chromosome X SNPs (chromosome 39) are counted per sample directly from
+    the .bed file (PlinkBed.py), with the same counts plink2 --missing and --sample-counts give
+    the functions are also used by SampleQC.py, which counts the X calls in the same read of the .bed as the call rate
 reports for which samples the sex was changed and on how many X snps the sex is based
 """
+import os
 import sys
 import csv
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from PlinkBed import open_bed, read_plink_rows, count_sample_genotypes
 
 
 def split_and_strip(line, delimiter=None):
@@ -18,38 +24,60 @@ def split_and_strip(line, delimiter=None):
     return split_line
 
 
-def get_heterozygosity(line, nr_hetero):
+def get_x_snps(bim_rows):
     """
-    :param line: row of input file
-    :param nr_hetero: dictionary in format ('sampleID': nr of heterozygous snps)
-    :return: dictionary
+    :param bim_rows: list with the rows of the .bim file
+    :return: list with the index of the chromosome X SNPs (chromosome 39), list with the index of the X variants that
+    are not SNPs (an allele longer than 1 base), of which heterozygous calls are not counted (as plink2 hetsnp)
     """
-    # calculate number of heterozygous SNPs
-    hetero = int(line[2])
-    nr_hetero[line[1]] = hetero
-    return nr_hetero
+    x_snps = []
+    x_not_snps = []
+    for index, line in enumerate(bim_rows):
+        if line[0] == '39':  # line[0] is chromosome
+            x_snps.append(index)
+            if len(line[4]) > 1 or len(line[5]) > 1:  # line[4] and line[5] are allele 1 and 2
+                x_not_snps.append(index)
+    return x_snps, x_not_snps
 
 
-def get_snp_sex(line, snp_sex, nr_hetero, count_unknown, sex_unknown_ids, low_x_count):
+def get_x_counts(filename_bed, number_snps, number_samples, x_snps, x_not_snps):
     """
-    :param line: row of input file
+    :param filename_bed: input .bed file
+    :param number_snps: number of SNPs in the .bim file
+    :param number_samples: number of samples in the .fam file
+    :param x_snps: list with the index of the chromosome X SNPs
+    :param x_not_snps: list with the index of the chromosome X variants that are not SNPs
+    :return: arrays with per sample the number of missing X calls and the number of heterozygous X SNP calls
+    """
+    data = open_bed(filename_bed, number_snps, number_samples)
+    nr_missing, nr_hetero = count_sample_genotypes(data, number_samples, x_snps)
+    if x_not_snps:
+        nr_hetero = nr_hetero - count_sample_genotypes(data, number_samples, x_not_snps)[1]
+    del data
+    return nr_missing, nr_hetero
+
+
+def get_snp_sex(line, nr_missing, nr_x_snps, nr_heterozygous, snp_sex, count_unknown, sex_unknown_ids, low_x_count):
+    """
+    :param line: row of .fam file
+    :param nr_missing: number of missing X calls of this sample
+    :param nr_x_snps: number of X SNPs
+    :param nr_heterozygous: number of heterozygous X SNP calls of this sample
     :param snp_sex: dictionary in format ('sampleID': 'snp_sex', 'nr_nonmissing_snps')
-    :param nr_hetero: dictionary in format ('sampleID': nr of heterozygous snps)
     :param count_unknown: count of how often sex cannot be determined based on SNP data
     :param sex_unknown_ids: list with ids of which no sex is determined
     :param low_x_count: list with ids of which sex was based on 500 or less X SNPs and nr of snps
     :return: updated dictionary
     """
     # calculate number of homozygous SNPs
-    nr_nonmissing = int(line[3]) - int(line[2])  # number of X SNPs - number of missing calls
+    nr_nonmissing = nr_x_snps - int(nr_missing)  # number of X SNPs - number of missing calls
     if nr_nonmissing == 0:  # if no X snps are found
         low_x_count.append(line[0:2] + [nr_nonmissing])
-        snp_sex[line[1]] = ['0', nr_nonmissing]  # sex unknown
+        snp_sex[line[1]] = ['0', nr_nonmissing, 'NA']  # sex unknown
         count_unknown += 1
         sex_unknown_ids.append([line[0], line[1]])  # line[0] = family id, line[1] = sample id
     else:  # if number of X SNPs is not zero
-        nr_heterozygous = nr_hetero[line[1]]
-        nr_homozygous = nr_nonmissing - nr_heterozygous
+        nr_homozygous = nr_nonmissing - int(nr_heterozygous)
         homozygous_proportion = nr_homozygous / nr_nonmissing
         # check sex based on proportion of homozygous SNPs
         if homozygous_proportion <= 0.970:
@@ -82,13 +110,14 @@ def check_sex(line, snp_sex, different_sex, count_sex_changed):
     return line, different_sex, count_sex_changed
 
 
-def report_different_sex(different_sex, count_sex_changed, count_unknown, sex_unknown_ids, low_x_count):
+def report_different_sex(different_sex, count_sex_changed, count_unknown, sex_unknown_ids, low_x_count, sex_changed):
     """
     :param different_sex: dictionary in format ('sampleID': ['familyID', 'sampleID', 'SNP sex', 'Original sex']
     :param count_sex_changed: count of how often sex was changed (different sex between .fam en snp sex)
     :param count_unknown: count of how often sex cannot be determined based on SNP data
     :param sex_unknown_ids: list with ids of which no sex is determined
     :param low_x_count: list with ids of which sex was based on 500 or less X SNPs and nr of snps
+    :param sex_changed: output file with the samples for which the sex was changed
     """
     if count_sex_changed == 0:
         print("For", count_sex_changed, "samples the sex was changed based on SNP data")
@@ -105,7 +134,6 @@ def report_different_sex(different_sex, count_sex_changed, count_unknown, sex_un
                                                       "number of X SNPs:")
             for sample in low_x_count:
                 print(sample[0], sample[1], sample[2])
-        sex_changed = sys.argv[5]
         with open(sex_changed, "w", newline='') as NewFileSexChanged:
             writer_sex = csv.writer(NewFileSexChanged, delimiter='\t')
             header = ['FamilyID', 'SampleID', 'original_sex', 'SNP_sex', 'nr_nonmissing_X_SNPs', "percentage_homozygous"]
@@ -118,46 +146,41 @@ def main():
     """ Creates a new FAM file and reports for which dogs the sex was changed
     """
     # input files
-    file_het = sys.argv[1]  # plink .scount file
-    file_missing = sys.argv[2]  # plink .smiss file
+    file_bed = sys.argv[1]  # plink .bed file
+    file_bim = sys.argv[2]  # plink .bim file
     file_fam = sys.argv[3]  # plink .fam file
     # Output files
     new_filename_fam = sys.argv[4]
+    sex_changed = sys.argv[5]  # file with the samples for which the sex was changed
 
-    nr_hetero = {}
     snp_sex = {}
     count_unknown = 0
     sex_unknown_ids = []
     low_x_count = []
-    with open(file_missing, mode="r") as DataMissing, \
-            open(file_het, mode="r") as DataHet, \
-            open(file_fam, mode="r") as DataFAM, \
-            open(new_filename_fam, "w", newline='') as NewFileFAM:
+    with open(file_bim, mode="r") as DataBIM, \
+            open(file_fam, mode="r") as DataFAM:
+        # get the index of the X SNPs, and count the missing and heterozygous X calls of each sample in the .bed file
+        bim_rows = read_plink_rows(DataBIM)
+        fam_rows = [split_and_strip(line, delimiter=' ') for line in DataFAM]
+    x_snps, x_not_snps = get_x_snps(bim_rows)
+    nr_missing, nr_hetero = get_x_counts(file_bed, len(bim_rows), len(fam_rows), x_snps, x_not_snps)
+
+    for line, missing, heterozygous in zip(fam_rows, nr_missing, nr_hetero):
+        # get sex based on X chromosome SNP homozygosity
+        snp_sex, count_unknown, sex_unknown_ids, low_x_count = get_snp_sex(line, missing, len(x_snps), heterozygous, snp_sex, count_unknown, sex_unknown_ids, low_x_count)
+
+    # the .fam file is read before the new .fam file is opened, so the new .fam file can replace the input .fam file
+    with open(new_filename_fam, "w", newline='') as NewFileFAM:
         writer_fam = csv.writer(NewFileFAM, delimiter=' ')
-
-        for index, line in enumerate(DataHet):
-            if index == 0:
-                continue
-            line = split_and_strip(line)
-            # get number of heterozygous X SNPs
-            nr_hetero = get_heterozygosity(line, nr_hetero)
-
-        for index, line in enumerate(DataMissing):
-            if index == 0:
-                continue
-            line = split_and_strip(line)
-            # get sex based on X chromosome SNP homozygosity
-            snp_sex, count_unknown, sex_unknown_ids, low_x_count = get_snp_sex(line, snp_sex, nr_hetero, count_unknown, sex_unknown_ids, low_x_count)
-
         count_sex_changed = 0
         different_sex = {}
-        for line in DataFAM:
-            line = split_and_strip(line, delimiter=' ')
+        for line in fam_rows:
             # check if sex differs between snp sex and fam file
             line, different_sex, count_sex_changed = check_sex(line, snp_sex, different_sex, count_sex_changed, )
             writer_fam.writerow(line)
 
-        report_different_sex(different_sex, count_sex_changed, count_unknown, sex_unknown_ids, low_x_count)
+    report_different_sex(different_sex, count_sex_changed, count_unknown, sex_unknown_ids, low_x_count, sex_changed)
 
 
-main()
+if __name__ == '__main__':
+    main()
@@ -2,11 +2,17 @@
 This script:
 creates a new .fam file with sex based on SNP data
     based on number of Y calls per sample (high in males, low in females)
+    the Y calls (chromosome 40) are counted per sample directly from the .bed file (PlinkBed.py), only the bytes of the
+    chromosome 40 SNPs are read, these are found with an index of the chromosome ranges of the .bim file
+    the functions are also used by SampleQC.py, which counts the Y calls in the same read of the .bed as the call rate
 reports for which samples the sex was changed
 """
 
+import os
 import sys
 import csv
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from PlinkBed import open_bed, read_plink_rows, index_chromosomes, get_chromosome_snps, count_sample_genotypes
 
 
 def split_and_strip(line, delimiter=None):
@@ -19,15 +25,29 @@ def split_and_strip(line, delimiter=None):
     return split_line
 
 
-def get_snp_sex(line, snp_sex, y_limit):
+def get_y_calls(filename_bed, bim_rows, number_samples):
     """
-    :param line: row of input file
+    :param filename_bed: input .bed file
+    :param bim_rows: list with the rows of the .bim file
+    :param number_samples: number of samples in the .fam file
+    :return: array with per sample the number of Y calls (Y SNPs that are not missing)
+    """
+    y_snps = get_chromosome_snps(index_chromosomes(bim_rows), '40')
+    data = open_bed(filename_bed, len(bim_rows), number_samples)
+    nr_missing = count_sample_genotypes(data, number_samples, y_snps)[0]
+    del data
+    return len(y_snps) - nr_missing
+
+
+def get_snp_sex(line, y_calls, snp_sex, y_limit):
+    """
+    :param line: row of .fam file
+    :param y_calls: number of Y calls of this sample
     :param snp_sex: dictionary in format ('sampleID': 'snp_sex')
     :param y_limit: limit for number of SNP calls (100 for embark, 130 for neogen 220k)
     :return: updated dictionary
     """
-    # check if number of missing Y calls is under y_limit (male), or above y_limit (female)
-    y_calls = int(line[3]) - int(line[2]) # line[2] is number of missing Y calls, line[3] is total number Y SNPs
+    # check if number of Y calls is above y_limit (male), or under y_limit (female)
     if y_calls > y_limit:
         snp_sex[line[1]] = '1'  # is male
     else:
@@ -51,17 +71,17 @@ def check_sex(line, snp_sex, different_sex, count_sex_changed):
     return line, different_sex, count_sex_changed
 
 
-def report_different_sex(different_sex, count_sex_changed):
+def report_different_sex(different_sex, count_sex_changed, sex_changed):
     """
     :param different_sex: dictionary in format ('sampleID': ['familyID', 'sampleID', 'SNP sex', 'Original sex']
     :param count_sex_changed: count of how often sex was changed (different sex between .fam en snp sex)
+    :param sex_changed: output file with the samples for which the sex was changed
     """
     if count_sex_changed == 0:
         print("For", count_sex_changed, "samples the sex was changed based on SNP data")
     if count_sex_changed != 0:
         print("For", count_sex_changed, "samples the sex was changed based on SNP data")
         print("The samples for which sex was changed are in the _changed_sex.txt file")
-        sex_changed = sys.argv[5]
         # write information of samples for which sex changed to file
         with open(sex_changed, "w", newline='') as NewFileSexChanged:
             writer_sex = csv.writer(NewFileSexChanged, delimiter='\t')
@@ -75,34 +95,38 @@ def main():
     """ Creates a new FAM file and reports for which dogs the sex was changed
     """
     # input files
-    file_missing = sys.argv[2]  # plink .smiss file
-    file_fam = sys.argv[3]  # plink .fam file
+    file_bed = sys.argv[2]  # plink .bed file
+    file_bim = sys.argv[3]  # plink .bim file
+    file_fam = sys.argv[4]  # plink .fam file
     # Output files
-    new_filename_fam = sys.argv[4]
+    new_filename_fam = sys.argv[5]
+    sex_changed = sys.argv[6]  # file with the samples for which the sex was changed
 
     y_limit = int(sys.argv[1])
     snp_sex = {}
-    with open(file_missing, mode="r") as DataMissing, \
-            open(file_fam, mode="r") as DataFAM, \
-            open(new_filename_fam, "w", newline='') as NewFileFAM:
+    with open(file_bim, mode="r") as DataBIM, \
+            open(file_fam, mode="r") as DataFAM:
+        bim_rows = read_plink_rows(DataBIM)
+        fam_rows = [split_and_strip(line, delimiter=' ') for line in DataFAM]
+    # count the Y calls of each sample in the .bed file
+    y_calls = get_y_calls(file_bed, bim_rows, len(fam_rows))
+
+    for line, calls in zip(fam_rows, y_calls):
+        # get sex based on Y SNPs
+        snp_sex = get_snp_sex(line, calls, snp_sex, y_limit)
+
+    # the .fam file is read before the new .fam file is opened, so the new .fam file can replace the input .fam file
+    with open(new_filename_fam, "w", newline='') as NewFileFAM:
         writer_fam = csv.writer(NewFileFAM, delimiter=' ')
-
-        for index, line in enumerate(DataMissing):
-            if index == 0:
-                continue
-            line = split_and_strip(line)
-            # get sex based on Y SNPs
-            snp_sex = get_snp_sex(line, snp_sex, y_limit)
-
         count_sex_changed = 0
         different_sex = {}
-        for line in DataFAM:
-            line = split_and_strip(line, delimiter=' ')
+        for line in fam_rows:
             # check if sex differs between snp sex and fam file
             line, different_sex, count_sex_changed = check_sex(line, snp_sex, different_sex, count_sex_changed)
             writer_fam.writerow(line)
 
-        report_different_sex(different_sex, count_sex_changed)
+    report_different_sex(different_sex, count_sex_changed, sex_changed)
 
 
-main()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""
+This script:
+contains functions to compute the 1-IBS distance matrix of samples in python, as plink --distance 1-ibs does, without
+plink and without writing the distance matrix as text (.mdist)
+    the genotypes are read from the .bed as bit-planes (get_bit_planes of PlinkBed.py): per sample one bit per SNP for
+    homozygous allele 1, heterozygous and homozygous allele 2
+    for each pair of samples the IBS distance is counted on the SNPs called in both samples: 0 for the same genotype,
+    1 when one sample is heterozygous and the other homozygous and 2 for opposite homozygous genotypes
+    the 1-IBS distance is this sum divided by 2 times the number of SNPs called in both samples (missing calls are
+    handled as plink --distance flat-missing does)
+    the sums are matrix products of the unpacked bit-planes (per pair of samples the AND of two planes, counted over the
+    SNPs), computed in tiles of samples by parallel threads
+    SNPs can be weighted, e.g. with the number of times a SNP is drawn in a bootstrap replicate
+    the sums can also be counted between two sets of samples (e.g. only the new samples against the database samples,
+    see DistanceIndex.py of the quality control tool)
+    the same IBSDistance.py is used by the quality control tool (common_scripts) and the consensus tree tool (scripts),
+    keep these copies the same
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PlinkBed import open_bed, read_plink_rows, read_bed, get_bit_planes, align_snps
+
+
+def read_snp_list(file):
+    """
+    :param file: input file with SNP ids (e.g. made by GetInnerJoin.py or BootstrapSamples.py)
+    :return: set with the SNP ids, every word in the file is a SNP id (as plink --extract reads it)
+    """
+    snp_list = set()
+    for line in file:
+        snp_list.update(line.split())
+    return snp_list
+
+
+def get_snp_weights(bim_rows, snp_list):
+    """
+    :param bim_rows: list with the rows of the .bim file
+    :param snp_list: set with the SNP ids to use, made by read_snp_list
+    :return: array with per SNP of the .bim weight 1 if it is in snp_list, else 0 (as plink --extract)
+    """
+    return np.array([row[1] in snp_list for row in bim_rows], dtype=np.float32)  # row[1] is SNP id
+
+
+def unpack_distance_terms(planes, chunk, weights=None):
+    """
+    :param planes: bit-planes of the samples of one tile (planes x samples x bytes)
+    :param chunk: slice with the bytes (8 SNPs each) to unpack
+    :param weights: float32 array with the weight of each SNP of the chunk, None for weight 1
+    :return: arrays (samples x SNPs of the chunk, 4 terms after each other) with the left terms and the right terms of
+    the distance sum, and arrays (samples x SNPs) with 1 where the sample is called (weighted and not weighted)
+    For genotypes a and b (copies of allele 1) |a - b| = |p1(a) - p1(b)| + |p2(a) - p2(b)|, with p1 = at least 1 copy
+    and p2 = 2 copies. Summed over the SNPs called in both samples |p(a) - p(b)| = p(a).c(b) + c(a).p(b) - 2 p(a).p(b),
+    with c = called, so the distance sum of all pairs is [x, c, p1, p2] . [c, x, -2 p1, -2 p2] with x = p1 + p2.
+    """
+    hom_a1, het, hom_a2 = np.unpackbits(planes[:, :, chunk], axis=2).astype(np.float32)
+    called = hom_a1 + het + hom_a2
+    copies = 2 * hom_a1 + het
+    left = np.concatenate([copies, called, hom_a1 + het, hom_a1], axis=1)
+    right = np.concatenate([called, copies, -2 * (hom_a1 + het), -2 * hom_a1], axis=1)
+    if weights is None:
+        return left, right, called, called
+    return left * np.tile(weights, 4), right, called * weights, called
+
+
+def count_ibs(planes_first, planes_second, weights=None, chunk_size=512):
+    """
+    :param planes_first: bit-planes of the first samples (planes x samples x bytes)
+    :param planes_second: bit-planes of the second samples (planes x samples x bytes), None if the same samples
+    :param weights: float32 array with the weight of each SNP (8 per byte of the planes), None for weight 1
+    :param chunk_size: number of bytes (8 SNPs each) that are unpacked at once, this bounds the memory use
+    :return: arrays (first samples x second samples) with the IBS distance sum and the (weighted) number of SNPs called
+    in both samples
+    """
+    number_second = planes_first.shape[1] if planes_second is None else planes_second.shape[1]
+    distance_sum = np.zeros((planes_first.shape[1], number_second), dtype=np.float64)
+    called_both = np.zeros((planes_first.shape[1], number_second), dtype=np.float64)
+    for start in range(0, planes_first.shape[2], chunk_size):
+        chunk = slice(start, start + chunk_size)
+        chunk_weights = None if weights is None else weights[start * 8:(start + chunk_size) * 8]
+        # the sums of one chunk are exact in float32 (below 2^24), so the matrix products can use BLAS
+        left, _, called_left, _ = unpack_distance_terms(planes_first, chunk, chunk_weights)
+        if planes_second is None:
+            _, right, _, called_right = unpack_distance_terms(planes_first, chunk)
+        else:
+            _, right, _, called_right = unpack_distance_terms(planes_second, chunk)
+        distance_sum += left @ right.T
+        called_both += called_left @ called_right.T
+    return distance_sum, called_both
+
+
+def count_ibs_tiles(planes_first, planes_second=None, weights=None, tile_size=512, number_threads=None):
+    """
+    :param planes_first: bit-planes of the first samples (planes x samples x bytes)
+    :param planes_second: bit-planes of the second samples (planes x samples x bytes), None for the pairs of the first
+    samples with each other
+    :param weights: array with the weight of each SNP of the planes, None for weight 1
+    :param tile_size: number of samples per tile, the tiles of the matrix are computed in parallel
+    :param number_threads: number of threads, default number of CPUs
+    :return: arrays (first samples x second samples) with the IBS distance sum and the (weighted) number of SNPs called
+    in both samples, for the pairs of the first samples with each other only the tiles of the upper triangle are counted
+    """
+    number_first = planes_first.shape[1]
+    number_second = number_first if planes_second is None else planes_second.shape[1]
+    if weights is not None:
+        # the weights of the padding bits of the last byte are 0
+        weights = np.append(np.asarray(weights, dtype=np.float32),
+                            np.zeros(planes_first.shape[2] * 8 - len(weights), dtype=np.float32))
+    starts_first, starts_second = range(0, number_first, tile_size), range(0, number_second, tile_size)
+    tiles = [(first, second) for first in starts_first for second in starts_second
+             if planes_second is not None or first <= second]
+    distance_sum = np.zeros((number_first, number_second), dtype=np.float64)
+    called_both = np.zeros((number_first, number_second), dtype=np.float64)
+
+    def count_tile(tile):
+        first, second = tile
+        tile_first = planes_first[:, first:first + tile_size]
+        if planes_second is not None:
+            tile_second = planes_second[:, second:second + tile_size]
+        else:
+            tile_second = None if first == second else planes_first[:, second:second + tile_size]
+        return tile, count_ibs(tile_first, tile_second, weights)
+
+    with ThreadPoolExecutor(number_threads or os.cpu_count() or 1) as executor:
+        for (first, second), (tile_sum, tile_called) in executor.map(count_tile, tiles):
+            rows, columns = slice(first, first + tile_size), slice(second, second + tile_size)
+            distance_sum[rows, columns], called_both[rows, columns] = tile_sum, tile_called
+            if planes_second is None:
+                distance_sum[columns, rows], called_both[columns, rows] = tile_sum.T, tile_called.T
+    return distance_sum, called_both
+
+
+def get_distances(distance_sum, called_both):
+    """
+    :param distance_sum: array with the IBS distance sums, made by count_ibs_tiles
+    :param called_both: array with the number of SNPs called in both samples, made by count_ibs_tiles
+    :return: array with the 1-IBS distances, nan for pairs without SNPs called in both samples
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return distance_sum / (2 * called_both)
+
+
+def get_ibs_distances(planes, weights=None, tile_size=512, number_threads=None):
+    """
+    :param planes: bit-planes of the samples (planes x samples x bytes)
+    :param weights: array with the weight of each SNP of the planes, None for weight 1
+    :param tile_size: number of samples per tile, the tiles of the upper triangle of the matrix are computed in parallel
+    :param number_threads: number of threads, default number of CPUs
+    :return: square matrix (samples x samples) with the 1-IBS distances, nan for pairs without SNPs called in both
+    samples
+    """
+    distances = get_distances(*count_ibs_tiles(planes, None, weights, tile_size, number_threads))
+    np.fill_diagonal(distances, 0)
+    return distances
+
+
+def align_database_snps(database_bim, bim_rows, snp_list):
+    """
+    :param database_bim: list with the rows of the .bim file of the database
+    :param bim_rows: list with the rows of the input .bim file
+    :param snp_list: set with the SNP ids to use (e.g. the SNPs in common, made by GetInnerJoin.py)
+    :return: arrays with the index of the used SNPs in the database, the index of these SNPs in the input file, and per
+    SNP if allele 1 and 2 of the input file are swapped (made by align_snps)
+    The SNPs of the database in snp_list are used, SNPs with other alleles in the input file are not used.
+    """
+    database_snps = [index for index, row in enumerate(database_bim) if row[1] in snp_list]
+    snps, swap = align_snps([database_bim[index][1] for index in database_snps],
+                            [database_bim[index][4] for index in database_snps],
+                            [database_bim[index][5] for index in database_snps], bim_rows)
+    database_snps = np.array(database_snps, dtype=np.intp)[snps >= 0]
+    print("Number of SNPs used for the distance matrix: ", int((snps >= 0).sum()))
+    return database_snps, snps[snps >= 0], swap[snps >= 0]
+
+
+def get_merged_planes(filename_bed, bim_rows, fam_rows, prefix_database, snp_list):
+    """
+    :param filename_bed: input .bed file
+    :param bim_rows: list with the rows of the input .bim file
+    :param fam_rows: list with the rows of the input .fam file
+    :param prefix_database: prefix of the .bed, .bim and .fam file of the database
+    :param snp_list: set with the SNP ids to use (e.g. the SNPs in common, made by GetInnerJoin.py)
+    :return: bit-planes of the input samples followed by the database samples, and the rows of the .fam files of the
+    input and the database after each other (the order of plink --bmerge)
+    The input file is aligned to the SNPs of the database with align_database_snps.
+    """
+    database_data, database_bim, database_fam = read_bed(prefix_database)
+    database_snps, snps, swap = align_database_snps(database_bim, bim_rows, snp_list)
+    data = open_bed(filename_bed, len(bim_rows), len(fam_rows))
+    planes = np.concatenate([get_bit_planes(data, len(fam_rows), snps, swap),
+                             get_bit_planes(database_data, len(database_fam), database_snps)], axis=1)
+    del data, database_data
+    return planes, fam_rows + database_fam
+
+
+def get_bed_distances(filename_bed, filename_bim, filename_fam, prefix_database, snp_list):
+    """
+    :param filename_bed: input .bed file
+    :param filename_bim: input .bim file
+    :param filename_fam: input .fam file
+    :param prefix_database: prefix of the .bed, .bim and .fam file of the database
+    :param snp_list: set with the SNP ids to use, made by read_snp_list
+    :return: square matrix with the 1-IBS distances between all samples of the input file and the database, and the
+    rows of the .fam files of these samples (in the order of the matrix)
+    """
+    with open(filename_bim, mode="r") as DataBIM, \
+            open(filename_fam, mode="r") as DataFAM:
+        bim_rows = read_plink_rows(DataBIM)
+        fam_rows = read_plink_rows(DataFAM)
+    planes, fam_rows = get_merged_planes(filename_bed, bim_rows, fam_rows, prefix_database, snp_list)
+    return get_ibs_distances(planes), fam_rows
@@ -0,0 +1,330 @@
+"""
+This script:
+computes the kinship scores between the samples of the input file and the samples of a second file (database, option
+-m of the duplicate check) with the KING-robust estimator, without merging the input file with the database
+    a kinship index of the database is kept in quality_control_files/kinship_index: per database sample the genotypes
+    of the autosomal SNPs as bit-planes (homozygous allele 1, heterozygous and homozygous allele 2, 8 SNPs per byte)
+    and the number of called SNPs
+        the index is made the first time a database is used, and is loaded in following runs
+        when the database changed, and only samples were added to the end of the .fam file (the .bim file is the
+        same), only the new samples are added to the index, else the index is made again
+        when the index folder cannot be written (for example a read-only tool directory), the index is only kept in
+        memory
+    the genotypes of the input file are put on the SNPs of the index (matched on SNP id), allele 1 and 2 are swapped
+    where the input file has them the other way around, SNPs with other alleles are not used (as plink --bmerge)
+    for each pair of an input sample and a database sample the kinship is computed on the SNPs called in both samples,
+    as plink2 --make-king-table does:
+        kinship = 0.5 - (4 * IBS0 + HET1_HOM2 + HET2_HOM1) / (4 * min(HET1, HET2))
+    the counts of the pairs are made with matrix products of the bit-planes, in tiles of input samples x database
+    samples and chunks of SNPs, so the memory use does not grow with the number of samples
+    the pairs with a kinship score of 0.1875 or higher are written as plink2 --king-table-filter 0.1875 writes them
+    (.kin0, tab-delimited), with the number of called SNPs of the samples of these pairs (.smiss, for
+    GetDuplicateInfo.py)
+usage:
+    python3 KinshipIndex.py <input .bed> <input .bim> <input .fam (with unique ids)> <prefix database> <output .kin0>
+    <output .smiss>
+"""
+import csv
+import hashlib
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import numpy as np
+from PlinkBed import open_bed, read_plink_rows, count_sample_genotypes, get_bit_planes, align_snps
+# get the start time
+st = time.time()
+
+INDEX_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'kinship_index')
+INDEX_VERSION = 1
+KING_FILTER = 0.1875  # as plink2 --king-table-filter 0.1875
+NUMBER_AUTOSOMES = 38  # --chr-set 38, plink2 --make-king-table only uses the autosomes
+KIN0_HEADER = ['#FID1', 'IID1', 'FID2', 'IID2', 'NSNP', 'HETHET', 'IBS0', 'KINSHIP']
+
+
+def get_file_status(prefix):
+    """
+    :param prefix: prefix of the .bed, .bim and .fam file
+    :return: list with the size and modification time of the .bed, .bim and .fam file
+    """
+    status = []
+    for extension in ('.bed', '.bim', '.fam'):
+        file_status = os.stat(prefix + extension)
+        status += [file_status.st_size, file_status.st_mtime_ns]
+    return status
+
+
+def get_rows_hash(rows):
+    """
+    :param rows: list with the rows of a .bim file
+    :return: sha1 hash of the rows
+    """
+    rows_hash = hashlib.sha1()
+    for row in rows:
+        rows_hash.update('\t'.join(row).encode() + b'\n')
+    return rows_hash.hexdigest()
+
+
+def get_index_filename(prefix):
+    """
+    :param prefix: prefix of the database .bed, .bim and .fam file
+    :return: name of the index file of this database
+    """
+    path_hash = hashlib.sha1(os.path.abspath(prefix).encode()).hexdigest()[:12]
+    return os.path.join(INDEX_DIRECTORY, f'{os.path.basename(prefix)}.{path_hash}.npz')
+
+
+def get_autosomal_snps(bim_rows):
+    """
+    :param bim_rows: list with the rows of the .bim file
+    :return: list with the index of the autosomal SNPs, a SNP id that is in the .bim more than once is used once
+    """
+    snps = []
+    seen = set()
+    for index, row in enumerate(bim_rows):
+        # row[0] is chromosome, row[1] is SNP id
+        if row[0].isdigit() and 0 < int(row[0]) <= NUMBER_AUTOSOMES and row[1] not in seen:
+            seen.add(row[1])
+            snps.append(index)
+    return snps
+
+
+def make_index(prefix, bim_rows, fam_rows, index=None):
+    """
+    :param prefix: prefix of the database .bed, .bim and .fam file
+    :param bim_rows: list with the rows of the database .bim file
+    :param fam_rows: list with the rows of the database .fam file
+    :param index: index of an earlier version of the database with the same .bim file and the first samples of the
+    .fam file, only the new samples are added, None to make the index for all samples
+    :return: dictionary with the SNP ids, alleles, sample ids, bit-planes and number of called SNPs per sample
+    """
+    data = open_bed(prefix + '.bed', len(bim_rows), len(fam_rows))
+    start = 0 if index is None else len(index['samples'])
+    new_samples = np.arange(start, len(fam_rows))
+    snps = np.array(get_autosomal_snps(bim_rows), dtype=np.intp)
+    planes = get_bit_planes(data, len(fam_rows), snps, samples=new_samples)
+    called = len(bim_rows) - count_sample_genotypes(data, len(fam_rows))[0][start:]
+    del data
+    if index is not None:
+        planes = np.concatenate([index['planes'], planes], axis=1)
+        called = np.concatenate([index['called'], called])
+        print("Number of samples added to the kinship index of the database: ", len(new_samples))
+    else:
+        print("Number of samples in the new kinship index of the database: ", len(new_samples))
+    return {'version': np.array(INDEX_VERSION), 'status': np.array(get_file_status(prefix), dtype=np.int64),
+            'bim_hash': np.array(get_rows_hash(bim_rows)),
+            'snps': np.array([bim_rows[snp][1] for snp in snps], dtype=np.str_),
+            'allele1': np.array([bim_rows[snp][4] for snp in snps], dtype=np.str_),
+            'allele2': np.array([bim_rows[snp][5] for snp in snps], dtype=np.str_),
+            'samples': np.array([row[0:2] for row in fam_rows], dtype=np.str_).reshape(-1, 2),
+            'number_snps': np.array(len(bim_rows)), 'planes': planes, 'called': called}
+
+
+def read_index(index_filename):
+    """
+    :param index_filename: name of the index file
+    :return: dictionary with the content of the index file, None if there is no usable index file
+    """
+    try:
+        with np.load(index_filename, allow_pickle=False) as DataIndex:
+            index = {key: DataIndex[key] for key in DataIndex.files}
+    except (OSError, ValueError, KeyError, EOFError):
+        return None
+    if index.get('version') is None or int(index['version']) != INDEX_VERSION:
+        return None
+    return index
+
+
+def write_index(index_filename, index):
+    """
+    :param index_filename: name of the index file
+    :param index: dictionary made by make_index
+    The index is first written to a temporary file and then renamed, so jobs running at the same time never read a half
+    written index. If the index folder cannot be written, no index file is made.
+    """
+    try:
+        os.makedirs(INDEX_DIRECTORY, exist_ok=True)
+        file_descriptor, temp_filename = tempfile.mkstemp(dir=INDEX_DIRECTORY, suffix='.temp')
+        try:
+            with os.fdopen(file_descriptor, "wb") as NewFileIndex:
+                np.savez(NewFileIndex, **index)
+            os.replace(temp_filename, index_filename)
+        except BaseException:
+            os.remove(temp_filename)
+            raise
+    except OSError:
+        pass
+
+
+def load_index(prefix):
+    """
+    :param prefix: prefix of the database .bed, .bim and .fam file
+    :return: kinship index of the database (dictionary made by make_index), updated when the database changed
+    """
+    index_filename = get_index_filename(prefix)
+    index = read_index(index_filename)
+    if index is not None and list(index['status']) == get_file_status(prefix):
+        return index
+
+    with open(prefix + '.bim', mode="r") as DataBIM, \
+            open(prefix + '.fam', mode="r") as DataFAM:
+        bim_rows = read_plink_rows(DataBIM)
+        fam_rows = read_plink_rows(DataFAM)
+    # only add the new samples if the SNPs are the same and the samples of the index are the first samples of the .fam
+    if index is not None and (str(index['bim_hash']) != get_rows_hash(bim_rows)
+                              or len(index['samples']) > len(fam_rows)
+                              or index['samples'].tolist() != [row[0:2] for row in fam_rows[:len(index['samples'])]]):
+        index = None
+    index = make_index(prefix, bim_rows, fam_rows, index)
+    write_index(index_filename, index)
+    return index
+
+
+def count_tile_statistics(planes_input, planes_database, chunk_size):
+    """
+    :param planes_input: bit-planes of the input samples of one tile (planes x samples x bytes)
+    :param planes_database: bit-planes of the database samples of one tile (planes x samples x bytes)
+    :param chunk_size: number of bytes (8 SNPs each) that are unpacked at once
+    :return: dictionary with per pair (input samples x database samples of the tile) the number of SNPs called in both
+    samples, the number of SNPs heterozygous in both (HETHET), opposite homozygous (IBS0), and heterozygous in the input
+    sample (HET1) or in the database sample (HET2) where both samples are called
+    """
+    shape = (planes_input.shape[1], planes_database.shape[1])
+    statistics = {key: np.zeros(shape, dtype=np.float64) for key in ('NSNP', 'HETHET', 'IBS0', 'HET1', 'HET2')}
+    for start in range(0, planes_input.shape[2], chunk_size):
+        # the counts of one chunk are exact in float32 (below 2^24), so the matrix products can use BLAS
+        hom1_1, het_1, hom2_1 = np.unpackbits(planes_input[:, :, start:start + chunk_size], axis=2).astype(np.float32)
+        hom1_2, het_2, hom2_2 = np.unpackbits(planes_database[:, :, start:start + chunk_size], axis=2).astype(
+            np.float32)
+        called_1 = hom1_1 + het_1 + hom2_1
+        called_2 = hom1_2 + het_2 + hom2_2
+        statistics['NSNP'] += called_1 @ called_2.T
+        statistics['HETHET'] += het_1 @ het_2.T
+        statistics['IBS0'] += hom1_1 @ hom2_2.T + hom2_1 @ hom1_2.T
+        statistics['HET1'] += het_1 @ called_2.T
+        statistics['HET2'] += called_1 @ het_2.T
+    return statistics
+
+
+def count_pair_statistics(planes_input, planes_database, chunk_size=512, tile_size=512):
+    """
+    :param planes_input: bit-planes of the input samples (planes x samples x bytes)
+    :param planes_database: bit-planes of the database samples (planes x samples x bytes)
+    :param chunk_size: number of bytes (8 SNPs each) that are unpacked at once
+    :param tile_size: number of input samples and of database samples per tile
+    :return: dictionary with per pair (input samples x database samples) the statistics made by count_tile_statistics
+    The pairs are counted in tiles of input samples x database samples, so at most tile_size input samples and
+    tile_size database samples of chunk_size bytes are unpacked at once (about 8 float32 arrays of 512 samples x 4096
+    SNPs with the defaults), independent of the number of samples.
+    """
+    shape = (planes_input.shape[1], planes_database.shape[1])
+    statistics = {key: np.zeros(shape, dtype=np.float64) for key in ('NSNP', 'HETHET', 'IBS0', 'HET1', 'HET2')}
+    for first in range(0, shape[0], tile_size):
+        for second in range(0, shape[1], tile_size):
+            tile_statistics = count_tile_statistics(planes_input[:, first:first + tile_size],
+                                                    planes_database[:, second:second + tile_size], chunk_size)
+            for key, values in tile_statistics.items():
+                statistics[key][first:first + tile_size, second:second + tile_size] = values
+    return statistics
+
+
+def get_kinship(statistics):
+    """
+    :param statistics: dictionary made by count_pair_statistics
+    :return: array with per pair the KING-robust kinship, nan when one of the samples has no heterozygous SNPs
+    """
+    het1_hom2 = statistics['HET1'] - statistics['HETHET']
+    het2_hom1 = statistics['HET2'] - statistics['HETHET']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 0.5 - (4 * statistics['IBS0'] + het1_hom2 + het2_hom1) / (
+                4 * np.minimum(statistics['HET1'], statistics['HET2']))
+
+
+def write_kinship(writer, fam_rows, index, statistics, kinship):
+    """
+    :param writer: which writer to use
+    :param fam_rows: list with the rows of the input .fam file
+    :param index: dictionary made by make_index
+    :param statistics: dictionary made by count_pair_statistics
+    :param kinship: array made by get_kinship
+    :return: list with the pairs (index of input sample, index of database sample) with a kinship of at least 0.1875
+    """
+    writer.writerow(KIN0_HEADER)
+    pairs = list(zip(*np.nonzero(kinship >= KING_FILTER)))
+    for sample, database_sample in pairs:
+        number_snps = statistics['NSNP'][sample, database_sample]
+        writer.writerow(fam_rows[sample][0:2] + list(index['samples'][database_sample]) +
+                        [int(number_snps), f"{statistics['HETHET'][sample, database_sample] / number_snps:g}",
+                         f"{statistics['IBS0'][sample, database_sample] / number_snps:g}",
+                         f"{kinship[sample, database_sample]:g}"])
+    return pairs
+
+
+def write_called_snps(writer, fam_rows, called, number_snps, index, pairs):
+    """
+    :param writer: which writer to use
+    :param fam_rows: list with the rows of the input .fam file
+    :param called: array with per input sample the number of called SNPs
+    :param number_snps: number of SNPs in the input .bim file
+    :param index: dictionary made by make_index
+    :param pairs: list made by write_kinship
+    Writes per sample of the pairs the number of missing and observed SNPs, in the format of plink2 --missing
+    sample-only (.smiss)
+    """
+    writer.writerow(['#FID', 'IID', 'MISSING_CT', 'OBS_CT'])
+    for sample in sorted({pair[0] for pair in pairs}):
+        writer.writerow(fam_rows[sample][0:2] + [number_snps - int(called[sample]), number_snps])
+    for sample in sorted({pair[1] for pair in pairs}):
+        database_snps = int(index['number_snps'])
+        writer.writerow(list(index['samples'][sample]) + [database_snps - int(index['called'][sample]),
+                                                          database_snps])
+
+
+def main():
+    """
+    Computes the kinship scores between the samples of the input file and the samples of the database
+    """
+    # input files
+    filename_bed = sys.argv[1]  # input plink .bed file
+    filename_bim = sys.argv[2]  # input plink .bim file
+    filename_fam = sys.argv[3]  # input .fam file, with ids that are unique compared to the database
+    prefix_database = sys.argv[4]  # prefix of the database .bed, .bim and .fam file
+
+    # output files
+    new_filename_kinship = sys.argv[5]
+    new_filename_missing = sys.argv[6]
+
+    index = load_index(prefix_database)
+    with open(filename_bim, mode="r") as DataBIM, \
+            open(filename_fam, mode="r") as DataFAM:
+        bim_rows = read_plink_rows(DataBIM)
+        fam_rows = read_plink_rows(DataFAM)
+    snps, swap = align_snps(index['snps'], index['allele1'], index['allele2'], bim_rows)
+    print("Number of autosomal SNPs in common with the database: ", int((snps >= 0).sum()))
+
+    data = open_bed(filename_bed, len(bim_rows), len(fam_rows))
+    planes = get_bit_planes(data, len(fam_rows), snps, swap)
+    called = len(bim_rows) - count_sample_genotypes(data, len(fam_rows))[0]
+    del data
+
+    statistics = count_pair_statistics(planes, index['planes'])
+    kinship = get_kinship(statistics)
+    with open(new_filename_kinship, "w", newline='') as NewFileKinship, \
+            open(new_filename_missing, "w", newline='') as NewFileMissing:
+        # tab-delimited with unix line ends, as plink2 writes them
+        pairs = write_kinship(csv.writer(NewFileKinship, delimiter='\t', lineterminator='\n'), fam_rows, index,
+                              statistics, kinship)
+        write_called_snps(csv.writer(NewFileMissing, delimiter='\t', lineterminator='\n'), fam_rows, called,
+                          len(bim_rows), index, pairs)
+    print("Number of sample pairs scored: ", kinship.size)
+    print("Number of sample pairs with a kinship score of", KING_FILTER, "or higher: ", len(pairs))
+
+
+main()
+
+# get the end time
+et = time.time()
+# get the execution time
+elapsed_time = et - st
+print('Execution time:', elapsed_time, 'seconds')
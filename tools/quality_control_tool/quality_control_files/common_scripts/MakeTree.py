@@ -1,17 +1,20 @@
 """
 This script:
-Makes a phylogenetic tree newick file from a distance matrix
+Makes a phylogenetic tree newick file from the 1-IBS distance matrix of the input file and the breed database, the
+distance matrix is computed in python (DistanceIndex.py) on the SNPs in common, the tree is made with the neighbor
+joining method of NeighborJoining.py
 Makes an annotation file for which samples need to be colored in the tree, to use in ITOL webpage
 If this script is run on Git bash, a png image of the tree is made
 
 """
-from ete3 import Tree, TreeStyle, NodeStyle
-from Bio import Phylo
-from Bio.Phylo.TreeConstruction import DistanceMatrix
-from Bio.Phylo.TreeConstruction import DistanceTreeConstructor
 import time
+import os
 import sys
 import csv
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from IBSDistance import read_snp_list
+from DistanceIndex import get_indexed_distances
+from NeighborJoining import neighbor_joining, root_with_outgroup, write_newick
 # get the start time
 st = time.time()
 
@@ -25,38 +28,15 @@ def split_and_strip(line):
     return split_line
 
 
-def get_distances_and_sample_ids(dist_matrix, samples):
-    """
-    :param dist_matrix: distance matrix file
-    :param samples: file with sample IDs
-    :return: list of distance matrix distances and a list with sample IDs
-    """
-    distances = [[0]]  # first line in distance matrix is 0
-    # make a list of the distance matrix, in which each line ends with 0
-    for line in dist_matrix:
-        line = split_and_strip(line)
-        line = [float(i) for i in line]
-        line += [0]  # make line end with 0
-        distances.append(line)
-    # make a list of the sample IDs
-    sample_names = []
-    for line in samples:
-        line = split_and_strip(line)
-        sample_names.append(line[1])
-    return distances, sample_names
-
-
-def make_tree_newick(sample_names, distances):
+def make_tree_newick(sample_names, matrix):
     """
     :param sample_names: list with sample IDs
-    :param distances: list with distances between samples
+    :param matrix: square matrix with the distances between the samples
     """
-    distance_matrix = DistanceMatrix(sample_names, distances)
-    constructor = DistanceTreeConstructor()
-    tree = constructor.nj(distance_matrix)  # nj = neighbourjoin method
-    outgroup = [{'name': 'Coyote_350'}, {'name': 'Coyote_349'}, {'name': 'Coyote_348'}, {'name': 'Coyote_347'}]
-    tree.root_with_outgroup(*outgroup)
-    Phylo.write(tree, sys.argv[3], 'newick')
+    tree = neighbor_joining(matrix, sample_names)  # neighbourjoin method
+    outgroup = ['Coyote_350', 'Coyote_349', 'Coyote_348', 'Coyote_347']
+    root_with_outgroup(tree, outgroup)
+    write_newick(tree, sys.argv[3])
 
 
 def get_new_dogs():
@@ -88,18 +68,21 @@ def make_annotations_file(dogs, writer):
 
 def main():
     # input files
-    dist_matrix = sys.argv[1]  # plink .mdist file (distance matrix)
-    samples = sys.argv[2]  # plink .mdist.id file (sample ids for distance matrix)
+    filename_bed = sys.argv[1]  # input plink .bed file
+    filename_bim = sys.argv[2]  # input plink .bim file
     new_dogs_file = sys.argv[4]  # .fam file
+    prefix_database = sys.argv[8]  # prefix of the .bed, .bim and .fam file of the breed database
+    snp_list_file = sys.argv[9]  # file with the SNPs in common, made by GetInnerJoin.py
     # output files
     annotation_file = sys.argv[6]
-    with open(dist_matrix, mode="r") as dist_matrix, \
-            open(samples, mode="r") as samples,  \
-            open(annotation_file, "w", newline='') as NewFileAn:
+    with open(snp_list_file, mode="r") as DataSNPs:
+        snp_list = read_snp_list(DataSNPs)
+    matrix, fam_rows = get_indexed_distances(filename_bed, filename_bim, new_dogs_file, prefix_database, snp_list)
+    with open(annotation_file, "w", newline='') as NewFileAn:
         writer = csv.writer(NewFileAn, delimiter=' ')
 
-        distances, sample_names = get_distances_and_sample_ids(dist_matrix, samples)
-        make_tree_newick(sample_names, distances)
+        sample_names = [line[1] for line in fam_rows]  # line[1] is sample ID
+        make_tree_newick(sample_names, matrix)
         dogs = get_new_dogs()  # make list with sample ids of new dogs
         make_annotations_file(dogs, writer)  # make annotations file
         return dogs
@@ -117,6 +100,7 @@ st2 = time.time()
 
 
 def main2():
+    from ete3 import Tree, TreeStyle, NodeStyle  # ete3 is only needed for the png image (git bash)
     print("Using python script MakeTree.py to create a png image of the phylogenetic tree")
     t = Tree(sys.argv[3], format=1)
     dogs = get_new_dogs()  # make list with sample ids of new dogs
@@ -0,0 +1,54 @@
+"""
+This script:
+contains functions to index the sample IDs of .fam files, used by CheckDuplicateIDs.py
+    the sample IDs are kept in a list (the order of the file) and in a set, so checking if a sample ID is in a file is
+    a hash lookup instead of a search through the list (with tens of thousands of samples in the database)
+    duplicate sample IDs get a unique ID with a _dupid suffix, computed once per duplicate sample ID
+"""
+
+
+def get_sample_ids(file):
+    """
+    :param file: input .fam file
+    :return: list with the sample ids, in the order of the file
+    """
+    list_ids = []
+    for line in file:
+        line = line.strip().split()
+        list_ids.append(line[1])  # line[1] = sample ID
+    return list_ids
+
+
+def get_duplicate_ids(sample_ids, index_ids):
+    """
+    :param sample_ids: list with sample ids
+    :param index_ids: set with the sample ids of the other file
+    :return: list with the sample ids that are also in index_ids, in the order of sample_ids
+    """
+    return [sample_id for sample_id in sample_ids if sample_id in index_ids]
+
+
+def get_unique_id(sample_id, index_ids, suffix='_dupid'):
+    """
+    :param sample_id: duplicate sample id
+    :param index_ids: set with the sample ids that can not be used
+    :param suffix: text between the sample id and the number of the new sample id
+    :return: first new sample id (e.g. dog1_dupid1, else dog1_dupid2 etc.) that is not in index_ids
+    """
+    dup_number = 1
+    while sample_id + suffix + str(dup_number) in index_ids:
+        dup_number += 1
+    return sample_id + suffix + str(dup_number)
+
+
+def get_unique_ids(duplicate_ids, index_ids):
+    """
+    :param duplicate_ids: list with duplicate sample ids
+    :param index_ids: set with the sample ids that can not be used
+    :return: dictionary with per duplicate sample id the new unique sample id
+    """
+    unique_ids = {}
+    for sample_id in duplicate_ids:
+        if sample_id not in unique_ids:
+            unique_ids[sample_id] = get_unique_id(sample_id, index_ids)
+    return unique_ids
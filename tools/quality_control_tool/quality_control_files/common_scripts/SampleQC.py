@@ -0,0 +1,335 @@
+"""
+This script:
+performs the sample call rate check, the removal of bad Y SNPs and (optionally) the sex check of quality_control.sh
+in one read of the genotypes of the .bed file, instead of separate plink and plink2 runs with temporary files
+    the .bed is memory-mapped (PlinkBed.py), per sample the missing calls are counted, and for the sex check the
+    missing and heterozygous X calls (chromosome 39) and the Y calls (chromosome 40)
+    samples with a sample missing rate above 0.1 are removed, as plink --mind 0.1 --exclude does:
+        the SNPs in the exclude list (bad Y SNPs of embark and neogen 220K) are not counted
+        Y genotypes of females are not counted (obligatory missing)
+    the new .bed, .bim and .fam file are written as plink --make-bed --mind 0.1 --exclude --chr-set 38 writes them:
+        the excluded SNPs and the removed samples are left out
+        allele 1 is the minor allele in the remaining samples, X and Y genotypes of males and MT genotypes count as one
+        allele, heterozygous X genotypes of males and Y genotypes of females are not counted
+        the SNPs are sorted on chromosome and location, missing phenotypes (0) are written as -9
+    the removed samples are written with all SNPs to the _bad_sample .bed, .bim and .fam file, and their sample missing
+    rate over all SNPs is reported (as plink2 --missing sample-only --keep did)
+    the sex check of the remaining samples uses the functions of GetSexX.py (X homozygosity) or GetSexY.py (number of
+    Y calls, embark and neogen 220K), the counts are taken from the same read of the .bed
+usage:
+    python3 SampleQC.py <input .bed> <input .bim> <input .fam> <list with SNPs to exclude, or none> <output prefix>
+    <sex check: none, X, or the Y call limit> <file with the samples for which the sex was changed>
+"""
+import csv
+import os
+import time
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import numpy as np
+from PlinkBed import HOM_A1, HET, HOM_A2, BED_MAGIC, SWAP_TABLE, open_bed, read_plink_rows, pack_codes, unpack_codes, \
+    unpack_genotype_bits, reorder_snps, get_sort_order
+import GetSexX
+import GetSexY
+# get the start time
+st = time.time()
+
+MIND = 0.1  # maximum sample missing rate, as plink --mind 0.1
+
+
+def get_snps_to_exclude(filename):
+    """
+    :param filename: file with per row a SNP id to exclude, or none
+    :return: set with the SNP ids to exclude
+    """
+    snps_to_exclude = set()
+    if filename == 'none':
+        return snps_to_exclude
+    with open(filename, mode="r") as DataExclude:
+        for line in DataExclude:
+            line = line.split()
+            if line:
+                snps_to_exclude.add(line[0])
+    return snps_to_exclude
+
+
+def update_phenotype(line):
+    """
+    :param line: row of .fam file
+    :return: row with missing phenotype (0 or -9) written as -9, as plink does
+    """
+    if line[5] in ('0', '-9'):  # line[5] is phenotype
+        line[5] = '-9'
+    return line
+
+
+def get_snp_groups(bim_rows, snps_to_exclude):
+    """
+    :param bim_rows: list with the rows of the .bim file
+    :param snps_to_exclude: set with the SNP ids to exclude
+    :return: dictionary with per group of SNPs a boolean array with which SNPs of the .bed are in the group
+    """
+    chromosomes = np.array([row[0] for row in bim_rows], dtype=object)  # row[0] is chromosome
+    included = np.array([row[1] not in snps_to_exclude for row in bim_rows], dtype=bool)  # row[1] is SNP id
+    x_snps, x_not_snps = GetSexX.get_x_snps(bim_rows)
+    x = np.zeros(len(bim_rows), dtype=bool)
+    x[x_snps] = True
+    x_snp = x.copy()
+    x_snp[x_not_snps] = False  # heterozygous calls are only counted for X variants that are SNPs
+    y = chromosomes == '40'
+    return {'included': included & ~y, 'included_y': included & y, 'excluded': ~included & ~y,
+            'excluded_y': ~included & y, 'x': included & x, 'x_snp': included & x_snp}
+
+
+def count_sample_calls(data, number_samples, groups, chunk_size=1024):
+    """
+    :param data: memory map of the input .bed, made by open_bed
+    :param number_samples: number of samples in the .fam file
+    :param groups: dictionary made by get_snp_groups
+    :param chunk_size: number of SNPs that are counted at once, this bounds the memory use
+    :return: dictionary with per group of SNPs an array with per sample the number of missing calls, and for the X
+    SNPs (x_snp) the number of heterozygous calls
+    The .bed is read once, in chunks of SNPs that follow each other.
+    """
+    counts = {group: np.zeros(number_samples, dtype=np.int64) for group in groups}
+    for start in range(0, len(data), chunk_size):
+        missing, het = unpack_genotype_bits(data[start:start + chunk_size], number_samples)
+        for group, snps in groups.items():
+            snps = snps[start:start + chunk_size]
+            if not snps.any():
+                continue
+            bits = het if group == 'x_snp' else missing
+            counts[group] += bits[snps].sum(axis=0, dtype=np.int64)
+    return counts
+
+
+def get_missing_rates(groups, counts, females, with_excluded=False):
+    """
+    :param groups: dictionary made by get_snp_groups
+    :param counts: dictionary made by count_sample_calls
+    :param females: boolean array with per sample whether the sex in the .fam file is female (2)
+    :param with_excluded: whether the excluded SNPs are counted (as plink2 --missing), or not (as plink --mind)
+    :return: array with per sample the missing rate, Y genotypes of females are not counted
+    """
+    parts = [('included', 'included_y'), ('excluded', 'excluded_y')] if with_excluded else [('included', 'included_y')]
+    nr_missing = np.zeros(len(females), dtype=np.int64)
+    nr_genotypes = np.zeros(len(females), dtype=np.int64)
+    for group, group_y in parts:
+        nr_missing += counts[group] + np.where(females, 0, counts[group_y])
+        nr_genotypes += groups[group].sum() + np.where(females, 0, groups[group_y].sum())
+    return np.divide(nr_missing, nr_genotypes, out=np.zeros(len(females)), where=nr_genotypes > 0)
+
+
+def get_allele_swap(codes, chromosomes, second_alleles, males):
+    """
+    :param codes: array with the genotype codes of the remaining samples (SNPs x samples)
+    :param chromosomes: array with the chromosome of the SNPs
+    :param second_alleles: array with allele 2 of the SNPs
+    :param males: boolean array with per remaining sample whether the sex is male (1)
+    :return: boolean array with per SNP whether allele 1 and allele 2 change places, so allele 1 is the minor allele
+    """
+    hom_first, het, hom_second = codes == HOM_A1, codes == HET, codes == HOM_A2
+    count_first = 2 * hom_first.sum(axis=1) + het.sum(axis=1)
+    count_second = 2 * hom_second.sum(axis=1) + het.sum(axis=1)
+    # X: males are haploid, heterozygous calls of males are not counted
+    x = chromosomes == '39'
+    if x.any() and males.any():
+        male_het = het[x][:, males].sum(axis=1)
+        count_first[x] -= hom_first[x][:, males].sum(axis=1) + male_het
+        count_second[x] -= hom_second[x][:, males].sum(axis=1) + male_het
+    # Y: only males are counted, as haploid
+    y = chromosomes == '40'
+    if y.any():
+        count_first[y] = hom_first[y][:, males].sum(axis=1)
+        count_second[y] = hom_second[y][:, males].sum(axis=1)
+    # MT: all samples are haploid
+    mt = chromosomes == '42'
+    if mt.any():
+        count_first[mt] = hom_first[mt].sum(axis=1)
+        count_second[mt] = hom_second[mt].sum(axis=1)
+    return (count_first > count_second) | (second_alleles == '0')
+
+
+def write_bed_files(data, bim_rows, fam_rows, kept, males, included, output_prefix, chunk_size=1024):
+    """
+    :param data: memory map of the input .bed, made by open_bed
+    :param bim_rows: list with the rows of the .bim file
+    :param fam_rows: list with the rows of the .fam file (with the new sex of the remaining samples)
+    :param kept: boolean array with per sample whether it passed the sample call rate check
+    :param males: boolean array with per sample whether the sex in the input .fam file is male (1)
+    :param included: boolean array with per SNP whether it is not excluded
+    :param output_prefix: prefix for the new .bed, .bim and .fam file, the removed samples are written to
+    <prefix>_bad_sample
+    :param chunk_size: number of SNPs that are written at once
+    :return: number of SNPs of which allele 1 and 2 were swapped
+    """
+    number_samples = len(fam_rows)
+    chromosomes = np.array([row[0] for row in bim_rows], dtype=object)
+    second_alleles = np.array([row[5] for row in bim_rows], dtype=object)
+    males = males[kept]
+    new_bim_rows = []
+    count_swapped = 0
+    bad_prefix = output_prefix + '_bad_sample'
+    write_bad = not kept.all()
+    with open(output_prefix + '.bed', "wb") as NewFileBED, \
+            open(bad_prefix + '.bed' if write_bad else os.devnull, "wb") as NewFileBadBED:
+        NewFileBED.write(BED_MAGIC)
+        NewFileBadBED.write(BED_MAGIC)
+        for start in range(0, len(data), chunk_size):
+            end = min(start + chunk_size, len(data))
+            codes = unpack_codes(data[start:end], number_samples)
+            if write_bad:
+                # the removed samples keep all SNPs and the alleles of the input .bed
+                NewFileBadBED.write(pack_codes(codes[:, ~kept]).tobytes())
+            snps = included[start:end]
+            kept_codes = codes[snps][:, kept]
+            swap = get_allele_swap(kept_codes, chromosomes[start:end][snps], second_alleles[start:end][snps], males)
+            kept_codes[swap] = SWAP_TABLE[kept_codes[swap]]
+            count_swapped += int(swap.sum())
+            NewFileBED.write(pack_codes(kept_codes).tobytes())
+            for index, swapped in zip(np.flatnonzero(snps) + start, swap):
+                row = list(bim_rows[index])
+                if swapped:
+                    row[4], row[5] = row[5], row[4]
+                new_bim_rows.append(row)
+
+    order = get_sort_order(new_bim_rows)
+    if order is not None:
+        reorder_snps(output_prefix + '.bed', order, int(kept.sum()))
+        new_bim_rows = [new_bim_rows[index] for index in order]
+    with open(output_prefix + '.bim', "w", newline='') as NewFileBIM, \
+            open(output_prefix + '.fam', "w", newline='') as NewFileFAM:
+        csv.writer(NewFileBIM, delimiter='\t').writerows(new_bim_rows)
+        csv.writer(NewFileFAM, delimiter=' ').writerows(row for row, passed in zip(fam_rows, kept) if passed)
+    if write_bad:
+        with open(bad_prefix + '.bim', "w", newline='') as NewFileBIM, \
+                open(bad_prefix + '.fam', "w", newline='') as NewFileFAM:
+            csv.writer(NewFileBIM, delimiter='\t').writerows(bim_rows)
+            csv.writer(NewFileFAM, delimiter=' ').writerows(row for row, passed in zip(fam_rows, kept) if not passed)
+    return count_swapped
+
+
+def report_bad_samples(fam_rows, kept, missing_rates):
+    """
+    :param fam_rows: list with the rows of the .fam file
+    :param kept: boolean array with per sample whether it passed the sample call rate check
+    :param missing_rates: array with per sample the missing rate over all SNPs
+    """
+    if kept.all():
+        print("\nNo samples were removed because of a bad sample call rate")
+        return
+    print("\nThe samples which were removed and the percentage missing SNPs per sample: ")
+    for line, passed, missing_rate in zip(fam_rows, kept, missing_rates):
+        if not passed:
+            print(line[0], line[1], "has sample missing rate of", f'{missing_rate * 100:g}', "%")
+
+
+def check_sex_x(fam_rows, groups, counts, sex_changed):
+    """
+    :param fam_rows: list with the rows of the .fam file of the remaining samples
+    :param groups: dictionary made by get_snp_groups
+    :param counts: dictionary made by count_sample_calls, for the remaining samples
+    :param sex_changed: output file with the samples for which the sex was changed
+    :return: rows of the .fam file with the sex based on X SNP homozygosity
+    """
+    print("\n\n--- Performing sex check based on X SNP homozygosity")
+    snp_sex = {}
+    count_unknown = 0
+    sex_unknown_ids = []
+    low_x_count = []
+    nr_x_snps = int(groups['x'].sum())
+    for line, missing, heterozygous in zip(fam_rows, counts['x'], counts['x_snp']):
+        # get sex based on X chromosome SNP homozygosity
+        snp_sex, count_unknown, sex_unknown_ids, low_x_count = GetSexX.get_snp_sex(
+            line, missing, nr_x_snps, heterozygous, snp_sex, count_unknown, sex_unknown_ids, low_x_count)
+    count_sex_changed = 0
+    different_sex = {}
+    for line in fam_rows:
+        # check if sex differs between snp sex and fam file
+        line, different_sex, count_sex_changed = GetSexX.check_sex(line, snp_sex, different_sex, count_sex_changed)
+    GetSexX.report_different_sex(different_sex, count_sex_changed, count_unknown, sex_unknown_ids, low_x_count,
+                                 sex_changed)
+    return fam_rows
+
+
+def check_sex_y(fam_rows, groups, counts, y_limit, sex_changed):
+    """
+    :param fam_rows: list with the rows of the .fam file of the remaining samples
+    :param groups: dictionary made by get_snp_groups
+    :param counts: dictionary made by count_sample_calls, for the remaining samples
+    :param y_limit: limit for number of Y calls (100 for embark, 130 for neogen 220k)
+    :param sex_changed: output file with the samples for which the sex was changed
+    :return: rows of the .fam file with the sex based on the number of Y calls
+    """
+    print("\n\n--- Performing sex check based on number of Y SNP calls")
+    snp_sex = {}
+    y_calls = groups['included_y'].sum() - counts['included_y']  # the bad Y SNPs are not counted
+    for line, calls in zip(fam_rows, y_calls):
+        # get sex based on Y SNPs
+        snp_sex = GetSexY.get_snp_sex(line, calls, snp_sex, y_limit)
+    count_sex_changed = 0
+    different_sex = {}
+    for line in fam_rows:
+        # check if sex differs between snp sex and fam file
+        line, different_sex, count_sex_changed = GetSexY.check_sex(line, snp_sex, different_sex, count_sex_changed)
+    GetSexY.report_different_sex(different_sex, count_sex_changed, sex_changed)
+    return fam_rows
+
+
+def main():
+    """
+    Removes the samples with a bad sample call rate and the bad Y SNPs, and checks the sex of the remaining samples
+    """
+    # input files
+    filename_bed = sys.argv[1]  # input plink .bed file
+    filename_bim = sys.argv[2]  # input plink .bim file
+    filename_fam = sys.argv[3]  # input plink .fam file
+    filename_exclude = sys.argv[4]  # file with the bad Y SNPs to exclude, or none
+    sex_check = sys.argv[6]  # none, X for the sex check based on X SNPs, or the Y call limit (embark and neogen 220K)
+
+    # output files
+    output_prefix = sys.argv[5]  # prefix for the new .bed, .bim and .fam file
+    sex_changed = sys.argv[7]  # file with the samples for which the sex was changed
+
+    with open(filename_bim, mode="r") as DataBIM, \
+            open(filename_fam, mode="r") as DataFAM:
+        bim_rows = read_plink_rows(DataBIM)
+        fam_rows = [update_phenotype(line) for line in read_plink_rows(DataFAM)]
+    groups = get_snp_groups(bim_rows, get_snps_to_exclude(filename_exclude))
+    if sex_check == 'X' and not groups['x'].any():
+        sys.exit(f"ERROR: no X snps (chromosome 39) found in {filename_bim}")
+
+    # count the missing calls of each sample in one read of the .bed
+    data = open_bed(filename_bed, len(bim_rows), len(fam_rows))
+    counts = count_sample_calls(data, len(fam_rows), groups)
+    females = np.array([line[4] == '2' for line in fam_rows], dtype=bool)  # line[4] is sex
+    males = np.array([line[4] == '1' for line in fam_rows], dtype=bool)
+    kept = get_missing_rates(groups, counts, females) <= MIND
+    print("--exclude:", int(groups['included'].sum() + groups['included_y'].sum()), "variants remaining.")
+    print(int((~kept).sum()), "samples removed due to missing genotype data (--mind).")
+    if not kept.any():
+        sys.exit("ERROR: all samples were removed because of a bad sample call rate")
+    report_bad_samples(fam_rows, kept, get_missing_rates(groups, counts, females, with_excluded=True))
+
+    # sex check of the remaining samples
+    kept_rows = [line for line, passed in zip(fam_rows, kept) if passed]
+    kept_counts = {group: count[kept] for group, count in counts.items()}
+    if sex_check == 'X':
+        check_sex_x(kept_rows, groups, kept_counts, sex_changed)
+    elif sex_check != 'none':
+        check_sex_y(kept_rows, groups, kept_counts, int(sex_check), sex_changed)
+
+    count_swapped = write_bed_files(data, bim_rows, fam_rows, kept, males, groups['included'] | groups['included_y'],
+                                    output_prefix)
+    del data
+    print("\nNumber of SNPs of which allele 1 and 2 were swapped (allele 1 is the minor allele): ", count_swapped)
+    print("Number of samples written to .bed file: ", int(kept.sum()))
+    print("Number of SNPs written to .bed file: ", int(groups['included'].sum() + groups['included_y'].sum()))
+
+
+main()
+
+# get the end time
+et = time.time()
+# get the execution time
+elapsed_time = et - st
+print('Execution time:', elapsed_time, 'seconds')
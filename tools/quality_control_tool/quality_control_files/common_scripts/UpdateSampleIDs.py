@@ -6,6 +6,9 @@ import csv
 import sys
 import re
 
+# a quoted label, a comment or a label, branch length or support value of the newick tree
+NEWICK_TOKEN = re.compile(r"'(?:[^']|'')*'|\[[^\]]*\]|[^\s(),:;\[\]']+")
+
 
 def split_and_strip(line, delimiter=' '):
     """
@@ -34,12 +37,12 @@ def update_ids(file, samples, writer):
     :param file: input newick file
     :param samples: dictionary with temporary and original sample ids
     :param writer: which writer to use
+    Each line is split once in tokens and only whole tokens are looked up in samples, so a temporary id is not replaced
+    inside a longer id (e.g. S00000001 in S000000010) and the time does not grow with number of samples x tree length.
     """
     for line in file:
-        for sample_id in samples.keys():
-            line = line.strip()
-            if re.search(sample_id, line):
-                line = re.sub(sample_id, samples[sample_id], line)  # replace temporary sample id with original id
+        # replace temporary sample ids with original ids, other tokens are kept
+        line = NEWICK_TOKEN.sub(lambda match: samples.get(match.group(), match.group()), line.strip())
         writer.writerow([line])
 
 